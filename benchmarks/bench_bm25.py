@@ -0,0 +1,79 @@
+"""
+Задержка поиска BM25 на синтетическом корпусе
+
+Словарь с распределением Ципфа, как в естественном тексте: частые термы
+дают длинные постинги, редкие (имена функций, коды курсов) — короткие.
+
+Запуск:
+    python -m benchmarks.bench_bm25 --chunks 1000000 --queries 500
+"""
+import argparse
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from src.database.bm25_index import BM25Index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Задержка поиска BM25")
+    parser.add_argument("--chunks", type=int, default=1_000_000)
+    parser.add_argument("--vocabulary", type=int, default=200_000)
+    parser.add_argument("--words", type=int, default=80, help="Слов в чанке")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--top-k", type=int, default=15)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vocabulary = np.array([f"term{i}" for i in range(args.vocabulary)])
+
+    def sample(n: int) -> np.ndarray:
+        return vocabulary[np.minimum(rng.zipf(1.2, n), args.vocabulary) - 1]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        index = BM25Index(Path(tmp_dir) / "bm25.pkl")
+
+        start = time.perf_counter()
+        batch = 10_000
+        for offset in range(0, args.chunks, batch):
+            size = min(batch, args.chunks - offset)
+            words = sample(size * args.words).reshape(size, args.words)
+            index.add(
+                [f"chunk-{offset + i}" for i in range(size)],
+                [" ".join(row) for row in words]
+            )
+        build_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        index.save()
+        save_time = time.perf_counter() - start
+        size_mb = index.path.stat().st_size / 1024 / 1024
+
+        start = time.perf_counter()
+        BM25Index(index.path)
+        load_time = time.perf_counter() - start
+
+        queries = [" ".join(sample(4)) for _ in range(args.queries)]
+        timings = []
+        for query in queries:
+            start = time.perf_counter()
+            index.search(query, args.top_k)
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+
+    print("=" * 50)
+    print(f"Чанков: {args.chunks}, слов в чанке: {args.words}")
+    print(f"Построение: {build_time:.1f} с, сохранение: {save_time:.1f} с, загрузка: {load_time:.1f} с")
+    print(f"Размер на диске: {size_mb:.1f} МБ")
+    print(
+        f"Поиск top-{args.top_k}: p50={statistics.median(timings):.2f} мс "
+        f"p99={timings[int(len(timings) * 0.99) - 1]:.2f} мс"
+    )
+    print("=" * 50)
+
+
+if __name__ == "__main__":
+    main()
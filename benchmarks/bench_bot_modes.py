@@ -0,0 +1,104 @@
+"""
+Задержка ответа бота: через HTTP API против вызова сервисов в том же процессе
+
+API поднимается внутри бенчмарка (uvicorn на --port), поэтому оба режима
+работают с одними и теми же сервисами и одной векторной БД. Для одних и тех
+же вопросов вызывает клиент бота в режиме http (ApiClient, запросы к API) и
+inprocess (LocalApiClient с AnswerService API) и печатает p50/p99 полного
+ответа и времени до первого токена потокового ответа. Кеш ответов стоит
+выключить, чтобы каждый вопрос доходил до LLM. Отдельно запущенный API не нужен.
+
+Запуск (GigaChat заменен заглушкой):
+    python -m benchmarks.gigachat_stub --port 8090 --latency 0.3
+    export GIGACHAT_BASE_URL=http://127.0.0.1:8090/api/v1 GIGACHAT_AUTH_URL=http://127.0.0.1:8090/api/v2/oauth \\
+        ANSWER_CACHE_ENABLED=false
+    python -m benchmarks.bench_bot_modes --requests 30
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import uvicorn
+
+from src.api import routes
+from src.bot.api_client import ApiClient
+from src.bot.local_client import LocalApiClient
+
+QUESTIONS = [
+    "Что такое машинное обучение?",
+    "Объясни принцип работы нейронных сетей",
+    "Как создать функцию в Python?",
+    "Что такое градиентный спуск?",
+]
+
+
+def percentile(values: list, q: float) -> float:
+    values = sorted(values)
+    return values[max(0, int(len(values) * q) - 1)]
+
+
+async def measure(client, requests: int, top_k: int) -> dict:
+    """Последовательно задает вопросы и замеряет полный ответ и первый токен потока"""
+    full, first_token = [], []
+    for i in range(requests):
+        query = f"{QUESTIONS[i % len(QUESTIONS)]} #{i}"
+
+        start = time.perf_counter()
+        await client.query(query, top_k=top_k)
+        full.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        first = None
+        async for event, _ in client.stream_query(query + " (stream)", top_k=top_k):
+            if event == "token" and first is None:
+                first = time.perf_counter() - start
+        first_token.append(first if first is not None else time.perf_counter() - start)
+    return {'full': full, 'first_token': first_token}
+
+
+async def main_async(args):
+    server = uvicorn.Server(uvicorn.Config(routes.app, port=args.port, log_level="warning"))
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    results = {}
+    clients = (
+        ("http", lambda: ApiClient(f"http://127.0.0.1:{args.port}")),
+        ("inprocess", lambda: LocalApiClient(routes.answer_service)),
+    )
+    try:
+        for mode, factory in clients:
+            client = factory()
+            try:
+                # Прогрев: соединения, токен GigaChat
+                await client.query(QUESTIONS[0], top_k=args.top_k)
+                results[mode] = await measure(client, args.requests, args.top_k)
+            finally:
+                await client.aclose()
+    finally:
+        server.should_exit = True
+        await server_task
+
+    print("=" * 60)
+    for mode, timings in results.items():
+        print(f"{mode:>10}: ответ p50={statistics.median(timings['full']) * 1000:.0f} мс "
+              f"p99={percentile(timings['full'], 0.99) * 1000:.0f} мс, "
+              f"первый токен p50={statistics.median(timings['first_token']) * 1000:.0f} мс")
+    saved = statistics.median(results['http']['full']) - statistics.median(results['inprocess']['full'])
+    print(f"Без HTTP ответ быстрее на {saved * 1000:.0f} мс (p50)")
+    print("=" * 60)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бот: HTTP API против сервисов в процессе")
+    parser.add_argument("--requests", type=int, default=30)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8001, help="Порт API внутри бенчмарка")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Память на 100k чанков: pydantic DocumentChunk со списком float против ChunkBatch
+
+Запуск:
+    python -m benchmarks.bench_chunk_memory --chunks 100000 --dim 384
+"""
+import argparse
+import gc
+import tracemalloc
+
+import numpy as np
+
+from src.models.chunk_batch import ChunkBatch
+from src.models.document import DocumentChunk
+
+
+def measure(build) -> tuple[object, float]:
+    """Строит объект и возвращает его вместе с пиковым приростом памяти в МБ"""
+    gc.collect()
+    tracemalloc.start()
+    obj = build()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return obj, peak / 1024 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Память представлений чанков")
+    parser.add_argument("--chunks", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=384)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    texts = [f"Фрагмент {i} " + "текст " * 80 for i in range(args.chunks)]
+    metadatas = [{"source": f"/docs/file_{i // 50}.pdf", "chunk_size": len(texts[i])} for i in range(args.chunks)]
+    ids = [f"chunk-{i}" for i in range(args.chunks)]
+    matrix = rng.standard_normal((args.chunks, args.dim), dtype=np.float32)
+
+    # Тексты и метаданные общие, меряем только накладные расходы представления и векторов
+    _, pydantic_mb = measure(lambda: [
+        DocumentChunk(id=chunk_id, content=text, metadata=metadata, embedding=vector)
+        for chunk_id, text, metadata, vector in zip(ids, texts, metadatas, matrix.tolist())
+    ])
+    _, batch_mb = measure(lambda: ChunkBatch(
+        ids=list(ids), texts=list(texts), metadatas=list(metadatas), embeddings=matrix.copy()
+    ))
+
+    print("=" * 50)
+    print(f"Чанков: {args.chunks}, размерность: {args.dim}")
+    print(f"List[DocumentChunk] (List[float]): {pydantic_mb:8.1f} МБ")
+    print(f"ChunkBatch (float32 матрица):      {batch_mb:8.1f} МБ")
+    print(f"Экономия: {pydantic_mb / batch_mb:.1f}x")
+    print("=" * 50)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Бенчмарк параллельного парсинга документов
+
+Процессы пула (spawn) повторно импортируют только этот модуль и
+src.pipeline.document_loader — так же, как в API, где main.py импортирует
+приложение только под __main__. Модель эмбеддингов и векторная БД в них не
+загружаются, поэтому замеры отражают только парсинг.
+
+Запуск:
+    python -m benchmarks.bench_document_loader /path/to/documents --workers 1 2 4 8
+"""
+import argparse
+import os
+import time
+
+from src.pipeline.document_loader import DocumentLoader
+
+
+def run(directory: str, workers: int) -> tuple[int, int, float]:
+    """Загружает директорию и возвращает (файлов, документов, секунд)"""
+    loader = DocumentLoader(workers=workers)
+    files = loader.iter_files(directory)
+
+    start = time.perf_counter()
+    documents_count = sum(len(documents) for documents in loader.load_files(files))
+    elapsed = time.perf_counter() - start
+
+    return len(files), documents_count, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Масштабирование парсинга по ядрам")
+    parser.add_argument("directory", help="Директория с документами")
+    parser.add_argument(
+        "--workers", type=int, nargs="+",
+        default=sorted({1, 2, 4, os.cpu_count() or 1})
+    )
+    args = parser.parse_args()
+
+    results = []
+    for workers in args.workers:
+        files, documents, elapsed = run(args.directory, workers)
+        results.append((workers, files, documents, elapsed))
+
+    baseline = results[0][3]
+    print("=" * 50)
+    print(f"{'workers':>8} {'files':>7} {'docs':>7} {'sec':>8} {'files/s':>9} {'speedup':>8}")
+    for workers, files, documents, elapsed in results:
+        print(
+            f"{workers:>8} {files:>7} {documents:>7} {elapsed:>8.2f} "
+            f"{files / elapsed if elapsed else 0:>9.2f} {baseline / elapsed if elapsed else 0:>8.2f}x"
+        )
+    print("=" * 50)
+
+
+if __name__ == "__main__":
+    main()
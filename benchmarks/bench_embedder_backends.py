@@ -0,0 +1,88 @@
+"""
+Сравнение бэкендов эмбеддингов: PyTorch против ONNX (int8)
+
+Проверяет паритет (косинус между векторами бэкендов >= 0.99) и замеряет
+задержку одиночного запроса и пропускную способность пакетной загрузки.
+Завершается с кодом 1, если паритет нарушен.
+
+Запуск:
+    python -m benchmarks.bench_embedder_backends --queries 200 --batch 2000
+"""
+import argparse
+import statistics
+import sys
+import time
+
+import numpy as np
+
+from src.config import settings
+from src.pipeline.embedder import Embedder
+
+SAMPLE_TEXTS = [
+    "Что такое машинное обучение?",
+    "Объясни принцип работы нейронных сетей",
+    "Как создать функцию в Python?",
+    "Градиентный спуск минимизирует функцию потерь, двигаясь против градиента.",
+    "The enumerate function returns pairs of index and value.",
+    "Теорема Пифагора: квадрат гипотенузы равен сумме квадратов катетов.",
+    "Рекурсия — это вызов функцией самой себя с уменьшенной задачей.",
+    "Матрица называется обратимой, если ее определитель отличен от нуля.",
+]
+
+
+def latency_ms(embedder: Embedder, queries: list[str]) -> tuple[float, float]:
+    """Задержка одиночных запросов: (p50, p99) в миллисекундах"""
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        embedder.embed_text(query)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.99) - 1]
+
+
+def throughput(embedder: Embedder, texts: list[str]) -> float:
+    """Пропускная способность пакетной обработки, текстов в секунду"""
+    start = time.perf_counter()
+    embedder.embed_texts(texts)
+    return len(texts) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PyTorch vs ONNX эмбеддинги")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--batch", type=int, default=2000)
+    args = parser.parse_args()
+
+    # Кеш исказил бы замеры
+    settings.embedding_cache_enabled = False
+    torch_embedder = Embedder(use_gigachat=False, backend="torch")
+    onnx_embedder = Embedder(use_gigachat=False, backend="onnx")
+
+    reference = np.asarray(torch_embedder.embed_texts(SAMPLE_TEXTS))
+    candidate = np.asarray(onnx_embedder.embed_texts(SAMPLE_TEXTS))
+    cosine = np.sum(reference * candidate, axis=1) / (
+        np.linalg.norm(reference, axis=1) * np.linalg.norm(candidate, axis=1)
+    )
+
+    # Уникальные тексты, чтобы не мерить внутреннюю дедупликацию
+    queries = [f"{SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)]} #{i}" for i in range(args.queries)]
+    batch = [f"{SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)]} " * (1 + i % 8) + str(i) for i in range(args.batch)]
+
+    print("=" * 50)
+    print(f"Паритет: косинус min={cosine.min():.4f} mean={cosine.mean():.4f}")
+    for name, embedder in (("torch", torch_embedder), ("onnx", onnx_embedder)):
+        p50, p99 = latency_ms(embedder, queries)
+        print(
+            f"{name:>6}: запрос p50={p50:.2f} мс p99={p99:.2f} мс, "
+            f"загрузка {throughput(embedder, batch):.1f} текстов/с"
+        )
+    print("=" * 50)
+
+    if cosine.min() < 0.99:
+        print("Паритет нарушен: косинус ниже 0.99")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
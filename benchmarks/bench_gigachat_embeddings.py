@@ -0,0 +1,42 @@
+"""
+Бенчмарк эмбеддингов GigaChat против локальной заглушки
+
+Запуск (в соседнем терминале: python -m benchmarks.gigachat_stub --latency 0.2):
+    GIGACHAT_BASE_URL=http://127.0.0.1:8090/api/v1 \\
+    GIGACHAT_AUTH_URL=http://127.0.0.1:8090/api/v2/oauth \\
+    python -m benchmarks.bench_gigachat_embeddings --texts 2000
+"""
+import argparse
+import time
+
+from src.config import settings
+from src.pipeline.embedder import Embedder
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Пропускная способность GigaChat Embeddings")
+    parser.add_argument("--texts", type=int, default=1000)
+    args = parser.parse_args()
+
+    # Кеш исказил бы замер
+    settings.embedding_cache_enabled = False
+    embedder = Embedder(use_gigachat=True)
+    texts = [f"Фрагмент учебного материала номер {i}: " + "текст " * 50 for i in range(args.texts)]
+
+    start = time.perf_counter()
+    embeddings = embedder.embed_texts(texts)
+    elapsed = time.perf_counter() - start
+
+    print("=" * 50)
+    print(f"Текстов: {len(embeddings)}, размерность: {len(embeddings[0])}")
+    print(f"Время: {elapsed:.2f} с, {len(texts) / elapsed:.1f} текстов/с")
+    print(
+        f"batch_size={settings.gigachat_embeddings_batch_size} "
+        f"concurrency={settings.gigachat_embeddings_concurrency} "
+        f"rps={settings.gigachat_embeddings_rps}"
+    )
+    print("=" * 50)
+
+
+if __name__ == "__main__":
+    main()
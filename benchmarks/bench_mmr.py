@@ -0,0 +1,110 @@
+"""
+Задержка отбора maximal marginal relevance
+
+Замеряет время mmr_select для пула кандидатов (по умолчанию 100 векторов
+размерности 384, как у MiniLM) и сравнивает с наивной реализацией, которая
+считает сходство каждой пары кандидатов в цикле Python. Векторизованный
+отбор должен добавлять к запросу меньше 1 мс.
+
+Отдельно проверяет связку с реранкером: кандидаты — группы почти одинаковых
+чанков, оценки кросс-энкодера у одной группы выше остальных. Прежний порядок
+(MMR до RERANK_CANDIDATES из стольких же кандидатов, затем сортировка
+кросс-энкодером) отдает в контекст повторы одной группы; MMR по оценкам
+кросс-энкодера после переранжирования выбирает чанки разных групп.
+
+Запуск:
+    python -m benchmarks.bench_mmr --candidates 100 --top-k 5
+"""
+import argparse
+import statistics
+import time
+
+import numpy as np
+
+from src.services.diversity import mmr_select
+
+
+def naive_mmr(query: np.ndarray, vectors: np.ndarray, k: int, lambda_mult: float) -> list:
+    """MMR с попарными сходствами в цикле Python — для сравнения"""
+    selected, remaining = [], list(range(len(vectors)))
+    while remaining and len(selected) < k:
+        best, best_score = None, -np.inf
+        for i in remaining:
+            redundancy = max((float(vectors[i] @ vectors[j]) for j in selected), default=0.0)
+            score = lambda_mult * float(vectors[i] @ query) - (1 - lambda_mult) * redundancy
+            if score > best_score:
+                best, best_score = i, score
+        selected.append(best)
+        remaining.remove(best)
+    return selected
+
+
+def rerank_combination(args, rng) -> None:
+    """Сравнивает число разных групп чанков в контексте: MMR до и после реранкера"""
+    groups = args.rerank_candidates // 4
+    centers = rng.standard_normal((groups, args.dim)).astype(np.float32)
+    group_of = np.repeat(np.arange(groups), 4)
+    vectors = centers[group_of] + 0.05 * rng.standard_normal((len(group_of), args.dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    query = centers.mean(axis=0)
+    query /= np.linalg.norm(query)
+    # Кросс-энкодер выше всего оценивает первую группу
+    scores = (groups - group_of) + 0.1 * rng.standard_normal(len(group_of))
+
+    # Прежний порядок: MMR выбирает rerank_candidates из rerank_candidates, затем сортировка по оценкам
+    before = mmr_select(query, vectors, args.rerank_candidates, args.lambda_mult)
+    before = sorted(before, key=lambda i: scores[i], reverse=True)[:args.rerank_top_n]
+    # Сейчас: переранжирование всех кандидатов, итоговый отбор MMR по оценкам кросс-энкодера
+    after = mmr_select(query, vectors, args.rerank_top_n, args.lambda_mult, relevance=scores)
+
+    before_groups = len(set(group_of[before].tolist()))
+    after_groups = len(set(group_of[after].tolist()))
+    assert after_groups > before_groups, (before_groups, after_groups)
+    print(f"Реранкер + MMR, групп в top-{args.rerank_top_n}: "
+          f"MMR до реранкера {before_groups}, после {after_groups}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Задержка MMR")
+    parser.add_argument("--candidates", type=int, default=100)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--lambda-mult", type=float, default=0.5)
+    parser.add_argument("--rounds", type=int, default=1000)
+    parser.add_argument("--rerank-candidates", type=int, default=20)
+    parser.add_argument("--rerank-top-n", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((args.candidates, args.dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    query = vectors[0] + 0.1 * rng.standard_normal(args.dim).astype(np.float32)
+    query /= np.linalg.norm(query)
+
+    expected = naive_mmr(query, vectors, args.top_k, args.lambda_mult)
+    selected = mmr_select(query, vectors, args.top_k, args.lambda_mult).tolist()
+    assert selected == expected, (selected, expected)
+
+    timings = []
+    for _ in range(args.rounds):
+        start = time.perf_counter()
+        mmr_select(query, vectors, args.top_k, args.lambda_mult)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+
+    naive = []
+    for _ in range(max(1, args.rounds // 20)):
+        start = time.perf_counter()
+        naive_mmr(query, vectors, args.top_k, args.lambda_mult)
+        naive.append((time.perf_counter() - start) * 1000)
+
+    print("=" * 50)
+    print(f"Кандидатов: {args.candidates}, размерность: {args.dim}, top-k: {args.top_k}")
+    print(f"NumPy:       p50={statistics.median(timings):.3f} мс p99={timings[int(len(timings) * 0.99) - 1]:.3f} мс")
+    print(f"Цикл Python: p50={statistics.median(naive):.3f} мс")
+    rerank_combination(args, rng)
+    print("=" * 50)
+
+
+if __name__ == "__main__":
+    main()
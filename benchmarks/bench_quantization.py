@@ -0,0 +1,85 @@
+"""
+Квантование плоского индекса: память на вектор, recall@k и задержка
+
+Эталон — поиск без квантования (точный top-k по float32). Для int8 и pq
+печатается размер кода в памяти, recall@k относительно эталона после
+переранжирования кандидатов по float-векторам и задержка p50/p99.
+
+Запуск:
+    python -m benchmarks.bench_quantization --vectors 200000 --rerank-factor 10
+"""
+import argparse
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from src.database.flat_index import FlatIndexBackend
+
+
+def main():
+    parser = argparse.ArgumentParser(description="int8 / PQ квантование плоского индекса")
+    parser.add_argument("--vectors", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--rerank-factor", type=int, default=10)
+    parser.add_argument("--pq-subvectors", type=int, default=48)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    # Кластеризованные данные ближе к реальным эмбеддингам, чем равномерный шум
+    centers = rng.standard_normal((256, args.dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, len(centers), args.vectors)]
+    vectors += 0.5 * rng.standard_normal(vectors.shape).astype(np.float32)
+    queries = vectors[rng.integers(0, args.vectors, args.queries)]
+    queries = queries + 0.3 * rng.standard_normal(queries.shape).astype(np.float32)
+
+    ids = [f"chunk-{i}" for i in range(args.vectors)]
+    documents = [""] * args.vectors
+    metadatas = [{}] * args.vectors
+
+    print("=" * 60)
+    print(f"Векторов: {args.vectors}, размерность: {args.dim}, top-k: {args.top_k}, "
+          f"переранжирование: top-k × {args.rerank_factor}")
+
+    truth = None
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for quantization in (None, "int8", "pq"):
+            backend = FlatIndexBackend(
+                tmp_dir,
+                quantization or "float32",
+                quantization=quantization,
+                rerank_factor=args.rerank_factor,
+                pq_subvectors=args.pq_subvectors
+            )
+
+            start = time.perf_counter()
+            batch = 10_000
+            for i in range(0, args.vectors, batch):
+                backend.upsert(ids[i:i + batch], vectors[i:i + batch], documents[i:i + batch], metadatas[i:i + batch])
+            build_time = time.perf_counter() - start
+
+            timings, results = [], []
+            for query in queries:
+                start = time.perf_counter()
+                found = backend.query(query.reshape(1, -1), args.top_k)[0]
+                timings.append((time.perf_counter() - start) * 1000)
+                results.append({result['id'] for result in found})
+            timings.sort()
+
+            if truth is None:
+                truth = results
+            recall = np.mean([len(found & expected) / len(expected) for found, expected in zip(results, truth)])
+
+            stats = backend.get_stats()
+            print(f"{quantization or 'float32':>8}: {stats['bytes_per_vector']:5d} байт/вектор "
+                  f"({stats['index_memory_mb']:.1f} МБ в памяти), recall@{args.top_k}={recall:.4f}, "
+                  f"p50={statistics.median(timings):.2f} мс p99={timings[int(len(timings) * 0.99) - 1]:.2f} мс, "
+                  f"построение {build_time:.1f} с")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
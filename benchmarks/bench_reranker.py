@@ -0,0 +1,91 @@
+"""
+Задержка переранжирования кросс-энкодером и экономия токенов контекста
+
+Замеряет батчевую оценку кандидатов одного запроса (холодный кеш и
+повторный запрос из кеша пар) и сравнивает оценку числа токенов контекста
+для top_k чанков без переранжирования и top_n после него.
+
+Запуск:
+    python -m benchmarks.bench_reranker --candidates 20 --top-n 3 --top-k 5
+"""
+import argparse
+import statistics
+import time
+
+from src.config import settings
+from src.services.reranker import CrossEncoderReranker
+from src.services.tokens import estimate_tokens
+
+SAMPLE_CHUNKS = [
+    "Функция enumerate возвращает пары (индекс, значение) для элементов последовательности.",
+    "Градиентный спуск минимизирует функцию потерь, двигаясь против градиента.",
+    "Список в Python — изменяемая упорядоченная коллекция объектов.",
+    "Теорема Пифагора: квадрат гипотенузы равен сумме квадратов катетов.",
+    "Цикл for перебирает элементы итерируемого объекта по одному.",
+    "Рекурсия — это вызов функцией самой себя с уменьшенной задачей.",
+    "Словарь сопоставляет ключи значениям и ищет по ключу за O(1) в среднем.",
+    "Матрица называется обратимой, если ее определитель отличен от нуля.",
+]
+
+QUERIES = [
+    "Как получить индекс элемента в цикле for?",
+    "Что такое градиентный спуск?",
+    "Чем список отличается от словаря?",
+    "Когда матрица обратима?",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Кросс-энкодер: задержка и токены контекста")
+    parser.add_argument("--candidates", type=int, default=20)
+    parser.add_argument("--top-n", type=int, default=3)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    reranker = CrossEncoderReranker(latency_budget_ms=0)
+
+    def candidates(round_id: int) -> list[dict]:
+        # Уникальные id на раунд, чтобы холодные замеры не попадали в кеш пар
+        return [
+            {
+                'id': f"{round_id}-{i}",
+                'content': (SAMPLE_CHUNKS[i % len(SAMPLE_CHUNKS)] + " ") * 6,
+                'metadata': {},
+                'similarity': 1 - i / 100
+            }
+            for i in range(args.candidates)
+        ]
+
+    cold, warm, saved = [], [], []
+    for round_id in range(args.rounds):
+        query = QUERIES[round_id % len(QUERIES)]
+        results = candidates(round_id)
+
+        start = time.perf_counter()
+        reranked = reranker.rerank(query, results, args.top_n)
+        cold.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        reranker.rerank(query, candidates(round_id), args.top_n)
+        warm.append((time.perf_counter() - start) * 1000)
+
+        baseline_tokens = sum(
+            estimate_tokens(result['content'], settings.chars_per_token) for result in results[:args.top_k]
+        )
+        reranked_tokens = sum(
+            estimate_tokens(result['content'], settings.chars_per_token) for result in reranked
+        )
+        saved.append(1 - reranked_tokens / baseline_tokens)
+
+    print("=" * 50)
+    print(f"Модель: {reranker.model_name}, кандидатов: {args.candidates}")
+    print(f"Холодный кеш: p50={statistics.median(cold):.1f} мс max={max(cold):.1f} мс")
+    print(f"Из кеша пар:  p50={statistics.median(warm):.2f} мс")
+    print(f"Токены контекста: top-{args.top_n} после реранкера вместо top-{args.top_k} — "
+          f"экономия {statistics.mean(saved):.0%}")
+    print("=" * 50)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Время до первого токена: /query против /query/stream
+
+Для каждого вопроса замеряет полное время ответа /query и для /query/stream —
+время до события sources (поиск), до первого токена и до конца ответа.
+С --cancel-after поток закрывается после N токенов: в логе заглушки GigaChat
+видно, что генерация прервана.
+
+Запуск (GigaChat заменен заглушкой, кеш ответов выключен):
+    python -m benchmarks.gigachat_stub --port 8090 --latency 0.3 --token-delay 0.05
+    GIGACHAT_BASE_URL=http://127.0.0.1:8090/api/v1 GIGACHAT_AUTH_URL=http://127.0.0.1:8090/api/v2/oauth \\
+        ANSWER_CACHE_ENABLED=false python main.py
+    python -m benchmarks.bench_stream_ttft --url http://localhost:8000 --requests 20
+"""
+import argparse
+import json
+import statistics
+import time
+
+import httpx
+
+QUESTIONS = [
+    "Что такое машинное обучение?",
+    "Объясни принцип работы нейронных сетей",
+    "Как создать функцию в Python?",
+    "Что такое градиентный спуск?",
+]
+
+
+def stream_once(client: httpx.Client, url: str, query: str, cancel_after: int = 0) -> dict:
+    """Читает поток событий одного запроса и замеряет время этапов"""
+    start = time.perf_counter()
+    timings = {'sources': None, 'first_token': None, 'total': None, 'tokens': 0}
+    event = None
+    with client.stream("POST", f"{url}/query/stream", json={"query": query}) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+                continue
+            if not line.startswith("data: "):
+                continue
+            elapsed = time.perf_counter() - start
+            if event == "sources":
+                timings['sources'] = elapsed
+            elif event == "token":
+                timings['tokens'] += 1
+                if timings['first_token'] is None:
+                    timings['first_token'] = elapsed
+                if cancel_after and timings['tokens'] >= cancel_after:
+                    break
+            elif event == "error":
+                raise RuntimeError(json.loads(line[len("data: "):])['detail'])
+    timings['total'] = time.perf_counter() - start
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Время до первого токена /query/stream")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--cancel-after", type=int, default=0, help="Закрыть поток после N токенов")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    args = parser.parse_args()
+
+    full, sources, first_token, stream_total = [], [], [], []
+    with httpx.Client(timeout=args.timeout) as client:
+        for i in range(args.requests):
+            query = f"{QUESTIONS[i % len(QUESTIONS)]} #{i}"
+
+            start = time.perf_counter()
+            client.post(f"{args.url}/query", json={"query": query}).raise_for_status()
+            full.append(time.perf_counter() - start)
+
+            timings = stream_once(client, args.url, query + " (stream)", args.cancel_after)
+            sources.append(timings['sources'])
+            first_token.append(timings['first_token'])
+            stream_total.append(timings['total'])
+
+    print("=" * 60)
+    print(f"/query, полный ответ:        p50={statistics.median(full) * 1000:.0f} мс")
+    print(f"/query/stream, источники:    p50={statistics.median(sources) * 1000:.0f} мс")
+    print(f"/query/stream, первый токен: p50={statistics.median(first_token) * 1000:.0f} мс")
+    print(f"/query/stream, весь поток:   p50={statistics.median(stream_total) * 1000:.0f} мс"
+          + (f" (закрыт после {args.cancel_after} токенов)" if args.cancel_after else ""))
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Сравнение бэкендов векторного индекса: ChromaDB (HNSW) против плоского memmap-индекса
+
+Эталон — точный top-k по косинусу, посчитанный NumPy. Для каждого бэкенда
+печатаются время загрузки и открытия, recall@k относительно эталона и задержка
+одиночного запроса p50/p99 (с фильтром по источнику и без).
+
+Запуск:
+    python -m benchmarks.bench_vector_backends --vectors 200000 --queries 500
+"""
+import argparse
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from src.database.backends import create_backend
+
+
+def exact_top_k(vectors: np.ndarray, queries: np.ndarray, top_k: int) -> np.ndarray:
+    """Точный top-k по косинусу"""
+    normed = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    scores = queries @ normed.T
+    top = np.argpartition(-scores, top_k - 1, axis=1)[:, :top_k]
+    return top
+
+
+def percentiles(timings: list[float]) -> tuple[float, float]:
+    timings = sorted(timings)
+    return statistics.median(timings), timings[int(len(timings) * 0.99) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ChromaDB vs плоский memmap-индекс")
+    parser.add_argument("--vectors", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--backends", nargs="+", default=["chroma", "flat"])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    # Кластеризованные данные ближе к реальным эмбеддингам, чем равномерный шум
+    centers = rng.standard_normal((256, args.dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, len(centers), args.vectors)]
+    vectors += 0.5 * rng.standard_normal(vectors.shape).astype(np.float32)
+    queries = vectors[rng.integers(0, args.vectors, args.queries)]
+    queries = queries + 0.3 * rng.standard_normal(queries.shape).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    ids = [f"chunk-{i}" for i in range(args.vectors)]
+    documents = [f"Фрагмент {i}" for i in range(args.vectors)]
+    metadatas = [{"source": f"/docs/file_{i % 100}.pdf"} for i in range(args.vectors)]
+    truth = exact_top_k(vectors, queries, args.top_k)
+
+    print("=" * 60)
+    print(f"Векторов: {args.vectors}, размерность: {args.dim}, top-k: {args.top_k}")
+    for name in args.backends:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            backend = create_backend(name, tmp_dir, "bench")
+
+            start = time.perf_counter()
+            batch = 5000
+            for i in range(0, args.vectors, batch):
+                backend.upsert(ids[i:i + batch], vectors[i:i + batch], documents[i:i + batch], metadatas[i:i + batch])
+            backend.flush()
+            load_time = time.perf_counter() - start
+            del backend
+
+            start = time.perf_counter()
+            backend = create_backend(name, tmp_dir, "bench")
+            backend.count()
+            open_time = time.perf_counter() - start
+
+            timings, hits = [], 0
+            for query, expected in zip(queries, truth):
+                start = time.perf_counter()
+                results = backend.query(query.reshape(1, -1), args.top_k)[0]
+                timings.append((time.perf_counter() - start) * 1000)
+                found = {int(result['id'].split('-')[1]) for result in results}
+                hits += len(found & set(expected.tolist()))
+            p50, p99 = percentiles(timings)
+
+            filtered = []
+            for query in queries[:100]:
+                start = time.perf_counter()
+                backend.query(query.reshape(1, -1), args.top_k, where={"source": "/docs/file_7.pdf"})
+                filtered.append((time.perf_counter() - start) * 1000)
+            f50, f99 = percentiles(filtered)
+
+            print(f"{name:>6}: загрузка {load_time:.1f} с, открытие {open_time:.2f} с, "
+                  f"recall@{args.top_k}={hits / truth.size:.4f}")
+            print(f"{'':>6}  запрос p50={p50:.2f} мс p99={p99:.2f} мс, "
+                  f"с фильтром p50={f50:.2f} мс p99={f99:.2f} мс")
+            del backend
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
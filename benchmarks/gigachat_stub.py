@@ -0,0 +1,154 @@
+"""
+Локальная заглушка GigaChat API для офлайн-прогонов
+
+Поддерживает получение токена, эмбеддинги и chat/completions (в том числе stream).
+Эмбеддинги детерминированы: одинаковый текст дает одинаковый вектор.
+
+Запуск:
+    python -m benchmarks.gigachat_stub --port 8090 --latency 0.2 --failure-rate 0.1
+
+Настройки приложения для работы с заглушкой:
+    GIGACHAT_BASE_URL=http://127.0.0.1:8090/api/v1
+    GIGACHAT_AUTH_URL=http://127.0.0.1:8090/api/v2/oauth
+"""
+import argparse
+import hashlib
+import json
+import random
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Обработчик запросов заглушки"""
+
+    latency = 0.0
+    failure_rate = 0.0
+    dimension = 1024
+    token_delay = 0.02
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        return json.loads(body or b"{}")
+
+    def _send_json(self, payload: dict, status: int = 200):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        if self.path.endswith("/oauth"):
+            self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            return self._send_json({
+                "access_token": "stub-token",
+                "expires_at": int((time.time() + 1800) * 1000)
+            })
+
+        payload = self._read_json()
+        time.sleep(self.latency)
+
+        if random.random() < self.failure_rate:
+            return self._send_json({"status": 503, "message": "stub overload"}, status=503)
+
+        if self.path.endswith("/embeddings"):
+            return self._send_json(self._embeddings(payload))
+        if self.path.endswith("/chat/completions"):
+            if payload.get("stream"):
+                return self._stream_chat(payload)
+            return self._send_json(self._chat(payload))
+
+        self._send_json({"message": "not found"}, status=404)
+
+    def _embeddings(self, payload: dict) -> dict:
+        data = []
+        for index, text in enumerate(payload.get("input", [])):
+            seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:4], "little")
+            vector = np.random.default_rng(seed).standard_normal(self.dimension).astype(np.float32)
+            vector /= np.linalg.norm(vector)
+            data.append({
+                "object": "embedding",
+                "embedding": vector.tolist(),
+                "index": index,
+                "usage": {"prompt_tokens": max(1, len(text) // 3)}
+            })
+        return {"object": "list", "data": data, "model": payload.get("model", "Embeddings")}
+
+    def _answer(self, payload: dict) -> str:
+        question = payload.get("messages", [{}])[-1].get("content", "")
+        return f"Ответ заглушки на запрос длиной {len(question)} символов. " * 5
+
+    def _chat(self, payload: dict) -> dict:
+        # Без stream ответ приходит целиком, когда сгенерированы все токены
+        time.sleep(len(self._answer(payload).split(" ")) * self.token_delay)
+        return {
+            "choices": [{
+                "message": {"role": "assistant", "content": self._answer(payload)},
+                "index": 0,
+                "finish_reason": "stop"
+            }],
+            "created": int(time.time()),
+            "model": payload.get("model", "GigaChat"),
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+            "object": "chat.completion"
+        }
+
+    def _stream_chat(self, payload: dict):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        words = self._answer(payload).split(" ")
+        try:
+            for sent, word in enumerate(words):
+                chunk = {
+                    "choices": [{"delta": {"content": word + " ", "role": "assistant"}, "index": 0}],
+                    "created": int(time.time()),
+                    "model": payload.get("model", "GigaChat"),
+                    "object": "chat.completion"
+                }
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+                time.sleep(self.token_delay)
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            print(f"Поток прерван клиентом после {sent} из {len(words)} токенов")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Заглушка GigaChat API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", type=float, default=0.1, help="Задержка ответа, с")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Доля ответов 503")
+    parser.add_argument("--dimension", type=int, default=1024)
+    parser.add_argument("--token-delay", type=float, default=0.02, help="Время генерации одного токена, с")
+    args = parser.parse_args()
+
+    StubHandler.latency = args.latency
+    StubHandler.failure_rate = args.failure_rate
+    StubHandler.dimension = args.dimension
+    StubHandler.token_delay = args.token_delay
+
+    server = ThreadingHTTPServer((args.host, args.port), StubHandler)
+    print(f"Заглушка GigaChat: http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Нагрузочный тест /query: пропускная способность и задержка при росте параллелизма
+
+Для каждого уровня параллелизма отправляет запросы из N одновременных
+клиентов и печатает запросов в секунду и p50/p99. При неблокирующем
+пути обработки пропускная способность растет с параллелизмом, пока не
+упирается в CPU поиска или llm_max_concurrency.
+
+Запуск (GigaChat заменен заглушкой с задержкой ответа 1 с, кеш ответов выключен,
+чтобы каждый запрос доходил до LLM):
+    python -m benchmarks.gigachat_stub --port 8090 --latency 1.0
+    GIGACHAT_BASE_URL=http://127.0.0.1:8090/api/v1 GIGACHAT_AUTH_URL=http://127.0.0.1:8090/api/v2/oauth \\
+        ANSWER_CACHE_ENABLED=false python main.py
+    python -m benchmarks.load_test_query --url http://localhost:8000 --concurrency 1 4 16 64
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+QUESTIONS = [
+    "Что такое машинное обучение?",
+    "Объясни принцип работы нейронных сетей",
+    "Как создать функцию в Python?",
+    "Что такое градиентный спуск?",
+    "Чем список отличается от кортежа?",
+    "Как работает рекурсия?",
+]
+
+
+async def run_level(client: httpx.AsyncClient, url: str, concurrency: int, requests: int) -> dict:
+    """Выполняет requests запросов из concurrency одновременных клиентов"""
+    timings, errors = [], 0
+    counter = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            start = time.perf_counter()
+            try:
+                response = await client.post(f"{url}/query", json={"query": f"{QUESTIONS[i % len(QUESTIONS)]} #{i}"})
+                response.raise_for_status()
+                timings.append(time.perf_counter() - start)
+            except httpx.HTTPError:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    timings.sort()
+    return {
+        'rps': len(timings) / elapsed,
+        'p50': statistics.median(timings) if timings else 0.0,
+        'p99': timings[max(0, int(len(timings) * 0.99) - 1)] if timings else 0.0,
+        'errors': errors,
+    }
+
+
+async def main_async(args):
+    limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+        print("=" * 60)
+        baseline = None
+        for concurrency in args.concurrency:
+            stats = await run_level(client, args.url, concurrency, max(args.requests, concurrency * 2))
+            baseline = baseline or stats['rps']
+            print(f"параллельно {concurrency:>4}: {stats['rps']:7.2f} запр/с "
+                  f"(x{stats['rps'] / baseline:.1f}), p50={stats['p50'] * 1000:.0f} мс "
+                  f"p99={stats['p99'] * 1000:.0f} мс, ошибок {stats['errors']}")
+        print("=" * 60)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест /query")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--requests", type=int, default=64, help="Запросов на уровень (не меньше 2 × параллелизм)")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
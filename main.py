@@ -1,7 +1,7 @@
-import uvicorn
-from src.api.routes import app
-
+# Сервер и приложение импортируются только в основном процессе: процессы пула
+# парсинга (spawn) повторно импортируют этот модуль и не должны загружать модели и БД
 if __name__ == "__main__":
+    import uvicorn
 
     print("=" * 50)
     print("\nAI TUTOR API\n")
@@ -11,7 +11,7 @@ if __name__ == "__main__":
     print("=" * 50)
 
     uvicorn.run(
-        "main:app",
+        "src.api.routes:app",
         host="0.0.0.0",
         port=8000,
         reload=True
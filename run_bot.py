@@ -1,4 +1,5 @@
 import sys
+from src.config import settings
 from src.bot.simple_bot import SimpleTelegramBot
 
 
@@ -9,6 +10,10 @@ def main():
     print("=" * 50)
     print("\n Инициализация бота...\n")
 
+    if settings.bot_mode == "inprocess":
+        print("BOT_MODE=inprocess: бот запускается вместе с API (python main.py)")
+        sys.exit(1)
+
     try:
         bot = SimpleTelegramBot()
         print("Бот инициализирован успешно")
@@ -1,17 +1,31 @@
 from fastapi import FastAPI, HTTPException, UploadFile, File
-from fastapi.responses import JSONResponse
-from typing import List, Optional
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
+from typing import Any, AsyncIterator, List, Optional
+import asyncio
+import json
 import tempfile
-import os
+import time
 from pathlib import Path
 
-from src.models.document import QueryRequest, QueryResponse
+from src.config import settings
+from src.models.document import (
+    QueryRequest,
+    QueryResponse,
+    BatchQueryRequest,
+    BatchQueryResponse,
+    BatchQueryItem,
+)
+from src.models.job import IngestionJob
 from src.pipeline.document_loader import DocumentLoader
 from src.pipeline.chunker import DocumentChunker
 from src.pipeline.embedder import Embedder
-from src.database.vector_store import VectorStore
-from src.services.retrieval_service import RetrievalService
-from src.services.llm_service import LLMService
+from src.database.sharding import create_vector_store
+from src.services.retrieval_service import RetrievalService, AsyncRetrievalService
+from src.services.llm_service import AsyncLLMService
+from src.services.ingestion_service import IngestionService
+from src.services.answer_cache import SemanticAnswerCache
+from src.services.answer_service import AnswerService
 
 app = FastAPI(title="AI Tutor API", version="1.0.0")
 
@@ -19,9 +33,42 @@ document_loader = DocumentLoader()
 chunker = DocumentChunker()
 
 embedder = Embedder()
-vector_store = VectorStore()
+vector_store = create_vector_store()
 retrieval_service = RetrievalService(vector_store, embedder)
-llm_service = LLMService()
+async_retrieval_service = AsyncRetrievalService(retrieval_service)
+llm_service = AsyncLLMService()
+ingestion_service = IngestionService(document_loader, chunker, embedder, vector_store)
+
+answer_cache = SemanticAnswerCache() if settings.answer_cache_enabled else None
+if answer_cache is not None:
+    vector_store.add_change_listener(answer_cache.invalidate)
+answer_service = AnswerService(async_retrieval_service, llm_service, answer_cache)
+
+# Telegram бот в процессе API (BOT_MODE=inprocess)
+telegram_bot = None
+
+
+@app.on_event("startup")
+async def start_telegram_bot():
+    """В режиме BOT_MODE=inprocess запускает бота с общими с API сервисами"""
+    global telegram_bot
+    if settings.bot_mode != "inprocess":
+        return
+    from src.bot.simple_bot import SimpleTelegramBot
+    telegram_bot = SimpleTelegramBot(answer_service)
+    await telegram_bot.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_services():
+    """Дожидается завершения фоновых задач и закрывает соединения при остановке"""
+    if telegram_bot is not None:
+        await telegram_bot.stop()
+    await run_in_threadpool(ingestion_service.shutdown, wait=True)
+    async_retrieval_service.shutdown(wait=True)
+    vector_store.flush()
+    embedder.close()
+    await llm_service.aclose()
 
 
 @app.get("/")
@@ -30,16 +77,16 @@ async def root():
     return {"message": "AI Tutor API", "status": "running"}
 
 
-@app.post("/documents/upload")
+@app.post("/documents/upload", status_code=202)
 async def upload_document(file: UploadFile = File(...)):
     """
-    Загрузка и обработка документа
+    Загрузка документа: файл сохраняется и ставится в очередь на обработку
 
     Args:
         file: Загружаемый файл
 
     Returns:
-        Информация о загруженном документе
+        Идентификатор фоновой задачи
     """
     try:
         # Проверяем расширение файла
@@ -53,45 +100,20 @@ async def upload_document(file: UploadFile = File(...)):
                        f"Поддерживаемые форматы: {', '.join(supported_formats)}"
             )
 
-        # Сохраняем файл временно
+        # Сохраняем файл временно, удалит его фоновая задача
         with tempfile.NamedTemporaryFile(delete=False, suffix=file_extension) as tmp_file:
             content = await file.read()
             tmp_file.write(content)
             tmp_file_path = tmp_file.name
 
-        try:
-            # Загружаем документ
-            documents = document_loader.load_file(tmp_file_path)
-
-            if not documents or not documents[0].content.strip():
-                raise ValueError("Документ пуст или не содержит текста")
-
-            # Разбиваем на чанки
-            chunks = chunker.chunk_documents(documents)
-
-            if not chunks:
-                raise ValueError("Не удалось создать фрагменты документа")
-
-            # Создаем эмбеддинги
-            chunks_with_embeddings = embedder.embed_chunks(chunks)
+        job = ingestion_service.submit_file(tmp_file_path, filename=file.filename, cleanup=True)
 
-            # Сохраняем в векторную БД
-            vector_store.add_chunks(chunks_with_embeddings)
-
-            return {
-                "status": "success",
-                "filename": file.filename,
-                "documents_count": len(documents),
-                "chunks_count": len(chunks),
-                "message": f"Документ '{file.filename}' успешно обработан и добавлен в базу знаний"
-            }
-
-        finally:
-            # Удаляем временный файл
-            try:
-                os.unlink(tmp_file_path)
-            except:
-                pass
+        return {
+            "status": "accepted",
+            "job_id": job.id,
+            "filename": file.filename,
+            "message": f"Документ '{file.filename}' поставлен в очередь на обработку"
+        }
 
     except HTTPException:
         raise
@@ -105,44 +127,59 @@ async def upload_document(file: UploadFile = File(...)):
         )
 
 
-@app.post("/documents/upload-directory")
-async def upload_directory(directory_path: str):
+@app.post("/documents/upload-directory", status_code=202)
+async def upload_directory(directory_path: str, force: bool = False):
     """
-    Загрузка всех документов из директории
+    Инкрементальная загрузка документов из директории в фоновом режиме
+
+    Обрабатываются только новые и измененные файлы, чанки удаленных файлов удаляются.
 
     Args:
         directory_path: Путь к директории
+        force: Переобработать все файлы директории
 
     Returns:
-        Информация о загруженных документах
+        Идентификатор фоновой задачи
     """
-    try:
-        # Загружаем документы
-        documents = document_loader.load_directory(directory_path)
+    if not Path(directory_path).is_dir():
+        raise HTTPException(status_code=404, detail=f"Директория не найдена: {directory_path}")
 
-        if not documents:
-            return {"status": "warning", "message": "Документы не найдены"}
-
-        # Разбиваем на чанки
-        chunks = chunker.chunk_documents(documents)
-
-        # Создаем эмбеддинги
-        chunks_with_embeddings = embedder.embed_chunks(chunks)
-
-        # Сохраняем в векторную БД
-        vector_store.add_chunks(chunks_with_embeddings)
+    try:
+        job = ingestion_service.submit_directory(directory_path, force=force)
 
         return {
-            "status": "success",
-            "documents_count": len(documents),
-            "chunks_count": len(chunks),
-            "message": f"Загружено {len(documents)} документов из {directory_path}"
+            "status": "accepted",
+            "job_id": job.id,
+            "message": f"Загрузка документов из {directory_path} поставлена в очередь"
         }
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Ошибка при загрузке директории: {str(e)}")
 
 
+@app.get("/jobs", response_model=List[IngestionJob])
+async def list_jobs():
+    """Список фоновых задач загрузки"""
+    return ingestion_service.list_jobs()
+
+
+@app.get("/jobs/{job_id}", response_model=IngestionJob)
+async def get_job(job_id: str):
+    """
+    Статус фоновой задачи загрузки
+
+    Args:
+        job_id: Идентификатор задачи
+
+    Returns:
+        Этап, прогресс и длительность этапов задачи
+    """
+    job = ingestion_service.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Задача не найдена: {job_id}")
+    return job
+
+
 @app.post("/query", response_model=QueryResponse)
 async def query(request: QueryRequest):
     """
@@ -156,30 +193,131 @@ async def query(request: QueryRequest):
     """
     try:
         # Получаем релевантный контекст
-        sources, formatted_context = retrieval_service.retrieve_and_format(
+        sources, formatted_context = await async_retrieval_service.retrieve_and_format(
             query=request.query,
             top_k=request.top_k,
             filters=request.filters
         )
 
-        if not sources:
-            return QueryResponse(
-                answer="К сожалению, я не нашел информации в базе знаний, которая могла бы ответить на ваш вопрос. Попробуйте переформулировать запрос или загрузите дополнительные материалы.",
-                sources=[],
-                confidence=0.0
-            )
+        return await answer_service.answer(request.query, sources, formatted_context)
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Ошибка при обработке запроса: {str(e)}")
+
+
+def sse_event(event: str, data: Any) -> str:
+    """Форматирует событие server-sent events с JSON в поле data"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
 
-        # Генерируем ответ с помощью LLM
-        response = llm_service.generate_with_sources(
+@app.post("/query/stream")
+async def query_stream(request: QueryRequest):
+    """
+    Обработка запроса с потоковой выдачей ответа (server-sent events)
+
+    Сначала приходит событие sources с найденными источниками, затем события
+    token с частями ответа по мере генерации и в конце done (или error).
+    Если клиент отключается, генерация в GigaChat прерывается.
+
+    Args:
+        request: Запрос с вопросом пользователя
+
+    Returns:
+        Поток событий text/event-stream
+    """
+    start = time.perf_counter()
+    try:
+        sources, formatted_context = await async_retrieval_service.retrieve_and_format(
             query=request.query,
-            context=formatted_context,
-            sources=sources
+            top_k=request.top_k,
+            filters=request.filters
         )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Ошибка при обработке запроса: {str(e)}")
+
+    async def events() -> AsyncIterator[str]:
+        stream = answer_service.stream(request.query, sources, formatted_context, start)
+        try:
+            async for event, data in stream:
+                yield sse_event(event, data)
+        finally:
+            # При отключении клиента Starlette отменяет отправку — закрываем поток GigaChat
+            await stream.aclose()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # Прокси не должны буферизовать поток
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
-        return response
 
+@app.post("/query/batch", response_model=BatchQueryResponse)
+async def query_batch(request: BatchQueryRequest):
+    """
+    Пакетная обработка вопросов
+
+    Все вопросы векторизуются одним вызовом модели и ищутся одним запросом
+    к векторной БД, затем ответы генерируются параллельно с ограничением
+    batch_llm_concurrency одновременных обращений к LLM.
+
+    Args:
+        request: Пакет вопросов
+
+    Returns:
+        Ответы по каждому вопросу и время этапов
+    """
+    if len(request.queries) > settings.batch_query_max_size:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Слишком много вопросов в пакете: {len(request.queries)}, "
+                   f"максимум {settings.batch_query_max_size}"
+        )
+
+    start = time.perf_counter()
+    try:
+        batch_results = await async_retrieval_service.retrieve_context_batch(
+            request.queries,
+            request.top_k,
+            request.filters
+        )
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Ошибка при обработке запроса: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Ошибка при поиске контекста: {str(e)}")
+    retrieval_time = time.perf_counter() - start
+
+    semaphore = asyncio.Semaphore(settings.batch_llm_concurrency)
+
+    async def answer_one(query_text: str, sources: List[dict]) -> BatchQueryItem:
+        async with semaphore:
+            item_start = time.perf_counter()
+            try:
+                packed_sources, formatted_context = retrieval_service.pack_and_format(sources)
+                response = await answer_service.answer(query_text, packed_sources, formatted_context)
+                return BatchQueryItem(
+                    query=query_text,
+                    response=response,
+                    generation_time=round(time.perf_counter() - item_start, 4)
+                )
+            except Exception as e:
+                return BatchQueryItem(
+                    query=query_text,
+                    error=str(e),
+                    generation_time=round(time.perf_counter() - item_start, 4)
+                )
+
+    generation_start = time.perf_counter()
+    items = await asyncio.gather(*(
+        answer_one(query_text, sources)
+        for query_text, sources in zip(request.queries, batch_results)
+    ))
+    end = time.perf_counter()
+
+    return BatchQueryResponse(
+        results=items,
+        retrieval_time=round(retrieval_time, 4),
+        generation_time=round(end - generation_start, 4),
+        total_time=round(end - start, 4)
+    )
 
 
 @app.get("/stats")
@@ -187,6 +325,12 @@ async def get_stats():
     """Получить статистику по базе знаний"""
     try:
         stats = vector_store.get_stats()
+        stats['embedding_cache'] = embedder.get_cache_stats()
+        stats['query_cache'] = retrieval_service.get_cache_stats()
+        stats['reranker'] = (
+            retrieval_service.reranker.get_stats() if retrieval_service.reranker is not None else None
+        )
+        stats['answer_cache'] = answer_cache.get_stats() if answer_cache is not None else None
         return stats
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Ошибка при получении статистики: {str(e)}")
@@ -197,6 +341,7 @@ async def delete_all_documents():
     """Удалить все документы из базы знаний"""
     try:
         vector_store.delete_all()
+        ingestion_service.manifest.clear()
         return {"status": "success", "message": "Все документы удалены"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Ошибка при удалении документов: {str(e)}")
@@ -0,0 +1,171 @@
+import asyncio
+import json
+import logging
+import random
+import time
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+import httpx
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ApiClient:
+    """
+    HTTP-клиент бота к API сервиса
+
+    Один httpx.AsyncClient с пулом keep-alive соединений живет все время
+    работы бота, поэтому TCP/TLS-соединение не устанавливается заново на
+    каждый вопрос. Ошибки установки соединения повторяются с экспоненциальной
+    задержкой и случайным разбросом — запрос в этом случае еще не отправлен.
+    """
+
+    RETRYABLE_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout)
+
+    def __init__(self, base_url: str = None, max_retries: int = None):
+        """
+        Инициализация клиента
+
+        Args:
+            base_url: Адрес API (по умолчанию settings.server_url)
+            max_retries: Повторов при ошибке соединения
+        """
+        self.base_url = base_url or settings.server_url
+        self.max_retries = max_retries if max_retries is not None else settings.bot_http_max_retries
+
+        http2 = settings.bot_http2
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                logger.warning('HTTP/2 недоступен (pip install "httpx[http2]"), используется HTTP/1.1')
+                http2 = False
+
+        self.client = httpx.AsyncClient(
+            base_url=self.base_url,
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=settings.bot_http_max_connections,
+                max_keepalive_connections=settings.bot_http_max_keepalive,
+                keepalive_expiry=settings.bot_http_keepalive_expiry
+            ),
+            timeout=httpx.Timeout(
+                connect=settings.bot_http_connect_timeout,
+                read=settings.bot_http_read_timeout,
+                write=settings.bot_http_write_timeout,
+                pool=settings.bot_http_pool_timeout
+            )
+        )
+
+    async def _send(self, path: str, payload: Dict[str, Any], stream: bool = False) -> Tuple[httpx.Response, int]:
+        """
+        Отправляет POST-запрос, повторяя ошибки установки соединения
+
+        Returns:
+            Кортеж (ответ, число попыток)
+        """
+        request = self.client.build_request("POST", path, json=payload)
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await self.client.send(request, stream=stream), attempt + 1
+            except self.RETRYABLE_ERRORS as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = min(5.0, 0.2 * 2 ** attempt) * random.uniform(0.5, 1.5)
+                logger.warning(f"Ошибка соединения с API ({e!r}), повтор через {delay:.2f} с")
+                await asyncio.sleep(delay)
+
+    async def query(self, query: str, top_k: int = 5, filters: Optional[dict] = None) -> Dict[str, Any]:
+        """
+        Запрос к /query: ответ целиком
+
+        Args:
+            query: Вопрос пользователя
+            top_k: Количество результатов поиска
+            filters: Фильтры для метаданных
+
+        Returns:
+            Ответ API (answer, sources, confidence)
+        """
+        payload = {"query": query, "top_k": top_k, "filters": filters or {}}
+
+        start = time.perf_counter()
+        response, attempts = await self._send("/query", payload)
+        logger.info(
+            f"POST /query: {response.status_code} за {(time.perf_counter() - start) * 1000:.0f} мс "
+            f"(попыток: {attempts}, {response.http_version})"
+        )
+        response.raise_for_status()
+        return response.json()
+
+    async def stream_query(
+            self,
+            query: str,
+            top_k: int = 5,
+            filters: Optional[dict] = None
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Запрос к /query/stream: события server-sent events по мере генерации ответа
+
+        Args:
+            query: Вопрос пользователя
+            top_k: Количество результатов поиска
+            filters: Фильтры для метаданных
+
+        Yields:
+            Пары (событие, данные): sources, token, done или error
+        """
+        payload = {"query": query, "top_k": top_k, "filters": filters or {}}
+
+        start = time.perf_counter()
+        first_token = None
+        response, attempts = await self._send("/query/stream", payload, stream=True)
+        try:
+            response.raise_for_status()
+            event = "message"
+            async for line in response.aiter_lines():
+                if line.startswith("event:"):
+                    event = line[len("event:"):].strip()
+                elif line.startswith("data:"):
+                    if event == "token" and first_token is None:
+                        first_token = time.perf_counter() - start
+                    yield event, json.loads(line[len("data:"):].strip())
+                elif not line:
+                    event = "message"
+        finally:
+            await response.aclose()
+            first_token_text = f"{first_token * 1000:.0f} мс" if first_token is not None else "нет"
+            logger.info(
+                f"POST /query/stream: {response.status_code}, первый токен {first_token_text}, "
+                f"всего {(time.perf_counter() - start) * 1000:.0f} мс "
+                f"(попыток: {attempts}, {response.http_version})"
+            )
+
+    async def aclose(self) -> None:
+        """Закрывает пул соединений"""
+        await self.client.aclose()
+
+
+def create_api_client(answer_service=None):
+    """
+    Создает клиент бота к сервису по settings.bot_mode
+
+    Args:
+        answer_service: Сервис ответов процесса API (нужен в режиме inprocess)
+
+    Returns:
+        ApiClient (http) или LocalApiClient (inprocess)
+    """
+    if settings.bot_mode == "inprocess":
+        if answer_service is None:
+            raise ValueError(
+                "В режиме BOT_MODE=inprocess бот запускается вместе с API (python main.py), "
+                "а не через run_bot.py"
+            )
+        from src.bot.local_client import LocalApiClient
+        return LocalApiClient(answer_service)
+    if settings.bot_mode != "http":
+        raise ValueError(f"Неизвестный режим бота: {settings.bot_mode} (ожидается http или inprocess)")
+    return ApiClient()
@@ -0,0 +1,130 @@
+import asyncio
+from collections import Counter
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Hashable, Optional, Set
+
+from src.config import settings
+from src.services.cache import LRUCache
+from src.services.rate_limiter import TokenBucket
+
+# Причины отказа в обработке вопроса
+BUSY = "busy"
+IN_FLIGHT = "in_flight"
+RATE_LIMITED = "rate_limited"
+
+
+class Backpressure:
+    """
+    Допуск вопросов к обработке при параллельной работе бота
+
+    Вопрос отклоняется, если у пользователя уже обрабатывается
+    user_max_in_flight вопросов, если он превысил частоту вопросов (ведро
+    токенов на пользователя) или если в боте уже max_pending вопросов в
+    работе и в очереди. Допущенные вопросы отвечаются не более чем
+    max_concurrent одновременно, остальные ждут своей очереди.
+    """
+
+    def __init__(
+            self,
+            max_concurrent: int = None,
+            max_pending: int = None,
+            user_max_in_flight: int = None,
+            user_rate_per_minute: float = None,
+            user_burst: int = None,
+            max_users: int = 10000
+    ):
+        """
+        Инициализация ограничений
+
+        Args:
+            max_concurrent: Вопросов, которые отвечаются одновременно (0 — без ограничения)
+            max_pending: Вопросов в работе и в очереди (0 — без ограничения)
+            user_max_in_flight: Вопросов одного пользователя в работе (0 — без ограничения)
+            user_rate_per_minute: Вопросов в минуту от одного пользователя (0 — без ограничения)
+            user_burst: Вопросов подряд сверх частоты
+            max_users: Пользователей, для которых хранится ведро токенов
+        """
+        max_concurrent = max_concurrent if max_concurrent is not None else settings.bot_max_concurrent_answers
+        self.max_pending = max_pending if max_pending is not None else settings.bot_max_pending
+        self.user_max_in_flight = (
+            user_max_in_flight if user_max_in_flight is not None else settings.bot_user_max_in_flight
+        )
+        self.user_rate_per_minute = (
+            user_rate_per_minute if user_rate_per_minute is not None else settings.bot_user_rate_per_minute
+        )
+        self.user_burst = user_burst if user_burst is not None else settings.bot_user_burst
+
+        self._semaphore = asyncio.Semaphore(max_concurrent) if max_concurrent > 0 else None
+        self._buckets = LRUCache(max_users)
+        self._in_flight: Dict[Hashable, int] = {}
+        self._notified: Set[Hashable] = set()
+        self.pending = 0
+        self.rejected = Counter()
+
+    def _bucket(self, user_id: Hashable) -> TokenBucket:
+        bucket = self._buckets.get(user_id)
+        if bucket is None:
+            bucket = TokenBucket(self.user_rate_per_minute / 60, capacity=max(self.user_burst, 1))
+            self._buckets.put(user_id, bucket)
+        return bucket
+
+    def admit(self, user_id: Hashable) -> Optional[str]:
+        """
+        Решает, брать ли вопрос пользователя в работу
+
+        Допущенный вопрос нужно обработать внутри slot(user_id).
+
+        Args:
+            user_id: Идентификатор пользователя
+
+        Returns:
+            None, если вопрос допущен, иначе причина отказа (BUSY, IN_FLIGHT, RATE_LIMITED)
+        """
+        reason = None
+        if self.user_max_in_flight > 0 and self._in_flight.get(user_id, 0) >= self.user_max_in_flight:
+            reason = IN_FLIGHT
+        elif self.user_rate_per_minute > 0 and not self._bucket(user_id).try_acquire():
+            reason = RATE_LIMITED
+        elif self.max_pending > 0 and self.pending >= self.max_pending:
+            reason = BUSY
+
+        if reason is not None:
+            self.rejected[reason] += 1
+            return reason
+
+        self.pending += 1
+        self._in_flight[user_id] = self._in_flight.get(user_id, 0) + 1
+        self._notified.discard(user_id)
+        return None
+
+    def should_notify(self, user_id: Hashable) -> bool:
+        """
+        Нужно ли отвечать пользователю на отказ
+
+        Отвечаем только на первый отказ подряд: на каждое сообщение спама
+        ответ тратил бы лимиты Telegram.
+        """
+        if user_id in self._notified:
+            return False
+        self._notified.add(user_id)
+        return True
+
+    @asynccontextmanager
+    async def slot(self, user_id: Hashable) -> AsyncIterator[None]:
+        """
+        Ожидает очереди на ответ и освобождает место после обработки
+
+        Args:
+            user_id: Идентификатор пользователя, вопрос которого допущен admit
+        """
+        try:
+            if self._semaphore is None:
+                yield
+            else:
+                async with self._semaphore:
+                    yield
+        finally:
+            self.pending -= 1
+            in_flight = self._in_flight.pop(user_id, 1) - 1
+            if in_flight > 0:
+                self._in_flight[user_id] = in_flight
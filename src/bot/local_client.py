@@ -0,0 +1,60 @@
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+from src.services.answer_service import AnswerService
+
+
+class LocalApiClient:
+    """
+    Клиент бота, вызывающий сервисы в том же процессе, без HTTP
+
+    Интерфейс совпадает с ApiClient. Бот в этом режиме запускается внутри
+    процесса API и использует его AnswerService: модель эмбеддингов,
+    векторное хранилище и кеш ответов общие с API, поэтому загруженные через
+    API документы сразу видны боту, а кеш ответов сбрасывается при их изменении.
+    """
+
+    def __init__(self, answer_service: AnswerService):
+        """
+        Инициализация клиента
+
+        Args:
+            answer_service: Сервис ответов процесса API
+        """
+        self.answer_service = answer_service
+
+    async def query(self, query: str, top_k: int = 5, filters: Optional[dict] = None) -> Dict[str, Any]:
+        """
+        Ответ целиком (см. ApiClient.query)
+
+        Args:
+            query: Вопрос пользователя
+            top_k: Количество результатов поиска
+            filters: Фильтры для метаданных
+
+        Returns:
+            Ответ в формате /query (answer, sources, confidence)
+        """
+        response = await self.answer_service.ask(query, top_k, filters or None)
+        return response.model_dump()
+
+    async def stream_query(
+            self,
+            query: str,
+            top_k: int = 5,
+            filters: Optional[dict] = None
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Ответ потоком событий (см. ApiClient.stream_query)
+
+        Yields:
+            Пары (событие, данные): sources, token, done или error
+        """
+        stream = self.answer_service.stream_query(query, top_k, filters or None)
+        try:
+            async for event in stream:
+                yield event
+        finally:
+            await stream.aclose()
+
+    async def aclose(self) -> None:
+        """Сервисы принадлежат API и закрываются при его остановке"""
@@ -0,0 +1,137 @@
+import asyncio
+import time
+from typing import Optional
+
+from telegram import Message
+from telegram.constants import ParseMode
+from telegram.error import BadRequest, RetryAfter
+
+from src.config import settings
+
+
+def split_position(text: str, max_length: int) -> int:
+    """
+    Позиция разбиения длинного текста: последний перенос строки, иначе пробел
+    во второй половине max_length, чтобы части не получались слишком короткими
+    """
+    split_pos = text.rfind('\n', max_length // 2, max_length)
+    if split_pos == -1:
+        split_pos = text.rfind(' ', max_length // 2, max_length)
+    return split_pos if split_pos > 0 else max_length
+
+
+class ProgressiveMessage:
+    """
+    Ответ бота, который дописывается по мере генерации
+
+    Текст показывается одним сообщением, которое редактируется не чаще
+    edit_interval секунд (лимиты Telegram на редактирование). Когда текст
+    перестает помещаться в max_message_length, текущее сообщение
+    дописывается до границы строки, а продолжение уходит в новое сообщение.
+    """
+
+    def __init__(
+            self,
+            reply_to: Message,
+            prefix: str = "",
+            max_length: int = None,
+            edit_interval: float = None
+    ):
+        """
+        Инициализация ответа
+
+        Args:
+            reply_to: Сообщение пользователя, на которое отвечаем
+            prefix: Начало текста первого сообщения (например, заголовок)
+            max_length: Максимальная длина одного сообщения
+            edit_interval: Минимальный интервал между редактированиями, с
+        """
+        self.reply_to = reply_to
+        self.max_length = max_length or settings.max_message_length
+        self.edit_interval = edit_interval if edit_interval is not None else settings.bot_edit_interval
+
+        self.text = prefix
+        self.messages_sent = 0
+        self.edits = 0
+        self._message: Optional[Message] = None
+        self._shown = ""
+        self._shown_parse_mode: Optional[str] = None
+        self._next_edit = 0.0
+
+    @property
+    def started(self) -> bool:
+        """Отправлено ли уже хотя бы одно сообщение"""
+        return self.messages_sent > 0
+
+    async def append(self, part: str) -> None:
+        """
+        Дописывает часть ответа и при необходимости обновляет сообщение
+
+        Args:
+            part: Очередная часть ответа
+        """
+        self.text += part
+
+        while len(self.text) > self.max_length:
+            split_pos = split_position(self.text, self.max_length)
+            rest = self.text[split_pos:].lstrip()
+            self.text = self.text[:split_pos]
+            await self._show(final=True)
+            self._message = None
+            self._shown = ""
+            self._shown_parse_mode = None
+            self.text = rest
+
+        if time.monotonic() >= self._next_edit:
+            await self._show()
+
+    async def finish(self) -> None:
+        """Показывает итоговый текст с разметкой Markdown"""
+        await self._show(final=True)
+
+    async def _show(self, final: bool = False) -> None:
+        """
+        Отправляет или редактирует текущее сообщение
+
+        Промежуточные обновления при ограничении частоты пропускаются,
+        итоговое ждет окончания ограничения.
+        """
+        text = self.text
+        if not text.strip():
+            return
+        # Итоговый показ повторяет последний, только если тот был без разметки
+        if text == self._shown and (not final or self._shown_parse_mode is not None):
+            return
+
+        parse_mode = ParseMode.MARKDOWN
+        while True:
+            try:
+                await self._send(text, parse_mode)
+                break
+            except RetryAfter as e:
+                delay = e.retry_after
+                delay = delay.total_seconds() if hasattr(delay, 'total_seconds') else float(delay)
+                self._next_edit = time.monotonic() + delay
+                if not final:
+                    return
+                await asyncio.sleep(delay)
+            except BadRequest as e:
+                message = str(e).lower()
+                if "not modified" in message:
+                    break
+                if parse_mode is None or "parse" not in message:
+                    raise
+                # Незакрытая разметка в недописанном ответе — показываем как есть
+                parse_mode = None
+
+        self._shown = text
+        self._shown_parse_mode = parse_mode
+        self._next_edit = time.monotonic() + self.edit_interval
+
+    async def _send(self, text: str, parse_mode: Optional[str]) -> None:
+        if self._message is None:
+            self._message = await self.reply_to.reply_text(text, parse_mode=parse_mode)
+            self.messages_sent += 1
+        else:
+            await self._message.edit_text(text, parse_mode=parse_mode)
+            self.edits += 1
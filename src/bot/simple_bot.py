@@ -1,6 +1,6 @@
 import logging
-import httpx
-from telegram import Update
+
+from telegram import Message, Update
 from telegram.ext import (
     Application,
     CommandHandler,
@@ -11,6 +11,9 @@ from telegram.ext import (
 from telegram.constants import ParseMode, ChatAction
 from telegram.helpers import escape_markdown
 
+from src.bot.api_client import create_api_client
+from src.bot.backpressure import Backpressure, BUSY, IN_FLIGHT
+from src.bot.progressive_message import ProgressiveMessage
 from src.config import settings
 from src.models.document import QueryRequest
 
@@ -21,30 +24,26 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-async def query_api(query: str, top_k: int = 5, filters: dict | None = None):
-    url = settings.server_url + "/query"
-
-    payload = {
-        "query": query,
-        "top_k": top_k,
-        "filters": filters or {}
-    }
-
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        response = await client.post(url, json=payload)
-        response.raise_for_status()
-        return response.json()
-
-
 class SimpleTelegramBot:
     """Простой Telegram бот для ответов на вопросы"""
 
-    def __init__(self):
-        """Инициализация бота"""
+    def __init__(self, answer_service=None):
+        """
+        Инициализация бота
+
+        Args:
+            answer_service: Сервис ответов процесса API, если бот запущен в нем (BOT_MODE=inprocess)
+        """
         self.token = settings.telegram_bot_token
         if not self.token:
             raise ValueError("TELEGRAM_BOT_TOKEN не установлен в .env")
 
+        # Один пул соединений с API (или сервисы процесса API) на все время работы
+        self.api = create_api_client(answer_service)
+        self.application = None
+        # Обновления обрабатываются параллельно: ограничения на пользователя и на очередь
+        self.backpressure = Backpressure()
+
         logger.info("Telegram Bot инициализирован с общими сервисами")
 
     async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -86,67 +85,123 @@ class SimpleTelegramBot:
         user = update.effective_user
         query_text = update.message.text
 
-        await context.bot.send_chat_action(
-            chat_id=update.effective_chat.id,
-            action=ChatAction.TYPING
-        )
+        rejection = self.backpressure.admit(user.id)
+        if rejection is not None:
+            logger.info(f"Вопрос от {user.id} отклонен ({rejection}), в работе: {self.backpressure.pending}")
+            if self.backpressure.should_notify(user.id):
+                await update.message.reply_text(self._rejection_text(rejection))
+            return
 
         logger.info(f"Вопрос от {user.username} ({user.id}): {query_text}")
 
-        try:
-            api_response = await query_api(
-                query=query_text,
-                top_k=settings.top_k,
-                filters={}
+        async with self.backpressure.slot(user.id):
+            await context.bot.send_chat_action(
+                chat_id=update.effective_chat.id,
+                action=ChatAction.TYPING
             )
 
-            answer = api_response.get("answer")
-            sources = api_response.get("sources", [])
-            confidence = api_response.get("confidence")
-
-            answer_text = f"*Ответ:*\n\n{answer}"
-
-            max_length = getattr(settings, 'max_message_length', 4000)
-            logger.info("Ответ: " + answer_text)
-            if len(answer_text) > max_length:
-                chunks = self._split_message(answer_text, max_length)
-                for chunk in chunks:
-                    await update.message.reply_text(
-                        chunk,
-                        parse_mode=ParseMode.MARKDOWN
-                    )
-            else:
+            try:
+                if settings.bot_streaming:
+                    await self._reply_streaming(update.message, query_text)
+                else:
+                    await self._reply_full(update.message, query_text)
+
+                logger.info(f"Ответ отправлен пользователю {user.id}")
+
+            except Exception as e:
+                logger.error(f"Ошибка обработки вопроса: {e}", exc_info=True)
                 await update.message.reply_text(
-                    answer_text,
-                    parse_mode=ParseMode.MARKDOWN
+                    "Извините, произошла ошибка при обработке вашего вопроса.\n"
+                    "Попробуйте еще раз или переформулируйте вопрос."
                 )
 
-            if sources:
-                sources_text = "Источники:\n"
-                for i, source in enumerate(sources[:3], 1):
-                    escaped_file = escape_markdown(source['file'])
-                    sources_text += (
-                        f"{i}. {escaped_file} "
-                        f"(релевантность: {source['similarity']:.0%})\n"
-                    )
+    @staticmethod
+    def _rejection_text(reason: str) -> str:
+        """Ответ пользователю на отклоненный вопрос"""
+        if reason == BUSY:
+            return "Сейчас бот отвечает многим студентам. Пожалуйста, задайте вопрос через минуту."
+        if reason == IN_FLIGHT:
+            return "Я еще отвечаю на ваш предыдущий вопрос. Задайте следующий, когда придет ответ."
+        return "Слишком много вопросов подряд. Пожалуйста, подождите немного и спросите снова."
+
+    async def _reply_full(self, message: Message, query_text: str):
+        """Отвечает после генерации всего ответа (/query)"""
+        api_response = await self.api.query(
+            query=query_text,
+            top_k=settings.top_k,
+            filters={}
+        )
 
-                sources_text += f"Уверенность: {confidence:.0%}"
-                logger.info(f"Текст источников {sources_text}")
+        answer = api_response.get("answer")
+        sources = api_response.get("sources", [])
+        confidence = api_response.get("confidence")
 
-                await update.message.reply_text(
-                    sources_text,
+        answer_text = f"*Ответ:*\n\n{answer}"
+
+        max_length = getattr(settings, 'max_message_length', 4000)
+        logger.info("Ответ: " + answer_text)
+        if len(answer_text) > max_length:
+            chunks = self._split_message(answer_text, max_length)
+            for chunk in chunks:
+                await message.reply_text(
+                    chunk,
                     parse_mode=ParseMode.MARKDOWN
                 )
+        else:
+            await message.reply_text(
+                answer_text,
+                parse_mode=ParseMode.MARKDOWN
+            )
 
-            logger.info(f"Ответ отправлен пользователю {user.id}")
+        await self._reply_sources(message, sources, confidence)
 
-        except Exception as e:
-            logger.error(f"Ошибка обработки вопроса: {e}", exc_info=True)
-            await update.message.reply_text(
-                "Извините, произошла ошибка при обработке вашего вопроса.\n"
-                "Попробуйте еще раз или переформулируйте вопрос."
+    async def _reply_streaming(self, message: Message, query_text: str):
+        """
+        Отвечает по мере генерации (/query/stream): одно сообщение
+        редактируется с ограничением частоты, длинный ответ продолжается в новых
+        """
+        reply = ProgressiveMessage(message, prefix="*Ответ:*\n\n")
+        sources, confidence = [], 0.0
+
+        async for event, data in self.api.stream_query(
+                query=query_text,
+                top_k=settings.top_k,
+                filters={}
+        ):
+            if event == "sources":
+                sources = data.get("sources", [])
+                confidence = data.get("confidence", 0.0)
+            elif event == "token":
+                await reply.append(data["text"])
+            elif event == "error":
+                raise RuntimeError(data.get("detail"))
+
+        await reply.finish()
+        logger.info(f"Ответ: {reply.messages_sent} сообщений, {reply.edits} редактирований")
+
+        await self._reply_sources(message, sources, confidence)
+
+    async def _reply_sources(self, message: Message, sources: list, confidence: float):
+        """Отправляет список источников ответа"""
+        if not sources:
+            return
+
+        sources_text = "Источники:\n"
+        for i, source in enumerate(sources[:3], 1):
+            escaped_file = escape_markdown(source['file'])
+            sources_text += (
+                f"{i}. {escaped_file} "
+                f"(релевантность: {source['similarity']:.0%})\n"
             )
 
+        sources_text += f"Уверенность: {confidence:.0%}"
+        logger.info(f"Текст источников {sources_text}")
+
+        await message.reply_text(
+            sources_text,
+            parse_mode=ParseMode.MARKDOWN
+        )
+
     def _split_message(self, text: str, max_length: int) -> list:
         """Разбивает длинное сообщение на части"""
         chunks = []
@@ -173,12 +228,19 @@ class SimpleTelegramBot:
                 "Произошла непредвиденная ошибка. Попробуйте позже."
             )
 
-    def run(self):
-        """Запуск бота"""
-        logger.info("Запуск Telegram бота...")
-
-        # Создаем приложение
-        application = Application.builder().token(self.token).build()
+    async def _post_shutdown(self, application: Application):
+        """Закрывает соединения с API (или сервисы) при остановке бота"""
+        await self.api.aclose()
+
+    def build_application(self) -> Application:
+        """Создает приложение Telegram с обработчиками"""
+        application = (
+            Application.builder()
+            .token(self.token)
+            .post_shutdown(self._post_shutdown)
+            .concurrent_updates(settings.bot_concurrent_updates)
+            .build()
+        )
 
         # Регистрируем обработчики команд
         application.add_handler(CommandHandler("start", self.start_command))
@@ -191,8 +253,35 @@ class SimpleTelegramBot:
 
         # Регистрируем обработчик ошибок
         application.add_error_handler(self.error_handler)
+        return application
+
+    def run(self):
+        """Запуск бота отдельным процессом (BOT_MODE=http)"""
+        logger.info("Запуск Telegram бота...")
+
+        application = self.build_application()
 
         # Запускаем бота
         logger.info("Бот запущен и готов к работе!")
         logger.info("Отправьте боту любой вопрос для получения ответа")
-        application.run_polling(allowed_updates=Update.ALL_TYPES)
\ No newline at end of file
+        application.run_polling(allowed_updates=Update.ALL_TYPES)
+
+    async def start(self):
+        """Запуск бота в цикле событий процесса API (BOT_MODE=inprocess)"""
+        logger.info("Запуск Telegram бота в процессе API...")
+        self.application = self.build_application()
+        await self.application.initialize()
+        await self.application.start()
+        await self.application.updater.start_polling(allowed_updates=Update.ALL_TYPES)
+        logger.info("Бот запущен и готов к работе!")
+
+    async def stop(self):
+        """Остановка бота, запущенного start()"""
+        if self.application is None:
+            return
+        await self.application.updater.stop()
+        await self.application.stop()
+        await self.application.shutdown()
+        # post_shutdown вызывается только из run_polling
+        await self.api.aclose()
+        self.application = None
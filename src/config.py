@@ -1,16 +1,36 @@
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Dict, Optional
 
 class Settings(BaseSettings):
     # API Keys
     gigachat_credentials: str = YOUR_GIGACHAT_API_KEY
     gigachat_scope: str = "GIGACHAT_API_PERS"
     gigachat_verify_ssl: bool = False
+    gigachat_base_url: Optional[str] = None  # None — адрес по умолчанию; можно указать локальную заглушку
+    gigachat_auth_url: Optional[str] = None
 
     # Embedding settings
     use_gigachat_embeddings: bool = False
     embedding_model: str = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
     embedding_dimension: int = 384  # 384 для sentence-transformers, 1024 для GigaChat
+    embedding_backend: str = "torch"  # torch или onnx (onnxruntime на CPU)
+    embedding_onnx_quantization: Optional[str] = "avx2"  # arm64, avx2, avx512, avx512_vnni; None — fp32
+    embedding_onnx_dir: str = "./models/onnx"  # Куда экспортируется ONNX-модель
+    embedding_token_budget: int = 8192  # Токенов на батч: число текстов × длина самого длинного
+    embedding_max_batch_size: int = 256
+    embedding_pool_workers: int = 0  # Процессов кодирования при загрузке (0/1 — без пула)
+    embedding_pool_min_texts: int = 64  # С какого числа текстов использовать пул
+    embedding_cache_enabled: bool = True  # Дисковый кеш эмбеддингов рядом с векторной БД
+    embedding_cache_max_entries: int = 500_000
+
+    # GigaChat Embeddings
+    gigachat_embeddings_model: str = "Embeddings"
+    gigachat_embeddings_batch_size: int = 16  # Текстов в одном запросе
+    gigachat_embeddings_concurrency: int = 4  # Одновременных запросов
+    gigachat_embeddings_rps: float = 5.0  # Запросов в секунду (0 — без ограничения)
+    gigachat_embeddings_tpm: int = 0  # Токенов в минуту (0 — без ограничения)
+    gigachat_embeddings_max_retries: int = 5
+    chars_per_token: float = 3.0  # Для оценки числа токенов без токенизатора
 
     # Chunking settings
     chunk_size: int = 500
@@ -19,18 +39,84 @@ class Settings(BaseSettings):
     # Vector DB settings
     vector_db_path: str = "./chroma_db"
     collection_name: str = "documents"
+    vector_backend: str = "chroma"  # chroma или flat (NumPy memmap, точный поиск)
+    vector_quantization: Optional[str] = None  # Для flat: None, int8 или pq
+    collection_quantization: Dict[str, str] = {}  # Квантование отдельных коллекций: {"имя": "pq"}
+    quantization_rerank_factor: int = 10  # Кандидатов на точное переранжирование: top_k × factor
+    pq_subvectors: int = 48  # Байт на вектор для pq
+    shard_key: str = ""  # Поле метаданных для шардирования по коллекциям (например, course); пусто — одна коллекция
+    shard_pool_size: int = 32  # Открытых коллекций-шардов в LRU-пуле
+    shard_memory_mb: int = 64  # Оценка памяти шарда Chroma: кеш сегментов = shard_pool_size × shard_memory_mb
+    shard_search_workers: int = 8  # Потоков для параллельного поиска по шардам
+
+    # Ingestion settings
+    loader_workers: int = 1  # Процессов для парсинга файлов (0 — по числу ядер)
+    ingestion_workers: int = 1
+    ingestion_jobs_history: int = 1000
+    ingestion_batch_size: int = 64  # Размер микробатча потокового конвейера
+    ingestion_queue_size: int = 4  # Максимум батчей в очереди между стадиями
 
     # LLM settings
     llm_model: str = "GigaChat"
     llm_temperature: float = 0.5
     max_tokens: int = 1000
+    llm_timeout: float = 60.0  # Секунд на запрос к GigaChat
+    llm_max_concurrency: int = 16  # Одновременных запросов к GigaChat из API
 
     # Retrieval settings
     top_k: int = 5
     similarity_threshold: float = 0.5
+    context_token_budget: int = 1500  # Токенов контекста в промпте LLM (0 — без ограничения)
+    retrieval_workers: int = 4  # Потоков для векторизации и поиска в API
+    batch_query_max_size: int = 500  # Максимум вопросов в /query/batch
+    batch_llm_concurrency: int = 4  # Одновременных обращений к LLM в /query/batch
+    query_cache_size: int = 1024  # LRU эмбеддингов запросов
+    query_cache_ttl: float = 0  # Секунд, 0 — без ограничения
+    retrieval_mode: str = "vector"  # vector или hybrid (вектор + BM25)
+    bm25_enabled: bool = True  # Поддерживать индекс BM25 рядом с коллекцией
+    rrf_k: int = 60  # Константа reciprocal rank fusion
+    hybrid_candidates: int = 3  # Во сколько раз больше top_k кандидатов берется из каждого поиска
+    mmr_enabled: bool = False  # Разнообразить контекст maximal marginal relevance
+    mmr_lambda: float = 0.5  # Баланс релевантности и разнообразия MMR (1 — только релевантность)
+    mmr_candidates: int = 20  # Кандидатов из поиска, из которых MMR выбирает top_k
+
+    # Переранжирование кросс-энкодером
+    rerank_enabled: bool = False
+    rerank_model: str = "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1"
+    rerank_candidates: int = 20  # Кандидатов из поиска на переранжирование
+    rerank_top_n: int = 3  # Чанков в контексте LLM после переранжирования (0 — top_k)
+    rerank_max_length: int = 256  # Токенов на пару (запрос, чанк)
+    rerank_latency_budget_ms: float = 300  # Пропускать переранжирование, если не укладывается (0 — всегда)
+    rerank_cache_size: int = 50_000  # Оценок пар в LRU-кеше
+
+    # Семантический кеш ответов
+    answer_cache_enabled: bool = True
+    answer_cache_similarity: float = 0.95  # Мин. косинусное сходство запросов
+    answer_cache_size: int = 1000
+    answer_cache_ttl: float = 3600  # Секунд, 0 — без ограничения
 
     telegram_bot_token: str = "YOUR_TELEGRAM_BOT_TOKEN"
     max_message_length: int = 4000
+    bot_mode: str = "http"  # http — запросы к API по server_url, inprocess — бот в процессе API с его сервисами
+    bot_streaming: bool = True  # Дописывать ответ в сообщении по мере генерации (/query/stream)
+    bot_edit_interval: float = 1.0  # Секунд между редактированиями сообщения при потоковом ответе
+    # Параллельная обработка сообщений бота и защита от перегрузки
+    bot_concurrent_updates: int = 256  # Сообщений Telegram, обрабатываемых одновременно
+    bot_max_concurrent_answers: int = 16  # Вопросов, которые отвечаются одновременно (0 — без ограничения)
+    bot_max_pending: int = 100  # Вопросов в работе и в очереди, сверх — ответ «бот занят» (0 — без ограничения)
+    bot_user_max_in_flight: int = 1  # Вопросов одного пользователя в работе (0 — без ограничения)
+    bot_user_rate_per_minute: float = 6  # Вопросов в минуту от пользователя (0 — без ограничения)
+    bot_user_burst: int = 3  # Вопросов подряд сверх частоты
+    # HTTP-клиент бота к API: один пул соединений на все время работы
+    bot_http_max_connections: int = 100
+    bot_http_max_keepalive: int = 20  # Соединений, которые держатся открытыми между запросами
+    bot_http_keepalive_expiry: float = 30.0  # Секунд простоя до закрытия соединения
+    bot_http2: bool = False  # HTTP/2 (нужен pip install "httpx[http2]")
+    bot_http_connect_timeout: float = 5.0
+    bot_http_read_timeout: float = 60.0  # Ожидание ответа или очередной части потока
+    bot_http_write_timeout: float = 10.0
+    bot_http_pool_timeout: float = 5.0  # Ожидание свободного соединения из пула
+    bot_http_max_retries: int = 2  # Повторов при ошибке соединения
     server_url: str = "http://localhost:8000"
 
     class Config:
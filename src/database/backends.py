@@ -0,0 +1,269 @@
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from src.config import settings
+
+
+class VectorIndexBackend(ABC):
+    """
+    Интерфейс хранилища векторов, за которым работает VectorStore
+
+    Фильтры задаются в синтаксисе where ChromaDB: {"source": "..."},
+    операторы $eq, $ne, $gt, $gte, $lt, $lte, $in, $nin и $and / $or.
+    Результаты get возвращаются в формате ChromaDB: словарь со списками
+    ids, documents, metadatas и embeddings.
+    """
+
+    name: str = ""
+
+    @abstractmethod
+    def upsert(
+            self,
+            ids: List[str],
+            embeddings: np.ndarray,
+            documents: List[str],
+            metadatas: List[Dict[str, Any]]
+    ) -> None:
+        """Добавляет чанки, существующие id перезаписываются"""
+
+    @abstractmethod
+    def query(
+            self,
+            query_embeddings: np.ndarray,
+            top_k: int,
+            where: Optional[Dict[str, Any]] = None,
+            include_embeddings: bool = False
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Ближайшие по косинусу чанки для каждого запроса
+
+        Returns:
+            Списки словарей id, content, metadata, distance, similarity
+            (и embedding, если include_embeddings) — по одному на запрос
+        """
+
+    @abstractmethod
+    def get(
+            self,
+            ids: Optional[List[str]] = None,
+            where: Optional[Dict[str, Any]] = None,
+            include_embeddings: bool = False,
+            limit: Optional[int] = None,
+            offset: int = 0
+    ) -> Dict[str, Any]:
+        """Чанки по id и/или фильтру"""
+
+    @abstractmethod
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None) -> List[str]:
+        """
+        Удаляет чанки по id и/или фильтру
+
+        Returns:
+            Идентификаторы удаленных чанков
+        """
+
+    @abstractmethod
+    def count(self) -> int:
+        """Количество чанков"""
+
+    @abstractmethod
+    def reset(self) -> None:
+        """Удаляет все чанки"""
+
+    def flush(self) -> None:
+        """Сохраняет отложенные изменения на диск"""
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Статистика бэкенда"""
+        return {'backend': self.name}
+
+
+_chroma_clients: Dict[str, Any] = {}
+_chroma_clients_lock = threading.Lock()
+
+
+def chroma_client(persist_directory: str):
+    """
+    Клиент ChromaDB для каталога, общий для всех коллекций процесса
+
+    При шардировании (settings.shard_key) Chroma держит в памяти коллекции
+    в LRU-кеше сегментов размером shard_pool_size × shard_memory_mb МБ:
+    иначе сегмент каждой открытой за время работы коллекции остается в
+    памяти, даже когда шард вытеснен из пула.
+
+    Args:
+        persist_directory: Путь к БД
+
+    Returns:
+        chromadb.PersistentClient
+    """
+    import chromadb
+    from chromadb.config import Settings as ChromaSettings
+
+    with _chroma_clients_lock:
+        client = _chroma_clients.get(persist_directory)
+        if client is None:
+            cache_settings = {}
+            if settings.shard_key:
+                cache_settings = {
+                    'chroma_segment_cache_policy': "LRU",
+                    'chroma_memory_limit_bytes': settings.shard_pool_size * settings.shard_memory_mb * 1024 * 1024,
+                }
+            client = chromadb.PersistentClient(
+                path=persist_directory,
+                settings=ChromaSettings(
+                    anonymized_telemetry=True,
+                    allow_reset=True,
+                    **cache_settings
+                )
+            )
+            _chroma_clients[persist_directory] = client
+        return client
+
+
+class ChromaBackend(VectorIndexBackend):
+    """ChromaDB: SQLite + HNSW"""
+
+    name = "chroma"
+
+    def __init__(self, persist_directory: str, collection_name: str):
+        self.collection_name = collection_name
+        self.client = chroma_client(persist_directory)
+        self.collection = self._get_collection()
+
+    def _get_collection(self):
+        return self.client.get_or_create_collection(
+            name=self.collection_name,
+            metadata={"hnsw:space": "cosine"}
+        )
+
+    def upsert(
+            self,
+            ids: List[str],
+            embeddings: np.ndarray,
+            documents: List[str],
+            metadatas: List[Dict[str, Any]]
+    ) -> None:
+        # Добавляем в батчах для лучшей производительности
+        batch_size = 100
+        for i in range(0, len(ids), batch_size):
+            batch_end = min(i + batch_size, len(ids))
+
+            self.collection.upsert(
+                ids=ids[i:batch_end],
+                # Chroma принимает списки, поэтому конвертируем только текущий срез
+                embeddings=np.asarray(embeddings[i:batch_end], dtype=np.float32).tolist(),
+                documents=documents[i:batch_end],
+                metadatas=metadatas[i:batch_end]
+            )
+
+    def query(
+            self,
+            query_embeddings: np.ndarray,
+            top_k: int,
+            where: Optional[Dict[str, Any]] = None,
+            include_embeddings: bool = False
+    ) -> List[List[Dict[str, Any]]]:
+        include = ["documents", "metadatas", "distances"]
+        if include_embeddings:
+            include.append("embeddings")
+        results = self.collection.query(
+            query_embeddings=np.asarray(query_embeddings, dtype=np.float32).tolist(),
+            n_results=top_k,
+            where=where or None,
+            include=include
+        )
+
+        all_results = []
+        for q in range(len(results['ids'])):
+            search_results = []
+            for i in range(len(results['ids'][q])):
+                result = {
+                    'id': results['ids'][q][i],
+                    'content': results['documents'][q][i],
+                    'metadata': results['metadatas'][q][i],
+                    'distance': results['distances'][q][i] if 'distances' in results else None,
+                    'similarity': 1 - results['distances'][q][i] if 'distances' in results else None
+                }
+                if include_embeddings:
+                    result['embedding'] = np.asarray(results['embeddings'][q][i], dtype=np.float32)
+                search_results.append(result)
+            all_results.append(search_results)
+
+        return all_results
+
+    def get(
+            self,
+            ids: Optional[List[str]] = None,
+            where: Optional[Dict[str, Any]] = None,
+            include_embeddings: bool = False,
+            limit: Optional[int] = None,
+            offset: int = 0
+    ) -> Dict[str, Any]:
+        include = ["documents", "metadatas"]
+        if include_embeddings:
+            include.append("embeddings")
+        return self.collection.get(
+            ids=ids,
+            where=where or None,
+            include=include,
+            limit=limit,
+            offset=offset or None
+        )
+
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None) -> List[str]:
+        # Возвращаем только реально существующие id
+        ids = self.collection.get(ids=ids, where=where or None, include=[])['ids']
+        if not ids:
+            return []
+
+        batch_size = 1000
+        for i in range(0, len(ids), batch_size):
+            self.collection.delete(ids=ids[i:i + batch_size])
+        return list(ids)
+
+    def count(self) -> int:
+        return self.collection.count()
+
+    def reset(self) -> None:
+        self.client.delete_collection(self.collection_name)
+        # Пересоздаем коллекцию и обновляем ссылку
+        self.collection = self._get_collection()
+
+
+def create_backend(name: str = None, persist_directory: str = None, collection_name: str = None) -> VectorIndexBackend:
+    """
+    Создает бэкенд векторного индекса по имени из настроек
+
+    Args:
+        name: chroma или flat
+        persist_directory: Путь для сохранения БД
+        collection_name: Название коллекции
+
+    Returns:
+        Бэкенд векторного индекса
+    """
+    name = name or settings.vector_backend
+    persist_directory = persist_directory or settings.vector_db_path
+    collection_name = collection_name or settings.collection_name
+
+    # Квантование задается для коллекции, по умолчанию — общее
+    quantization = settings.collection_quantization.get(collection_name, settings.vector_quantization)
+
+    if name == "chroma":
+        if quantization:
+            print(f"Квантование {quantization} поддерживается только бэкендом flat, игнорируется")
+        return ChromaBackend(persist_directory, collection_name)
+    if name == "flat":
+        from src.database.flat_index import FlatIndexBackend
+        return FlatIndexBackend(
+            persist_directory,
+            collection_name,
+            quantization=quantization,
+            rerank_factor=settings.quantization_rerank_factor,
+            pq_subvectors=settings.pq_subvectors
+        )
+    raise ValueError(f"Неизвестный бэкенд векторного индекса: {name}")
@@ -0,0 +1,308 @@
+import math
+import os
+import pickle
+import re
+import threading
+from array import array
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple, Union
+
+import numpy as np
+
+from src.config import settings
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+_CYRILLIC_RE = re.compile(r"[а-яё]")
+
+STOPWORDS = {
+    # Русский
+    "и", "в", "во", "не", "что", "он", "на", "я", "с", "со", "как", "а", "то", "все", "она",
+    "так", "его", "но", "да", "ты", "к", "у", "же", "вы", "за", "бы", "по", "только", "ее",
+    "мне", "было", "вот", "от", "меня", "еще", "нет", "о", "из", "ему", "это", "для", "или",
+    "такое", "такой", "чем", "при", "ли", "если", "же", "быть", "был", "была", "были",
+    # Английский
+    "the", "a", "an", "and", "or", "of", "to", "in", "on", "for", "is", "are", "was", "were",
+    "be", "by", "with", "as", "at", "it", "this", "that", "what", "how", "from",
+}
+
+# Окончания русских слов, отрезаемые простым стеммером (от длинных к коротким)
+_RU_SUFFIXES = sorted({
+    "иями", "ями", "ами", "иях", "иям", "ием", "ией", "ого", "его", "ому", "ему", "ыми", "ими",
+    "ться", "ах", "ях", "ов", "ев", "ой", "ей", "ий", "ый", "ая", "яя", "ое", "ее", "ые", "ие",
+    "ом", "ем", "ам", "ям", "ую", "юю", "ию", "ия", "ии", "ью", "ья", "ье", "ть", "ет", "ит",
+    "ут", "ют", "ат", "ят", "ла", "ло", "ли",
+    "а", "я", "о", "е", "ы", "и", "у", "ю", "ь",
+}, key=len, reverse=True)
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Токенизация для BM25: нижний регистр, слова и идентификаторы,
+    стоп-слова отбрасываются, у русских слов отрезаются окончания
+
+    Args:
+        text: Текст
+
+    Returns:
+        Список термов
+    """
+    terms = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        if len(token) > 4 and _CYRILLIC_RE.search(token):
+            for suffix in _RU_SUFFIXES:
+                if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+                    token = token[:-len(suffix)]
+                    break
+        terms.append(token)
+    return terms
+
+
+class BM25Index:
+    """
+    Инвертированный индекс BM25 в памяти процесса
+
+    Постинги хранятся компактными массивами (номер документа, частота терма),
+    удаление помечает документ как удаленный; при накоплении удаленных индекс
+    перестраивается. Поиск — векторизованный подсчет оценок по постингам термов запроса.
+    """
+
+    FILE_NAME = "bm25_index.pkl"
+    COMMON_TERM_RATIO = 0.01
+
+    def __init__(self, path: Union[str, Path] = None, k1: float = 1.5, b: float = 0.75):
+        """
+        Инициализация индекса
+
+        Args:
+            path: Путь к файлу индекса
+            k1: Параметр насыщения частоты терма
+            b: Параметр нормализации по длине документа
+        """
+        self.path = Path(path) if path else Path(settings.vector_db_path) / self.FILE_NAME
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self._reset()
+        self.load()
+
+    def _reset(self) -> None:
+        self._doc_ids: List[str] = []
+        self._index_by_id: Dict[str, int] = {}
+        self._doc_len = array('f')
+        self._alive = bytearray()
+        self._postings: Dict[str, Tuple[array, array]] = {}
+        self._total_len = 0.0
+        self._alive_count = 0
+        self._dirty = False
+
+    def __len__(self) -> int:
+        return self._alive_count
+
+    def add(self, ids: Iterable[str], texts: Iterable[str]) -> None:
+        """
+        Добавляет (или заменяет) документы
+
+        Args:
+            ids: Идентификаторы чанков
+            texts: Тексты чанков
+        """
+        with self._lock:
+            ids = list(ids)
+            self._remove_unlocked([chunk_id for chunk_id in ids if chunk_id in self._index_by_id])
+
+            for chunk_id, text in zip(ids, texts):
+                terms = tokenize(text)
+                index = len(self._doc_ids)
+                self._doc_ids.append(chunk_id)
+                self._index_by_id[chunk_id] = index
+                self._doc_len.append(len(terms))
+                self._alive.append(1)
+                self._total_len += len(terms)
+                self._alive_count += 1
+
+                frequencies: Dict[str, int] = {}
+                for term in terms:
+                    frequencies[term] = frequencies.get(term, 0) + 1
+                for term, tf in frequencies.items():
+                    postings = self._postings.get(term)
+                    if postings is None:
+                        postings = self._postings[term] = (array('i'), array('f'))
+                    postings[0].append(index)
+                    postings[1].append(tf)
+
+            self._dirty = True
+
+    def remove(self, ids: Iterable[str]) -> None:
+        """
+        Удаляет документы
+
+        Args:
+            ids: Идентификаторы чанков
+        """
+        with self._lock:
+            self._remove_unlocked(list(ids))
+            # Перестраиваем индекс, когда удаленных документов больше трети
+            if len(self._doc_ids) > 1000 and self._alive_count < len(self._doc_ids) * 2 / 3:
+                self._compact()
+
+    def _remove_unlocked(self, ids: List[str]) -> None:
+        for chunk_id in ids:
+            index = self._index_by_id.pop(chunk_id, None)
+            if index is None or not self._alive[index]:
+                continue
+            self._alive[index] = 0
+            self._total_len -= self._doc_len[index]
+            self._alive_count -= 1
+            self._dirty = True
+
+    def _compact(self) -> None:
+        """Перестраивает постинги без удаленных документов"""
+        alive = np.frombuffer(bytes(self._alive), dtype=np.uint8).astype(bool)
+        new_index = np.cumsum(alive) - 1
+
+        postings = {}
+        for term, (indices, tfs) in self._postings.items():
+            indices_np = np.frombuffer(indices, dtype=np.int32)
+            mask = alive[indices_np]
+            if mask.any():
+                postings[term] = (
+                    array('i', new_index[indices_np[mask]].astype(np.int32).tobytes()),
+                    array('f', np.frombuffer(tfs, dtype=np.float32)[mask].tobytes()),
+                )
+
+        keep = np.flatnonzero(alive)
+        self._doc_ids = [self._doc_ids[i] for i in keep]
+        self._index_by_id = {chunk_id: i for i, chunk_id in enumerate(self._doc_ids)}
+        self._doc_len = array('f', np.frombuffer(self._doc_len, dtype=np.float32)[keep].tobytes())
+        self._alive = bytearray(b'\x01' * len(self._doc_ids))
+        self._postings = postings
+        self._dirty = True
+
+    def search(self, query: str, top_k: int) -> List[Tuple[str, float]]:
+        """
+        Поиск по BM25
+
+        Редкие термы запроса оцениваются по всем своим постингам, частые
+        (встречаются больше чем в COMMON_TERM_RATIO документов) лишь добавляют
+        оценку уже найденным кандидатам — как CommonTermsQuery в Lucene.
+        Так длинные постинги почти не влияют на задержку.
+
+        Args:
+            query: Текст запроса
+            top_k: Количество результатов
+
+        Returns:
+            Список (id чанка, оценка) по убыванию оценки
+        """
+        terms = set(tokenize(query))
+
+        with self._lock:
+            if not terms or not self._alive_count:
+                return []
+
+            average_len = self._total_len / self._alive_count or 1.0
+            doc_len = np.frombuffer(self._doc_len, dtype=np.float32)
+
+            rare, common = [], []
+            for term in terms:
+                postings = self._postings.get(term)
+                if postings is None:
+                    continue
+                indices = np.frombuffer(postings[0], dtype=np.int32)
+                tfs = np.frombuffer(postings[1], dtype=np.float32)
+                # df включает удаленные документы — допустимая погрешность до перестройки
+                df = len(indices)
+                idf = math.log(1 + (self._alive_count - df + 0.5) / (df + 0.5))
+                target = common if df > self._alive_count * self.COMMON_TERM_RATIO else rare
+                target.append((indices, tfs, idf))
+
+            if rare:
+                candidates = np.unique(np.concatenate([indices for indices, _, _ in rare]))
+                scores = np.zeros(len(candidates), dtype=np.float32)
+                for indices, tfs, idf in rare + common:
+                    # Постинги отсортированы по номеру документа
+                    positions = np.searchsorted(indices, candidates)
+                    positions[positions == len(indices)] = 0
+                    matched = indices[positions] == candidates
+                    scores[matched] += self._term_scores(
+                        tfs[positions[matched]], doc_len[candidates[matched]], idf, average_len
+                    )
+            elif common:
+                # Только частые термы — плотный подсчет по всем документам
+                candidates = np.arange(len(self._doc_ids))
+                scores = np.zeros(len(candidates), dtype=np.float32)
+                for indices, tfs, idf in common:
+                    scores[indices] += self._term_scores(tfs, doc_len[indices], idf, average_len)
+            else:
+                return []
+
+            if self._alive_count < len(self._doc_ids):
+                alive = np.frombuffer(bytes(self._alive), dtype=np.uint8)
+                scores *= alive[candidates]
+
+            keep = np.flatnonzero(scores > 0)
+            if len(keep) > top_k:
+                keep = keep[np.argpartition(-scores[keep], top_k - 1)[:top_k]]
+            keep = keep[np.argsort(-scores[keep])]
+
+            return [(self._doc_ids[candidates[i]], float(scores[i])) for i in keep]
+
+    def _term_scores(self, tfs: np.ndarray, doc_len: np.ndarray, idf: float, average_len: float) -> np.ndarray:
+        norm = self.k1 * (1 - self.b + self.b * doc_len / average_len)
+        return idf * tfs * (self.k1 + 1) / (tfs + norm)
+
+    def clear(self) -> None:
+        """Очищает индекс и файл на диске"""
+        with self._lock:
+            self._reset()
+            self._dirty = True
+            self.save()
+
+    def save(self) -> None:
+        """Атомарно сохраняет индекс на диск, если он менялся"""
+        with self._lock:
+            if not self._dirty:
+                return
+
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix('.tmp')
+            state = {
+                'version': 1,
+                'doc_ids': self._doc_ids,
+                'doc_len': self._doc_len,
+                'alive': self._alive,
+                'postings': self._postings,
+                'total_len': self._total_len,
+                'alive_count': self._alive_count,
+            }
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+
+    def load(self) -> None:
+        """Загружает индекс с диска"""
+        with self._lock:
+            if not self.path.exists():
+                return
+
+            try:
+                with open(self.path, 'rb') as f:
+                    state = pickle.load(f)
+            except Exception as e:
+                print(f"Индекс BM25 поврежден, будет перестроен: {e}")
+                self._reset()
+                return
+
+            self._doc_ids = state['doc_ids']
+            self._doc_len = state['doc_len']
+            self._alive = state['alive']
+            self._postings = state['postings']
+            self._total_len = state['total_len']
+            self._alive_count = state['alive_count']
+            self._index_by_id = {
+                chunk_id: i for i, chunk_id in enumerate(self._doc_ids) if self._alive[i]
+            }
+            self._dirty = False
@@ -0,0 +1,541 @@
+import json
+import operator
+import os
+import pickle
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from src.database.backends import VectorIndexBackend
+from src.database.quantization import create_quantizer, load_quantizer
+
+_COMPARISONS = {
+    "$gt": operator.gt,
+    "$gte": operator.ge,
+    "$lt": operator.lt,
+    "$lte": operator.le,
+}
+
+
+def _compare(value: Any, op, operand: Any) -> bool:
+    try:
+        return value is not None and bool(op(value, operand))
+    except TypeError:
+        return False
+
+
+class FlatIndexBackend(VectorIndexBackend):
+    """
+    Плоский индекс: нормированные векторы float32 в memory-mapped файле и точный поиск
+
+    Сходство — скалярное произведение со всей матрицей, top-k выбирается
+    argpartition. Тексты и метаданные хранятся в побочной таблице (pickle),
+    фильтры считаются векторно по колонкам метаданных.
+
+    Строки только дописываются: перезапись id помечает старую строку удаленной.
+    Рост и сжатие пишут новый файл векторов следующего поколения, а атомарная
+    запись таблицы метаданных переключает на него — так файл, на который
+    ссылается сохраненная таблица, никогда не меняется на месте, кроме дописанных строк.
+
+    С квантованием (int8 или pq) в памяти держатся только коды векторов: по ним
+    отбирается top_k × rerank_factor кандидатов, которые переранжируются точно
+    по float-векторам из memmap-файла. Квантователь обучается, когда в индексе
+    набирается достаточно векторов; до этого поиск точный.
+    """
+
+    name = "flat"
+    META_FILE = "meta.pkl"
+    INITIAL_CAPACITY = 1024
+    # Максимум элементов матрицы оценок в одном блоке пакетного поиска
+    QUERY_BLOCK_ELEMENTS = 64 * 1024 * 1024
+
+    def __init__(
+            self,
+            persist_directory: str,
+            collection_name: str,
+            quantization: Optional[str] = None,
+            rerank_factor: int = 10,
+            pq_subvectors: int = 48
+    ):
+        """
+        Инициализация индекса
+
+        Args:
+            persist_directory: Путь для сохранения БД
+            collection_name: Название коллекции
+            quantization: None, int8 или pq; при смене квантователь переобучается
+            rerank_factor: Во сколько раз больше top_k кандидатов переранжируется точно
+            pq_subvectors: Число подвекторов (байт на вектор) для pq
+        """
+        self.directory = Path(persist_directory) / f"flat_{collection_name}"
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.quantization = quantization or None
+        self.rerank_factor = rerank_factor
+        self.pq_subvectors = pq_subvectors
+        self._lock = threading.RLock()
+        self._reset_state()
+        self._load()
+
+    def _reset_state(self) -> None:
+        self._dimension: Optional[int] = None
+        self._generation = 0
+        self._vectors: Optional[np.memmap] = None
+        self._size = 0
+        self._ids: List[str] = []
+        self._documents: List[str] = []
+        self._metadatas: List[Dict[str, Any]] = []
+        self._alive = np.zeros(0, dtype=bool)
+        self._alive_count = 0
+        self._row_by_id: Dict[str, int] = {}
+        self._columns: Dict[str, np.ndarray] = {}
+        self._mask_cache: Dict[str, np.ndarray] = {}
+        self._quantizer = None
+        self._codes: Optional[np.ndarray] = None
+        self._encoded = 0
+        self._codes_dirty = False
+        self._dirty = False
+
+    # Хранение
+
+    def _vectors_path(self, generation: int) -> Path:
+        return self.directory / f"vectors.{generation}.f32"
+
+    def _codes_path(self) -> Path:
+        return self.directory / f"codes.{self._generation}.{self._quantizer.version}.npy"
+
+    @property
+    def _capacity(self) -> int:
+        return 0 if self._vectors is None else self._vectors.shape[0]
+
+    def _open_vectors(self, generation: int, capacity: int) -> np.memmap:
+        path = self._vectors_path(generation)
+        mode = 'r+' if path.exists() else 'w+'
+        return np.memmap(path, dtype=np.float32, mode=mode, shape=(capacity, self._dimension))
+
+    def _load(self) -> None:
+        meta_path = self.directory / self.META_FILE
+        if meta_path.exists():
+            with open(meta_path, 'rb') as f:
+                state = pickle.load(f)
+
+            self._dimension = state['dimension']
+            self._generation = state['generation']
+            self._size = state['size']
+            self._ids = state['ids']
+            self._documents = state['documents']
+            self._metadatas = state['metadatas']
+            self._alive = state['alive']
+            self._alive_count = int(self._alive.sum())
+            self._row_by_id = {chunk_id: row for row, chunk_id in enumerate(self._ids) if self._alive[row]}
+
+            path = self._vectors_path(self._generation)
+            capacity = path.stat().st_size // (4 * self._dimension)
+            self._vectors = self._open_vectors(self._generation, capacity)
+
+            quantizer = load_quantizer(state.get('quantizer'))
+            if quantizer is not None and quantizer.name == self.quantization:
+                self._quantizer = quantizer
+                codes_path = self._codes_path()
+                if codes_path.exists():
+                    # В пределах поколения строки только дописываются — префикс кодов валиден
+                    codes = np.load(codes_path)
+                    self._encoded = min(len(codes), self._size)
+                    self._codes = np.empty((capacity, quantizer.code_size), dtype=quantizer.code_dtype)
+                    self._codes[:self._encoded] = codes[:self._encoded]
+
+        self._update_codes()
+        self._remove_stale_generations()
+
+    def _remove_stale_generations(self) -> None:
+        current = set()
+        if self._vectors is not None:
+            current.add(self._vectors_path(self._generation).name)
+            if self._codes is not None:
+                current.add(self._codes_path().name)
+        for path in list(self.directory.glob("vectors.*.f32")) + list(self.directory.glob("codes.*.npy")):
+            if path.name not in current:
+                try:
+                    path.unlink()
+                except OSError:
+                    # На Windows файл может быть еще отображен в память
+                    pass
+
+    def _save_meta(self) -> None:
+        state = {
+            'version': 1,
+            'dimension': self._dimension,
+            'generation': self._generation,
+            'size': self._size,
+            'ids': self._ids,
+            'documents': self._documents,
+            'metadatas': self._metadatas,
+            'alive': self._alive,
+            'quantizer': self._quantizer.get_state() if self._quantizer is not None else None,
+        }
+        meta_path = self.directory / self.META_FILE
+        tmp_path = meta_path.with_suffix('.tmp')
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, meta_path)
+        self._dirty = False
+
+    def _rewrite(self, rows: np.ndarray, capacity: int) -> None:
+        """Переносит строки rows в новый файл векторов следующего поколения"""
+        old_vectors = self._vectors
+        self._generation += 1
+        vectors = self._open_vectors(self._generation, capacity)
+        if len(rows):
+            block = 65536
+            for start in range(0, len(rows), block):
+                chunk = rows[start:start + block]
+                vectors[start:start + len(chunk)] = old_vectors[chunk]
+        vectors.flush()
+        self._vectors = vectors
+
+        if self._codes is not None:
+            codes = np.empty((capacity, self._codes.shape[1]), dtype=self._codes.dtype)
+            encoded = rows[rows < self._encoded]
+            codes[:len(encoded)] = self._codes[encoded]
+            self._codes = codes
+            self._encoded = len(encoded)
+            self._codes_dirty = True
+
+    def _grow(self, required: int) -> None:
+        capacity = max(self.INITIAL_CAPACITY, self._capacity * 2, required)
+        if self._vectors is None:
+            self._vectors = self._open_vectors(self._generation, capacity)
+        else:
+            self._rewrite(np.arange(self._size), capacity)
+        self._dirty = True
+
+    def _compact(self) -> None:
+        """Убирает удаленные строки"""
+        keep = np.flatnonzero(self._alive[:self._size])
+        self._rewrite(keep, max(self.INITIAL_CAPACITY, len(keep) * 2))
+        self._ids = [self._ids[row] for row in keep]
+        self._documents = [self._documents[row] for row in keep]
+        self._metadatas = [self._metadatas[row] for row in keep]
+        self._size = len(keep)
+        self._alive = np.ones(self._size, dtype=bool)
+        self._row_by_id = {chunk_id: row for row, chunk_id in enumerate(self._ids)}
+        self._changed()
+
+    def _update_codes(self) -> None:
+        """Обучает квантователь, когда векторов достаточно, и кодирует новые строки"""
+        if not self.quantization or self._vectors is None:
+            return
+
+        if self._quantizer is None or self._quantizer.name != self.quantization:
+            self._quantizer = create_quantizer(self.quantization, self._dimension, self.pq_subvectors)
+            self._codes = None
+        quantizer = self._quantizer
+
+        if not quantizer.trained:
+            if self._alive_count < quantizer.min_train_size:
+                return
+            rows = np.flatnonzero(self._alive[:self._size])
+            sample = np.random.default_rng(0).choice(rows, min(len(rows), 65536), replace=False)
+            quantizer.train(np.asarray(self._vectors[np.sort(sample)]))
+            self._codes = None
+            self._dirty = True
+
+        if self._codes is None or len(self._codes) < self._capacity:
+            codes = np.empty((self._capacity, quantizer.code_size), dtype=quantizer.code_dtype)
+            if self._codes is None:
+                self._encoded = 0
+            else:
+                codes[:self._encoded] = self._codes[:self._encoded]
+            self._codes = codes
+
+        block = 65536
+        for start in range(self._encoded, self._size, block):
+            end = min(start + block, self._size)
+            self._codes[start:end] = quantizer.encode(np.asarray(self._vectors[start:end]))
+        if self._encoded < self._size:
+            self._encoded = self._size
+            self._codes_dirty = True
+
+    def _changed(self) -> None:
+        self._columns.clear()
+        self._mask_cache.clear()
+        self._dirty = True
+
+    # Фильтры
+
+    def _column(self, key: str) -> np.ndarray:
+        column = self._columns.get(key)
+        if column is None:
+            column = np.empty(self._size, dtype=object)
+            column[:] = [metadata.get(key) for metadata in self._metadatas[:self._size]]
+            self._columns[key] = column
+        return column
+
+    def _condition_mask(self, column: np.ndarray, condition: Any) -> np.ndarray:
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+
+        mask = np.ones(len(column), dtype=bool)
+        for op, operand in condition.items():
+            if op == "$eq":
+                mask &= np.asarray(column == operand, dtype=bool)
+            elif op == "$ne":
+                mask &= np.asarray(column != operand, dtype=bool)
+            elif op in ("$in", "$nin"):
+                values = set(operand)
+                matched = np.fromiter((value in values for value in column), dtype=bool, count=len(column))
+                mask &= matched if op == "$in" else ~matched
+            elif op in _COMPARISONS:
+                compare = _COMPARISONS[op]
+                mask &= np.fromiter(
+                    (_compare(value, compare, operand) for value in column), dtype=bool, count=len(column)
+                )
+            else:
+                raise ValueError(f"Неподдерживаемый оператор фильтра: {op}")
+        return mask
+
+    def _filter_mask(self, where: Dict[str, Any]) -> np.ndarray:
+        mask = np.ones(self._size, dtype=bool)
+        for key, condition in where.items():
+            if key == "$and":
+                for clause in condition:
+                    mask &= self._filter_mask(clause)
+            elif key == "$or":
+                any_mask = np.zeros(self._size, dtype=bool)
+                for clause in condition:
+                    any_mask |= self._filter_mask(clause)
+                mask &= any_mask
+            else:
+                mask &= self._condition_mask(self._column(key), condition)
+        return mask
+
+    def _valid_mask(self, where: Optional[Dict[str, Any]]) -> np.ndarray:
+        """Маска живых строк, подходящих под фильтр (результат кешируется до изменения индекса)"""
+        alive = self._alive[:self._size]
+        if not where:
+            return alive
+
+        key = json.dumps(where, sort_keys=True, default=str)
+        mask = self._mask_cache.get(key)
+        if mask is None:
+            if len(self._mask_cache) >= 64:
+                self._mask_cache.clear()
+            mask = self._mask_cache[key] = alive & self._filter_mask(where)
+        return mask
+
+    def _select_rows(self, ids: Optional[List[str]], where: Optional[Dict[str, Any]]) -> np.ndarray:
+        if ids is not None:
+            rows = np.array([self._row_by_id[chunk_id] for chunk_id in ids if chunk_id in self._row_by_id], dtype=np.int64)
+            if where and len(rows):
+                rows = rows[self._valid_mask(where)[rows]]
+            return rows
+        return np.flatnonzero(self._valid_mask(where))
+
+    # Интерфейс бэкенда
+
+    def upsert(
+            self,
+            ids: List[str],
+            embeddings: np.ndarray,
+            documents: List[str],
+            metadatas: List[Dict[str, Any]]
+    ) -> None:
+        if not ids:
+            return
+
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms > 0, norms, 1.0)
+
+        with self._lock:
+            if self._dimension is None:
+                self._dimension = vectors.shape[1]
+            elif vectors.shape[1] != self._dimension:
+                raise ValueError(
+                    f"Размерность эмбеддингов {vectors.shape[1]} не совпадает с индексом ({self._dimension})"
+                )
+
+            if self._size + len(ids) > self._capacity:
+                self._grow(self._size + len(ids))
+
+            start = self._size
+            self._vectors[start:start + len(ids)] = vectors
+            self._alive = np.concatenate([self._alive[:start], np.ones(len(ids), dtype=bool)])
+
+            for offset, chunk_id in enumerate(ids):
+                previous = self._row_by_id.get(chunk_id)
+                if previous is not None:
+                    self._alive[previous] = False
+                    self._alive_count -= 1
+                self._row_by_id[chunk_id] = start + offset
+                self._alive_count += 1
+
+            self._ids.extend(ids)
+            self._documents.extend(documents)
+            self._metadatas.extend(metadatas)
+            self._size += len(ids)
+            self._update_codes()
+            self._changed()
+
+    def query(
+            self,
+            query_embeddings: np.ndarray,
+            top_k: int,
+            where: Optional[Dict[str, Any]] = None,
+            include_embeddings: bool = False
+    ) -> List[List[Dict[str, Any]]]:
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries.reshape(1, -1)
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries = queries / np.where(norms > 0, norms, 1.0)
+
+        with self._lock:
+            if not self._size:
+                return [[] for _ in range(len(queries))]
+            # Снимок: новые строки дописываются за size, старые не меняются
+            size = self._size
+            vectors = self._vectors
+            mask = self._valid_mask(where).copy()
+            ids, documents, metadatas = self._ids, self._documents, self._metadatas
+            quantizer = self._quantizer if self._encoded == size and self._codes is not None else None
+            codes = self._codes
+
+        candidates = np.flatnonzero(mask)
+        k = min(top_k, len(candidates))
+        if k <= 0:
+            return [[] for _ in range(len(queries))]
+
+        # Селективный фильтр — считаем только по подходящим строкам
+        subset = len(candidates) < size // 4
+        if quantizer is not None:
+            matrix = codes[candidates] if subset else codes[:size]
+            shortlist = min(len(candidates), k * self.rerank_factor)
+        else:
+            matrix = vectors[candidates] if subset else vectors[:size]
+            shortlist = k
+        block = max(1, self.QUERY_BLOCK_ELEMENTS // len(matrix))
+
+        all_results = []
+        for start in range(0, len(queries), block):
+            block_queries = queries[start:start + block]
+            if quantizer is not None:
+                scores = quantizer.scores(matrix, block_queries)
+            else:
+                scores = matrix @ block_queries.T
+            if not subset and len(candidates) < size:
+                scores[~mask] = -np.inf
+
+            top = np.argpartition(-scores, shortlist - 1, axis=0)[:shortlist]
+            for column in range(scores.shape[1]):
+                rows = top[:, column]
+                indexes = candidates[rows] if subset else rows
+                if quantizer is not None:
+                    # Точное переранжирование кандидатов по float-векторам
+                    indexes = np.sort(indexes)
+                    similarities = vectors[indexes] @ block_queries[column]
+                else:
+                    similarities = scores[rows, column]
+                best = np.argsort(-similarities)[:k]
+
+                search_results = []
+                for index, similarity in zip(indexes[best], similarities[best]):
+                    index = int(index)
+                    similarity = float(similarity)
+                    result = {
+                        'id': ids[index],
+                        'content': documents[index],
+                        'metadata': metadatas[index],
+                        'distance': 1 - similarity,
+                        'similarity': similarity
+                    }
+                    if include_embeddings:
+                        result['embedding'] = np.array(vectors[index], dtype=np.float32)
+                    search_results.append(result)
+                all_results.append(search_results)
+
+        return all_results
+
+    def get(
+            self,
+            ids: Optional[List[str]] = None,
+            where: Optional[Dict[str, Any]] = None,
+            include_embeddings: bool = False,
+            limit: Optional[int] = None,
+            offset: int = 0
+    ) -> Dict[str, Any]:
+        with self._lock:
+            rows = self._select_rows(ids, where)
+            rows = rows[offset:offset + limit if limit is not None else None]
+            return {
+                'ids': [self._ids[row] for row in rows],
+                'documents': [self._documents[row] for row in rows],
+                'metadatas': [self._metadatas[row] for row in rows],
+                'embeddings': (
+                    np.asarray(self._vectors[rows]) if include_embeddings and len(rows) else
+                    [] if include_embeddings else None
+                ),
+            }
+
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None) -> List[str]:
+        with self._lock:
+            rows = self._select_rows(ids, where)
+            if not len(rows):
+                return []
+
+            deleted = []
+            for row in rows:
+                chunk_id = self._ids[row]
+                self._alive[row] = False
+                del self._row_by_id[chunk_id]
+                deleted.append(chunk_id)
+            self._alive_count -= len(deleted)
+            self._changed()
+            return deleted
+
+    def count(self) -> int:
+        return self._alive_count
+
+    def reset(self) -> None:
+        with self._lock:
+            self._reset_state()
+            meta_path = self.directory / self.META_FILE
+            if meta_path.exists():
+                meta_path.unlink()
+            self._remove_stale_generations()
+
+    def flush(self) -> None:
+        with self._lock:
+            if not self._dirty and not self._codes_dirty:
+                return
+            # Перестраиваем файл, когда удаленных строк больше трети
+            if self._size > 1000 and self._alive_count < self._size * 2 / 3:
+                self._compact()
+            if self._vectors is not None:
+                self._vectors.flush()
+                if self._codes is not None and self._codes_dirty:
+                    codes_path = self._codes_path()
+                    tmp_path = codes_path.with_suffix('.tmp')
+                    with open(tmp_path, 'wb') as f:
+                        np.save(f, self._codes[:self._encoded])
+                    os.replace(tmp_path, codes_path)
+                    self._codes_dirty = False
+                self._save_meta()
+                self._remove_stale_generations()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            quantized = self._quantizer is not None and self._codes is not None
+            bytes_per_vector = self._quantizer.code_size if quantized else (self._dimension or 0) * 4
+            return {
+                'backend': self.name,
+                'dimension': self._dimension,
+                'rows': self._size,
+                'capacity': self._capacity,
+                'vectors_mb': round(self._capacity * (self._dimension or 0) * 4 / 1024 / 1024, 2),
+                'quantization': self._quantizer.name if quantized else None,
+                # Байт на вектор в оперативной памяти при поиске
+                'bytes_per_vector': bytes_per_vector,
+                'index_memory_mb': round(self._capacity * bytes_per_vector / 1024 / 1024, 2),
+            }
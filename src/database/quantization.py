@@ -0,0 +1,205 @@
+import uuid
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+# Строк на блок при кодировании и приближенном подсчете оценок
+_BLOCK_ROWS = 16384
+
+
+class ScalarQuantizer:
+    """
+    Скалярное квантование int8: каждое измерение линейно отображается
+    в [-128, 127] по минимуму и максимуму обучающей выборки
+
+    Оценка x·q ≈ codes·(scale * q) + offset·q считается без декодирования
+    векторов; 1 байт на измерение вместо 4.
+    """
+
+    name = "int8"
+    code_dtype = np.int8
+    min_train_size = 1000
+
+    def __init__(self, dimension: int):
+        self.dimension = dimension
+        self.scale: Optional[np.ndarray] = None
+        self.offset: Optional[np.ndarray] = None
+        self.version = ""
+
+    @property
+    def trained(self) -> bool:
+        return self.scale is not None
+
+    @property
+    def code_size(self) -> int:
+        """Байт на вектор"""
+        return self.dimension
+
+    def train(self, vectors: np.ndarray) -> None:
+        self.version = uuid.uuid4().hex[:8]
+        low = vectors.min(axis=0)
+        high = vectors.max(axis=0)
+        self.scale = np.maximum((high - low) / 255, 1e-8).astype(np.float32)
+        self.offset = (low + 128 * self.scale).astype(np.float32)
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        codes = np.rint((vectors - self.offset) / self.scale)
+        return np.clip(codes, -128, 127).astype(np.int8)
+
+    def scores(self, codes: np.ndarray, queries: np.ndarray) -> np.ndarray:
+        """Приближенные скалярные произведения: матрица (строки кодов, запросы)"""
+        scaled = (queries * self.scale).T
+        bias = queries @ self.offset
+        scores = np.empty((len(codes), len(queries)), dtype=np.float32)
+        for start in range(0, len(codes), _BLOCK_ROWS):
+            block = codes[start:start + _BLOCK_ROWS].astype(np.float32)
+            scores[start:start + len(block)] = block @ scaled + bias
+        return scores
+
+    def get_state(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'version': self.version,
+            'dimension': self.dimension,
+            'scale': self.scale,
+            'offset': self.offset,
+        }
+
+    def set_state(self, state: Dict[str, Any]) -> None:
+        self.version = state['version']
+        self.scale = state['scale']
+        self.offset = state['offset']
+
+
+class ProductQuantizer:
+    """
+    Продуктовое квантование: вектор делится на подвекторы, каждый заменяется
+    номером ближайшего из 256 центроидов своего подпространства (k-means)
+
+    Оценка считается по таблице скалярных произведений подвекторов запроса
+    с центроидами (ADC); 1 байт на подвектор.
+    """
+
+    name = "pq"
+    code_dtype = np.uint8
+    min_train_size = 4096
+    centroids_count = 256
+    train_sample = 65536
+    train_iterations = 20
+
+    def __init__(self, dimension: int, subvectors: int = 48):
+        self.dimension = dimension
+        # Число подвекторов должно делить размерность
+        self.subvectors = max(m for m in range(1, min(subvectors, dimension) + 1) if dimension % m == 0)
+        self.subdimension = dimension // self.subvectors
+        self.centroids: Optional[np.ndarray] = None
+        self.version = ""
+
+    @property
+    def trained(self) -> bool:
+        return self.centroids is not None
+
+    @property
+    def code_size(self) -> int:
+        """Байт на вектор"""
+        return self.subvectors
+
+    def _split(self, vectors: np.ndarray) -> np.ndarray:
+        return vectors.reshape(len(vectors), self.subvectors, self.subdimension)
+
+    def train(self, vectors: np.ndarray, seed: int = 0) -> None:
+        self.version = uuid.uuid4().hex[:8]
+        rng = np.random.default_rng(seed)
+        if len(vectors) > self.train_sample:
+            vectors = vectors[rng.choice(len(vectors), self.train_sample, replace=False)]
+        parts = self._split(np.asarray(vectors, dtype=np.float32))
+
+        centroids = np.empty((self.subvectors, self.centroids_count, self.subdimension), dtype=np.float32)
+        for j in range(self.subvectors):
+            centroids[j] = self._kmeans(parts[:, j], rng)
+        self.centroids = centroids
+
+    def _kmeans(self, points: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+        k = min(self.centroids_count, len(points))
+        centroids = np.zeros((self.centroids_count, points.shape[1]), dtype=np.float32)
+        centroids[:k] = points[rng.choice(len(points), k, replace=False)]
+
+        for _ in range(self.train_iterations):
+            assignment = self._nearest(points, centroids[:k])
+            counts = np.bincount(assignment, minlength=k)
+            sums = np.stack([
+                np.bincount(assignment, weights=points[:, d], minlength=k) for d in range(points.shape[1])
+            ], axis=1)
+            # Пустые кластеры сохраняют прежний центроид
+            filled = counts > 0
+            centroids[:k][filled] = (sums[filled] / counts[filled, None]).astype(np.float32)
+        return centroids
+
+    @staticmethod
+    def _nearest(points: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        distances = (centroids ** 2).sum(axis=1) - 2 * points @ centroids.T
+        return distances.argmin(axis=1)
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        codes = np.empty((len(vectors), self.subvectors), dtype=np.uint8)
+        for start in range(0, len(vectors), _BLOCK_ROWS):
+            parts = self._split(np.asarray(vectors[start:start + _BLOCK_ROWS], dtype=np.float32))
+            for j in range(self.subvectors):
+                codes[start:start + len(parts), j] = self._nearest(parts[:, j], self.centroids[j])
+        return codes
+
+    def scores(self, codes: np.ndarray, queries: np.ndarray) -> np.ndarray:
+        """Приближенные скалярные произведения: матрица (строки кодов, запросы)"""
+        # Таблица (запрос, подвектор, центроид) скалярных произведений
+        tables = np.einsum('mkd,bmd->bmk', self.centroids, self._split(queries))
+        scores = np.zeros((len(codes), len(queries)), dtype=np.float32)
+        for start in range(0, len(codes), _BLOCK_ROWS):
+            block = codes[start:start + _BLOCK_ROWS]
+            for b in range(len(queries)):
+                column = scores[start:start + len(block), b]
+                for j in range(self.subvectors):
+                    column += tables[b, j, block[:, j]]
+        return scores
+
+    def get_state(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'version': self.version,
+            'dimension': self.dimension,
+            'subvectors': self.subvectors,
+            'centroids': self.centroids,
+        }
+
+    def set_state(self, state: Dict[str, Any]) -> None:
+        self.version = state['version']
+        self.centroids = state['centroids']
+
+
+def create_quantizer(name: Optional[str], dimension: int, subvectors: int = 48):
+    """
+    Создает квантователь по имени
+
+    Args:
+        name: int8, pq или None (без квантования)
+        dimension: Размерность векторов
+        subvectors: Число подвекторов для pq
+
+    Returns:
+        Квантователь или None
+    """
+    if not name:
+        return None
+    if name == ScalarQuantizer.name:
+        return ScalarQuantizer(dimension)
+    if name == ProductQuantizer.name:
+        return ProductQuantizer(dimension, subvectors)
+    raise ValueError(f"Неизвестный тип квантования: {name}")
+
+
+def load_quantizer(state: Optional[Dict[str, Any]]):
+    """Восстанавливает квантователь из сохраненного состояния"""
+    if not state:
+        return None
+    quantizer = create_quantizer(state['name'], state['dimension'], state.get('subvectors', 48))
+    quantizer.set_state(state)
+    return quantizer
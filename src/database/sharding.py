@@ -0,0 +1,524 @@
+import hashlib
+import heapq
+import itertools
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple, Union
+
+import numpy as np
+
+from src.config import settings
+from src.database.vector_store import VectorStore
+from src.models.chunk_batch import ChunkBatch
+from src.models.document import DocumentChunk
+
+# Шард чанков без ключа шардирования — базовая коллекция collection_name
+DEFAULT_SHARD = ""
+
+
+def shard_collection_name(collection_name: str, shard: str) -> str:
+    """
+    Имя коллекции шарда
+
+    Имена коллекций ChromaDB ограничены латиницей, цифрами и «._-» и длиной 63 символа,
+    поэтому к читаемой части добавляется хеш исходного названия.
+
+    Args:
+        collection_name: Базовая коллекция
+        shard: Значение ключа шардирования (например, название курса)
+
+    Returns:
+        Имя коллекции
+    """
+    if shard == DEFAULT_SHARD:
+        return collection_name
+    slug = re.sub(r'[^a-zA-Z0-9_-]+', '-', shard).strip('-_')[:32]
+    digest = hashlib.sha1(shard.encode('utf-8')).hexdigest()[:8]
+    return '-'.join(part for part in (collection_name[:20], slug, digest) if part)
+
+
+class ShardedVectorStore:
+    """
+    Векторное хранилище, разбитое на коллекции по значению поля метаданных
+
+    Чанки при записи раскладываются по коллекциям-шардам по settings.shard_key
+    (например, курсу). Если фильтр запроса задает значение ключа ($eq / $in),
+    поиск идет только по этим шардам, иначе — параллельно по всем с
+    объединением top-k. Открытые шарды держатся в LRU-пуле ограниченного
+    размера, остальные сохраняются на диск и закрываются.
+
+    Интерфейс совпадает с VectorStore.
+    """
+
+    def __init__(
+            self,
+            persist_directory: str = None,
+            collection_name: str = None,
+            shard_key: str = None,
+            pool_size: int = None,
+            search_workers: int = None
+    ):
+        """
+        Инициализация шардированного хранилища
+
+        Args:
+            persist_directory: Путь для сохранения БД
+            collection_name: Базовая коллекция (в ней же чанки без ключа шардирования)
+            shard_key: Поле метаданных, по которому выбирается шард
+            pool_size: Максимум одновременно открытых шардов
+            search_workers: Потоков для параллельного поиска по шардам
+        """
+        self.persist_directory = persist_directory or settings.vector_db_path
+        self.collection_name = collection_name or settings.collection_name
+        self.shard_key = shard_key or settings.shard_key
+        self.pool_size = max(1, pool_size or settings.shard_pool_size)
+        self.registry_path = Path(self.persist_directory) / f"shards_{self.collection_name}.json"
+
+        self._lock = threading.RLock()
+        self._shards: Dict[str, Dict[str, Any]] = {}
+        self._pool: "OrderedDict[str, VectorStore]" = OrderedDict()
+        self._in_use: Dict[str, int] = {}
+        # Вытесненные шарды, которые еще сохраняются на диск
+        self._closing: Dict[str, threading.Event] = {}
+        self._listeners: List[Callable[[Optional[Set[str]], Optional[Set[str]]], None]] = []
+        self.executor = ThreadPoolExecutor(
+            max_workers=search_workers or settings.shard_search_workers,
+            thread_name_prefix="shard-search"
+        )
+
+        self.opened = 0
+        self.evicted = 0
+        self._load_registry()
+
+    def _load_registry(self) -> None:
+        """Читает список шардов с диска"""
+        shards = {}
+        if self.registry_path.exists():
+            try:
+                with open(self.registry_path, 'r', encoding='utf-8') as f:
+                    shards = json.load(f).get('shards', {})
+            except (OSError, ValueError) as e:
+                print(f"Реестр шардов поврежден, будет создан заново: {e}")
+        shards.setdefault(DEFAULT_SHARD, {'collection': self.collection_name, 'count': None})
+        self._shards = shards
+
+    def _save_registry(self) -> None:
+        """Атомарно записывает список шардов на диск"""
+        with self._lock:
+            self.registry_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.registry_path.with_suffix('.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': 1, 'shards': self._shards}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.registry_path)
+
+    def _register(self, shard: str) -> None:
+        with self._lock:
+            if shard in self._shards:
+                return
+            self._shards[shard] = {
+                'collection': shard_collection_name(self.collection_name, shard),
+                # Неизвестно, пока шард не сохранен: такой шард участвует в поиске
+                'count': None
+            }
+            self._save_registry()
+
+    def shard_of(self, metadata: Dict[str, Any]) -> str:
+        """Шард для чанка с данными метаданными"""
+        value = metadata.get(self.shard_key)
+        return str(value).strip() if value is not None else DEFAULT_SHARD
+
+    @contextmanager
+    def _open(self, shard: str) -> Iterator[VectorStore]:
+        """
+        Берет шард из пула, открывая его при необходимости
+
+        Пока шард используется, он не вытесняется из пула — иначе параллельный
+        запрос мог бы открыть второй экземпляр той же коллекции. По той же
+        причине вытесненный шард открывается заново только после сохранения.
+        """
+        while True:
+            with self._lock:
+                closing = self._closing.get(shard)
+                if closing is None:
+                    store = self._pool.get(shard)
+                    if store is None:
+                        store = VectorStore(self.persist_directory, self._shards[shard]['collection'])
+                        store.add_change_listener(self._notify)
+                        self._pool[shard] = store
+                        self.opened += 1
+                    else:
+                        self._pool.move_to_end(shard)
+                    self._in_use[shard] = self._in_use.get(shard, 0) + 1
+                    break
+            closing.wait()
+        try:
+            yield store
+        finally:
+            with self._lock:
+                self._in_use[shard] -= 1
+                evicted = self._evict()
+            self._close(evicted)
+
+    def _evict(self) -> List[Tuple[str, VectorStore]]:
+        """
+        Убирает из пула давно не использованные шарды сверх размера пула
+
+        Вызывается под блокировкой; сохранение на диск — в _close, без нее.
+
+        Returns:
+            Пары (шард, хранилище), которые нужно закрыть
+        """
+        evicted = []
+        for shard in list(self._pool):
+            if len(self._pool) <= self.pool_size:
+                break
+            if self._in_use.get(shard):
+                continue
+            evicted.append((shard, self._pool.pop(shard)))
+            self._closing[shard] = threading.Event()
+            self.evicted += 1
+        return evicted
+
+    def _close(self, evicted: List[Tuple[str, VectorStore]]) -> None:
+        """Сохраняет вытесненные шарды на диск и запоминает число чанков"""
+        for shard, store in evicted:
+            try:
+                store.flush()
+                count = store.backend.count()
+                with self._lock:
+                    self._shards[shard]['count'] = count
+            finally:
+                with self._lock:
+                    self._closing.pop(shard).set()
+
+    def _fan_out(self, shards: List[str], func: Callable[[VectorStore], Any]) -> List[Any]:
+        """Выполняет func для каждого шарда; несколько шардов — параллельно"""
+
+        def run(shard: str) -> Any:
+            with self._open(shard) as store:
+                return func(store)
+
+        if len(shards) == 1:
+            return [run(shards[0])]
+        return list(self.executor.map(run, shards))
+
+    def _route(self, filters: Optional[Dict[str, Any]]) -> List[str]:
+        """Шарды, в которых могут быть чанки, подходящие под фильтр"""
+        with self._lock:
+            # Закрытые пустые шарды не открываем
+            known = [
+                shard for shard, entry in self._shards.items()
+                if shard in self._pool or entry['count'] != 0
+            ]
+        values = self._shard_values(filters) if filters else None
+        if values is None:
+            return known
+        return [shard for shard in known if shard in values]
+
+    def _shard_values(self, where: Dict[str, Any]) -> Optional[Set[str]]:
+        """
+        Значения ключа шардирования, допустимые фильтром
+
+        Returns:
+            Множество значений или None, если фильтр ключ не ограничивает
+        """
+        condition = where.get(self.shard_key)
+        if condition is not None:
+            if not isinstance(condition, dict):
+                return {str(condition)}
+            if '$eq' in condition:
+                return {str(condition['$eq'])}
+            if '$in' in condition:
+                return {str(value) for value in condition['$in']}
+            return None
+
+        if '$and' in where:
+            values = None
+            for clause in where['$and']:
+                clause_values = self._shard_values(clause)
+                if clause_values is not None:
+                    values = clause_values if values is None else values & clause_values
+            return values
+
+        if '$or' in where:
+            values = set()
+            for clause in where['$or']:
+                clause_values = self._shard_values(clause)
+                if clause_values is None:
+                    return None
+                values |= clause_values
+            return values
+
+        return None
+
+    @property
+    def keyword_search_enabled(self) -> bool:
+        """Поддерживается ли индекс BM25"""
+        return settings.bm25_enabled
+
+    def flush(self) -> None:
+        """
+        Сохраняет на диск открытые шарды и реестр
+
+        Шарды сохраняются без блокировки, чтобы не останавливать поиск; на это
+        время они закрепляются в пуле, как при использовании.
+        """
+        with self._lock:
+            pooled = list(self._pool.items())
+            for shard, _ in pooled:
+                self._in_use[shard] = self._in_use.get(shard, 0) + 1
+
+        counts = {}
+        try:
+            for shard, store in pooled:
+                store.flush()
+                counts[shard] = store.backend.count()
+        finally:
+            with self._lock:
+                for shard, _ in pooled:
+                    self._in_use[shard] -= 1
+                for shard, count in counts.items():
+                    self._shards[shard]['count'] = count
+                self._save_registry()
+                evicted = self._evict()
+            self._close(evicted)
+
+    def add_change_listener(
+            self,
+            listener: Callable[[Optional[Set[str]], Optional[Set[str]]], None]
+    ) -> None:
+        """
+        Подписывает обработчик на изменения любого шарда
+
+        Args:
+            listener: Обработчик изменений (см. VectorStore.add_change_listener)
+        """
+        self._listeners.append(listener)
+
+    def _notify(self, sources: Optional[Set[str]] = None, chunk_ids: Optional[Set[str]] = None) -> None:
+        for listener in self._listeners:
+            try:
+                listener(sources, chunk_ids)
+            except Exception as e:
+                print(f"Ошибка обработчика изменений векторной БД: {e}")
+
+    def add_chunks(self, chunks: List[DocumentChunk]) -> None:
+        """
+        Добавляет чанки в векторную БД
+
+        Args:
+            chunks: Список чанков с эмбеддингами
+        """
+        self.add_batch(ChunkBatch.from_chunks(chunks))
+
+    def add_batch(self, batch: ChunkBatch) -> None:
+        """
+        Раскладывает батч чанков по шардам и добавляет в векторную БД
+
+        Args:
+            batch: Батч чанков с эмбеддингами
+        """
+        rows_by_shard: Dict[str, List[int]] = {}
+        for row, metadata in enumerate(batch.metadatas):
+            rows_by_shard.setdefault(self.shard_of(metadata), []).append(row)
+
+        for shard, rows in rows_by_shard.items():
+            if len(rows) == len(batch):
+                shard_batch = batch
+            else:
+                shard_batch = ChunkBatch(
+                    ids=[batch.ids[row] for row in rows],
+                    texts=[batch.texts[row] for row in rows],
+                    metadatas=[batch.metadatas[row] for row in rows],
+                    embeddings=batch.embeddings[rows] if batch.embeddings is not None else None
+                )
+            self._register(shard)
+            with self._open(shard) as store:
+                store.add_batch(shard_batch)
+                count = store.backend.count()
+            with self._lock:
+                self._shards[shard]['count'] = count
+
+        # Реестр с числом чанков нужен после перезапуска, даже если flush не успел
+        self._save_registry()
+
+    def search(
+            self,
+            query_embedding: List[float],
+            top_k: int = None,
+            filters: Optional[Dict[str, Any]] = None,
+            include_embeddings: bool = False
+    ) -> List[Dict[str, Any]]:
+        """
+        Поиск наиболее похожих векторов (см. VectorStore.search)
+        """
+        return self.search_many(
+            [query_embedding], top_k=top_k, filters=filters, include_embeddings=include_embeddings
+        )[0]
+
+    def search_many(
+            self,
+            query_embeddings: Union[np.ndarray, List[List[float]]],
+            top_k: int = None,
+            filters: Optional[Dict[str, Any]] = None,
+            include_embeddings: bool = False
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Поиск по подходящим шардам с объединением top-k
+
+        Args:
+            query_embeddings: Векторы запросов (матрица или список списков)
+            top_k: Количество результатов на запрос
+            filters: Фильтры для метаданных; значение ключа шардирования сужает набор шардов
+            include_embeddings: Добавить в результаты векторы чанков (поле embedding)
+
+        Returns:
+            Списки найденных документов, по одному на запрос
+        """
+        top_k = top_k or settings.top_k
+        query_embeddings = np.asarray(query_embeddings, dtype=np.float32)
+        shards = self._route(filters)
+        if not len(query_embeddings) or not shards:
+            return [[] for _ in range(len(query_embeddings))]
+
+        per_shard = self._fan_out(
+            shards,
+            lambda store: store.search_many(
+                query_embeddings, top_k=top_k, filters=filters, include_embeddings=include_embeddings
+            )
+        )
+        return [
+            heapq.nlargest(
+                top_k,
+                itertools.chain.from_iterable(results[q] for results in per_shard),
+                key=lambda result: result['similarity'] or 0.0
+            )
+            for q in range(len(query_embeddings))
+        ]
+
+    def keyword_search(
+            self,
+            query: str,
+            query_embedding: Union[np.ndarray, List[float]],
+            top_k: int = None,
+            filters: Optional[Dict[str, Any]] = None,
+            include_embeddings: bool = False
+    ) -> List[Dict[str, Any]]:
+        """
+        Поиск BM25 по подходящим шардам (см. VectorStore.keyword_search)
+
+        Статистика термов у каждого шарда своя, поэтому оценки BM25 разных
+        шардов сравнимы лишь приближенно.
+        """
+        top_k = top_k or settings.top_k
+        shards = self._route(filters)
+        if not shards:
+            return []
+
+        per_shard = self._fan_out(
+            shards,
+            lambda store: store.keyword_search(
+                query, query_embedding, top_k=top_k, filters=filters, include_embeddings=include_embeddings
+            )
+        )
+        return heapq.nlargest(
+            top_k,
+            itertools.chain.from_iterable(per_shard),
+            key=lambda result: result['bm25_score']
+        )
+
+    def delete_by_source(self, source: str) -> None:
+        """
+        Удаляет документы по источнику во всех шардах
+
+        Args:
+            source: Источник документа
+        """
+        with self._lock:
+            shards = list(self._shards)
+        self._fan_out(shards, lambda store: store.delete_by_source(source))
+
+    def delete_by_ids(self, ids: List[str]) -> List[str]:
+        """
+        Удаляет чанки по идентификаторам, обходя шарды, пока не найдены все
+
+        Args:
+            ids: Идентификаторы чанков
+
+        Returns:
+            Идентификаторы удаленных чанков
+        """
+        remaining = set(ids)
+        with self._lock:
+            shards = list(self._shards)
+
+        deleted: List[str] = []
+        for shard in shards:
+            if not remaining:
+                break
+            with self._open(shard) as store:
+                shard_deleted = store.delete_by_ids(list(remaining))
+            remaining.difference_update(shard_deleted)
+            deleted.extend(shard_deleted)
+        return deleted
+
+    def delete_all(self) -> None:
+        """Очищает все шарды"""
+        with self._lock:
+            shards = list(self._shards)
+        for shard in shards:
+            with self._open(shard) as store:
+                store.delete_all()
+        with self._lock:
+            for entry in self._shards.values():
+                entry['count'] = 0
+            self._save_registry()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Статистика по шардам
+
+        Число чанков закрытых шардов берется из реестра (на момент их закрытия).
+
+        Returns:
+            Словарь со статистикой
+        """
+        with self._lock:
+            counts = {}
+            for shard, entry in self._shards.items():
+                store = self._pool.get(shard)
+                counts[shard] = store.backend.count() if store is not None else entry['count']
+            return {
+                'collection_name': self.collection_name,
+                'total_chunks': sum(count or 0 for count in counts.values()),
+                'persist_directory': self.persist_directory,
+                'shard_key': self.shard_key,
+                'shards': len(self._shards),
+                'open_shards': len(self._pool),
+                'shard_pool_size': self.pool_size,
+                'shards_opened': self.opened,
+                'shards_evicted': self.evicted,
+                'shard_chunks': {shard or self.collection_name: count for shard, count in counts.items()},
+            }
+
+
+def create_vector_store(persist_directory: str = None, collection_name: str = None):
+    """
+    Создает векторное хранилище: шардированное, если задан settings.shard_key
+
+    Args:
+        persist_directory: Путь для сохранения БД
+        collection_name: Название (базовой) коллекции
+
+    Returns:
+        VectorStore или ShardedVectorStore
+    """
+    if settings.shard_key:
+        return ShardedVectorStore(persist_directory, collection_name)
+    return VectorStore(persist_directory, collection_name)
@@ -1,6 +1,9 @@
-from typing import List, Dict, Any, Optional
-import chromadb
-from chromadb.config import Settings as ChromaSettings
+from pathlib import Path
+from typing import Callable, List, Dict, Any, Optional, Set, Union
+import numpy as np
+from src.database.backends import VectorIndexBackend, create_backend
+from src.database.bm25_index import BM25Index
+from src.models.chunk_batch import ChunkBatch
 from src.models.document import DocumentChunk
 from src.config import settings
 
@@ -8,29 +11,88 @@ from src.config import settings
 class VectorStore:
     """Хранилище векторных представлений документов"""
 
-    def __init__(self, persist_directory: str = None, collection_name: str = None):
+    def __init__(
+            self,
+            persist_directory: str = None,
+            collection_name: str = None,
+            backend: Union[str, VectorIndexBackend] = None
+    ):
         """
         Инициализация векторного хранилища
 
         Args:
             persist_directory: Путь для сохранения БД
             collection_name: Название коллекции
+            backend: Бэкенд векторного индекса или его имя (chroma, flat);
+                по умолчанию settings.vector_backend
         """
         self.persist_directory = persist_directory or settings.vector_db_path
         self.collection_name = collection_name or settings.collection_name
 
-        self.client = chromadb.PersistentClient(
-            path=self.persist_directory,
-            settings=ChromaSettings(
-                anonymized_telemetry=True,
-                allow_reset=True
+        if isinstance(backend, VectorIndexBackend):
+            self.backend = backend
+        else:
+            self.backend = create_backend(backend, self.persist_directory, self.collection_name)
+
+        self._listeners: List[Callable[[Optional[Set[str]], Optional[Set[str]]], None]] = []
+
+        self.keyword_index: Optional[BM25Index] = None
+        if settings.bm25_enabled:
+            self.keyword_index = BM25Index(
+                Path(self.persist_directory) / f"bm25_{self.collection_name}.pkl"
             )
-        )
+            if len(self.keyword_index) != self.backend.count():
+                self.rebuild_keyword_index()
 
-        self.collection = self.client.get_or_create_collection(
-            name=self.collection_name,
-            metadata={"hnsw:space": "cosine"}
-        )
+    def rebuild_keyword_index(self, page_size: int = 5000) -> None:
+        """Перестраивает индекс BM25 по содержимому коллекции"""
+        if self.keyword_index is None:
+            return
+
+        print("Перестроение индекса BM25...")
+        self.keyword_index.clear()
+        offset = 0
+        while True:
+            page = self.backend.get(limit=page_size, offset=offset)
+            if not page['ids']:
+                break
+            self.keyword_index.add(page['ids'], page['documents'])
+            offset += len(page['ids'])
+        self.keyword_index.save()
+        print(f"Индекс BM25 перестроен: {len(self.keyword_index)} чанков")
+
+    @property
+    def keyword_search_enabled(self) -> bool:
+        """Поддерживается ли индекс BM25"""
+        return self.keyword_index is not None
+
+    def flush(self) -> None:
+        """Сохраняет на диск данные, которые пишутся отложенно (индекс BM25, плоский индекс)"""
+        self.backend.flush()
+        if self.keyword_index is not None:
+            self.keyword_index.save()
+
+    def add_change_listener(
+            self,
+            listener: Callable[[Optional[Set[str]], Optional[Set[str]]], None]
+    ) -> None:
+        """
+        Подписывает обработчик на изменения коллекции
+
+        Обработчик получает (источники, id чанков); None в обоих аргументах
+        означает, что изменилось все.
+
+        Args:
+            listener: Обработчик изменений
+        """
+        self._listeners.append(listener)
+
+    def _notify(self, sources: Optional[Set[str]] = None, chunk_ids: Optional[Set[str]] = None) -> None:
+        for listener in self._listeners:
+            try:
+                listener(sources, chunk_ids)
+            except Exception as e:
+                print(f"Ошибка обработчика изменений векторной БД: {e}")
 
     def add_chunks(self, chunks: List[DocumentChunk]) -> None:
         """
@@ -39,33 +101,41 @@ class VectorStore:
         Args:
             chunks: Список чанков с эмбеддингами
         """
-        if not chunks:
+        self.add_batch(ChunkBatch.from_chunks(chunks))
+
+    def add_batch(self, batch: ChunkBatch) -> None:
+        """
+        Добавляет батч чанков с матрицей эмбеддингов в векторную БД
+
+        Args:
+            batch: Батч чанков с эмбеддингами
+        """
+        if not len(batch):
             return
 
-        ids = [chunk.id for chunk in chunks]
-        embeddings = [chunk.embedding for chunk in chunks]
-        documents = [chunk.content for chunk in chunks]
-        metadatas = [chunk.metadata for chunk in chunks]
-
-        # Добавляем в батчах для лучшей производительности
-        batch_size = 100
-        for i in range(0, len(chunks), batch_size):
-            batch_end = min(i + batch_size, len(chunks))
-
-            self.collection.add(
-                ids=ids[i:batch_end],
-                embeddings=embeddings[i:batch_end],
-                documents=documents[i:batch_end],
-                metadatas=metadatas[i:batch_end]
-            )
+        # upsert: id чанков детерминированы, повторная загрузка не создает дубликатов
+        self.backend.upsert(
+            ids=batch.ids,
+            embeddings=batch.embeddings,
+            documents=batch.texts,
+            metadatas=batch.metadatas
+        )
 
-        print(f"Добавлено {len(chunks)} чанков в векторную БД")
+        if self.keyword_index is not None:
+            self.keyword_index.add(batch.ids, batch.texts)
+
+        print(f"Добавлено {len(batch)} чанков в векторную БД")
+        self._notify(
+            sources={metadata.get('source') for metadata in batch.metadatas},
+            chunk_ids=set(batch.ids)
+        )
 
     def search(
             self,
             query_embedding: List[float],
             top_k: int = None,
-            filters: Optional[Dict[str, Any]] = None
+            filters: Optional[Dict[str, Any]] = None,
+            include_embeddings: bool = False
     ) -> List[Dict[str, Any]]:
         """
         Поиск наиболее похожих векторов
@@ -74,30 +144,113 @@ class VectorStore:
             query_embedding: Вектор запроса
             top_k: Количество результатов
             filters: Фильтры для метаданных
+            include_embeddings: Добавить в результаты векторы чанков (поле embedding)
 
         Returns:
             Список найденных документов с метаданными
         """
+        return self.search_many(
+            [query_embedding], top_k=top_k, filters=filters, include_embeddings=include_embeddings
+        )[0]
+
+    def search_many(
+            self,
+            query_embeddings: Union[np.ndarray, List[List[float]]],
+            top_k: int = None,
+            filters: Optional[Dict[str, Any]] = None,
+            include_embeddings: bool = False
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Поиск сразу для нескольких запросов одним обращением к коллекции
+
+        Args:
+            query_embeddings: Векторы запросов (матрица или список списков)
+            top_k: Количество результатов на запрос
+            filters: Фильтры для метаданных (общие для всех запросов)
+            include_embeddings: Добавить в результаты векторы чанков (поле embedding)
+
+        Returns:
+            Списки найденных документов, по одному на запрос
+        """
         top_k = top_k or settings.top_k
+        query_embeddings = np.asarray(query_embeddings, dtype=np.float32)
+        if not len(query_embeddings):
+            return []
 
-        results = self.collection.query(
-            query_embeddings=[query_embedding],
-            n_results=top_k,
-            where=filters
+        return self.backend.query(
+            query_embeddings,
+            top_k=top_k,
+            where=filters or None,
+            include_embeddings=include_embeddings
         )
 
-        search_results = []
-        for i in range(len(results['ids'][0])):
+    def keyword_search(
+            self,
+            query: str,
+            query_embedding: Union[np.ndarray, List[float]],
+            top_k: int = None,
+            filters: Optional[Dict[str, Any]] = None,
+            include_embeddings: bool = False
+    ) -> List[Dict[str, Any]]:
+        """
+        Поиск по ключевым словам (BM25)
+
+        Сходство результатов считается косинусом с вектором запроса, поэтому
+        их можно сравнивать и смешивать с результатами векторного поиска.
+
+        Args:
+            query: Текст запроса
+            query_embedding: Вектор запроса
+            top_k: Количество результатов
+            filters: Фильтры для метаданных
+            include_embeddings: Добавить в результаты векторы чанков (поле embedding)
+
+        Returns:
+            Список найденных документов в порядке BM25
+        """
+        if self.keyword_index is None:
+            return []
+
+        top_k = top_k or settings.top_k
+        # С фильтрами часть кандидатов отсеется, поэтому берем с запасом
+        hits = self.keyword_index.search(query, top_k * 4 if filters else top_k)
+        if not hits:
+            return []
+
+        ids = [chunk_id for chunk_id, _ in hits]
+        found = self.backend.get(ids=ids, where=filters or None, include_embeddings=True)
+        by_id = {
+            chunk_id: (document, metadata, embedding)
+            for chunk_id, document, metadata, embedding in zip(
+                found['ids'], found['documents'], found['metadatas'], found['embeddings']
+            )
+        }
+
+        query_vector = np.asarray(query_embedding, dtype=np.float32)
+        query_norm = np.linalg.norm(query_vector) or 1.0
+
+        results = []
+        for chunk_id, score in hits:
+            if chunk_id not in by_id:
+                continue
+            document, metadata, embedding = by_id[chunk_id]
+            vector = np.asarray(embedding, dtype=np.float32)
+            similarity = float(vector @ query_vector / ((np.linalg.norm(vector) or 1.0) * query_norm))
             result = {
-                'id': results['ids'][0][i],
-                'content': results['documents'][0][i],
-                'metadata': results['metadatas'][0][i],
-                'distance': results['distances'][0][i] if 'distances' in results else None,
-                'similarity': 1 - results['distances'][0][i] if 'distances' in results else None
+                'id': chunk_id,
+                'content': document,
+                'metadata': metadata,
+                'distance': 1 - similarity,
+                'similarity': similarity,
+                'bm25_score': score
             }
-            search_results.append(result)
+            if include_embeddings:
+                result['embedding'] = vector
+            results.append(result)
+            if len(results) >= top_k:
+                break
 
-        return search_results
+        return results
 
     def delete_by_source(self, source: str) -> None:
         """
@@ -106,20 +259,41 @@ class VectorStore:
         Args:
             source: Источник документа
         """
-        self.collection.delete(where={"source": source})
+        ids = self.backend.delete(where={"source": source})
+        if self.keyword_index is not None:
+            self.keyword_index.remove(ids)
         print(f"Удалены документы из источника: {source}")
+        self._notify(sources={source}, chunk_ids=set(ids))
+
+    def delete_by_ids(self, ids: List[str]) -> List[str]:
+        """
+        Удаляет чанки по идентификаторам
+
+        Args:
+            ids: Идентификаторы чанков
+
+        Returns:
+            Идентификаторы удаленных чанков (отсутствующие в коллекции пропускаются)
+        """
+        if not ids:
+            return []
+
+        deleted = self.backend.delete(ids=ids)
+        if not deleted:
+            return []
+        if self.keyword_index is not None:
+            self.keyword_index.remove(deleted)
+        print(f"Удалено {len(deleted)} чанков")
+        self._notify(sources=set(), chunk_ids=set(deleted))
+        return deleted
 
     def delete_all(self) -> None:
         """Удаляет все документы из коллекции"""
-        self.client.delete_collection(self.collection_name)
+        self.backend.reset()
         print("Все документы удалены из векторной БД")
-
-        # Пересоздаем коллекцию и обновляем ссылку
-        self.collection = self.client.get_or_create_collection(
-            name=self.collection_name,
-            metadata={"hnsw:space": "cosine"}
-        )
-        print("Коллекция векторной БД пересоздана")
+        if self.keyword_index is not None:
+            self.keyword_index.clear()
+        self._notify()
 
     def get_stats(self) -> Dict[str, Any]:
         """
@@ -128,9 +302,11 @@ class VectorStore:
         Returns:
             Словарь со статистикой
         """
-        count = self.collection.count()
+        count = self.backend.count()
         return {
             'collection_name': self.collection_name,
             'total_chunks': count,
-            'persist_directory': self.persist_directory
+            'persist_directory': self.persist_directory,
+            'keyword_index_chunks': len(self.keyword_index) if self.keyword_index is not None else None,
+            **self.backend.get_stats()
         }
\ No newline at end of file
@@ -0,0 +1,71 @@
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from src.models.document import DocumentChunk
+
+
+class ChunkBatch:
+    """
+    Компактный батч чанков для внутреннего конвейера
+
+    Эмбеддинги хранятся одной матрицей float32 (n × dim), остальные поля —
+    параллельными списками. Pydantic-модели DocumentChunk нужны только на границе API.
+    """
+
+    __slots__ = ('ids', 'texts', 'metadatas', 'embeddings')
+
+    def __init__(
+            self,
+            ids: List[str],
+            texts: List[str],
+            metadatas: List[Dict[str, Any]],
+            embeddings: Optional[np.ndarray] = None
+    ):
+        """
+        Инициализация батча
+
+        Args:
+            ids: Идентификаторы чанков
+            texts: Тексты чанков
+            metadatas: Метаданные чанков
+            embeddings: Матрица эмбеддингов float32 или None
+        """
+        self.ids = ids
+        self.texts = texts
+        self.metadatas = metadatas
+        self.embeddings = embeddings
+
+    @classmethod
+    def from_chunks(cls, chunks: List[DocumentChunk]) -> "ChunkBatch":
+        """Собирает батч из pydantic-чанков"""
+        embeddings = None
+        if chunks and all(chunk.embedding is not None for chunk in chunks):
+            embeddings = np.asarray([chunk.embedding for chunk in chunks], dtype=np.float32)
+
+        return cls(
+            ids=[chunk.id for chunk in chunks],
+            texts=[chunk.content for chunk in chunks],
+            metadatas=[chunk.metadata for chunk in chunks],
+            embeddings=embeddings
+        )
+
+    def to_chunks(self) -> List[DocumentChunk]:
+        """Преобразует батч в pydantic-чанки (для ответов API)"""
+        embeddings = self.embeddings.tolist() if self.embeddings is not None else [None] * len(self)
+        return [
+            DocumentChunk(id=chunk_id, content=text, metadata=metadata, embedding=embedding)
+            for chunk_id, text, metadata, embedding in zip(self.ids, self.texts, self.metadatas, embeddings)
+        ]
+
+    def slice(self, start: int, end: int) -> "ChunkBatch":
+        """Срез батча без копирования матрицы эмбеддингов"""
+        return ChunkBatch(
+            ids=self.ids[start:end],
+            texts=self.texts[start:end],
+            metadatas=self.metadatas[start:end],
+            embeddings=self.embeddings[start:end] if self.embeddings is not None else None
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
@@ -31,4 +31,27 @@ class QueryResponse(BaseModel):
     """Ответ на запрос"""
     answer: str
     sources: List[Dict[str, Any]]
-    confidence: float = 0.0
\ No newline at end of file
+    confidence: float = 0.0
+
+
+class BatchQueryRequest(BaseModel):
+    """Пакет вопросов с общими параметрами поиска"""
+    queries: List[str]
+    top_k: Optional[int] = None
+    filters: Optional[Dict[str, Any]] = None
+
+
+class BatchQueryItem(BaseModel):
+    """Результат одного вопроса из пакета"""
+    query: str
+    response: Optional[QueryResponse] = None
+    error: Optional[str] = None
+    generation_time: float = 0.0
+
+
+class BatchQueryResponse(BaseModel):
+    """Ответ на пакет вопросов"""
+    results: List[BatchQueryItem]
+    retrieval_time: float = 0.0
+    generation_time: float = 0.0
+    total_time: float = 0.0
@@ -0,0 +1,28 @@
+from pydantic import BaseModel, Field
+from typing import Optional, Dict, Any
+from datetime import datetime
+from enum import Enum
+
+
+class JobStatus(str, Enum):
+    """Статус фоновой задачи"""
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+class IngestionJob(BaseModel):
+    """Фоновая задача загрузки документов в базу знаний"""
+    id: str
+    kind: str
+    target: str
+    status: JobStatus = JobStatus.PENDING
+    stage: Optional[str] = None
+    progress: float = 0.0
+    stage_timings: Dict[str, float] = Field(default_factory=dict)
+    result: Dict[str, Any] = Field(default_factory=dict)
+    error: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.now)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
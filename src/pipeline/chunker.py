@@ -1,7 +1,9 @@
-from typing import List
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
 from langchain.text_splitter import RecursiveCharacterTextSplitter
+from src.models.chunk_batch import ChunkBatch
 from src.models.document import Document, DocumentChunk
 from src.config import settings
+import hashlib
 import uuid
 
 
@@ -36,23 +38,58 @@ class DocumentChunker:
         Returns:
             Список чанков
         """
-        text_chunks = self.splitter.split_text(document.content)
-
-        chunks = []
-        for i, text in enumerate(text_chunks):
-            chunk = DocumentChunk(
-                id=str(uuid.uuid4()),
+        return [
+            DocumentChunk(
+                id=chunk_id,
                 content=text,
-                metadata={
-                    **document.metadata,
-                    'chunk_size': len(text)
-                },
+                metadata=metadata,
                 document_id=document.id,
                 chunk_index=i
             )
-            chunks.append(chunk)
+            for i, (chunk_id, text, metadata) in enumerate(self.iter_chunk_records(document))
+        ]
+
+    def iter_chunk_records(self, document: Document) -> Iterator[Tuple[str, str, Dict[str, Any]]]:
+        """
+        Разбивает документ на чанки без создания pydantic-моделей
+
+        Args:
+            document: Документ для разбиения
+
+        Yields:
+            Кортежи (id, текст, метаданные)
+        """
+        for i, text in enumerate(self.splitter.split_text(document.content)):
+            metadata = {
+                **document.metadata,
+                'chunk_size': len(text),
+                # Позиция в документе: по ней соседние чанки склеиваются в контексте LLM
+                'chunk_index': i
+            }
+            if document.id is not None:
+                metadata['document_id'] = document.id
+            yield self.chunk_id(document, i, text), text, metadata
+
+    @staticmethod
+    def chunk_id(document: Document, chunk_index: int, text: str) -> str:
+        """
+        Детерминированный id чанка: повторная загрузка того же файла дает те же id
+
+        Args:
+            document: Исходный документ
+            chunk_index: Номер чанка в документе
+            text: Текст чанка
+
+        Returns:
+            Идентификатор чанка
+        """
+        source = document.metadata.get('source')
+        if source is None:
+            return str(uuid.uuid4())
 
-        return chunks
+        page = document.metadata.get('page', '')
+        text_hash = hashlib.sha1(text.encode('utf-8')).hexdigest()
+        return str(uuid.uuid5(uuid.NAMESPACE_URL, f"{source}|{page}|{chunk_index}|{text_hash}"))
 
     def chunk_documents(self, documents: List[Document]) -> List[DocumentChunk]:
         """
@@ -64,12 +101,38 @@ class DocumentChunker:
         Returns:
             Список всех чанков
         """
-        all_chunks = []
+        return list(self.iter_chunks(documents))
+
+    def chunk_batch(self, documents: Iterable[Document]) -> ChunkBatch:
+        """
+        Разбивает документы на чанки в компактное представление для конвейера
+
+        Args:
+            documents: Документы
+
+        Returns:
+            Батч чанков без эмбеддингов
+        """
+        batch = ChunkBatch(ids=[], texts=[], metadatas=[])
         for document in documents:
-            chunks = self.chunk_document(document)
-            all_chunks.extend(chunks)
+            for chunk_id, text, metadata in self.iter_chunk_records(document):
+                batch.ids.append(chunk_id)
+                batch.texts.append(text)
+                batch.metadatas.append(metadata)
+        return batch
 
-        return all_chunks
+    def iter_chunks(self, documents: Iterable[Document]) -> Iterator[DocumentChunk]:
+        """
+        Лениво разбивает поток документов на чанки
+
+        Args:
+            documents: Итерируемый набор документов
+
+        Yields:
+            Чанки по мере разбиения
+        """
+        for document in documents:
+            yield from self.chunk_document(document)
 
     def optimize_chunk_size(self, document: Document, target_chunks: int = 10) -> int:
         """
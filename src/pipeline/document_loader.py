@@ -1,6 +1,9 @@
+import multiprocessing
 import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import List, Union
+from typing import Iterable, Iterator, List, Optional, Set, Tuple, Union
 from langchain_community.document_loaders import (
     PyPDFLoader,
     Docx2txtLoader,
@@ -8,9 +11,26 @@ from langchain_community.document_loaders import (
     UnstructuredMarkdownLoader
 )
 from src.models.document import Document
+from src.config import settings
 import uuid
 
 
+def _load_file_worker(file_path: str) -> Tuple[List[Document], Optional[str]]:
+    """
+    Загружает файл в дочернем процессе
+
+    Args:
+        file_path: Путь к файлу
+
+    Returns:
+        Кортеж (документы, текст ошибки или None)
+    """
+    try:
+        return DocumentLoader(workers=1).load_file(file_path), None
+    except Exception as e:
+        return [], str(e)
+
+
 class DocumentLoader:
     """Загрузчик документов различных форматов"""
 
@@ -21,6 +41,16 @@ class DocumentLoader:
         '.md': UnstructuredMarkdownLoader,
     }
 
+    def __init__(self, workers: int = None):
+        """
+        Инициализация загрузчика
+
+        Args:
+            workers: Количество процессов для парсинга директорий (1 — без пула, 0 — по числу ядер)
+        """
+        workers = settings.loader_workers if workers is None else workers
+        self.workers = workers if workers > 0 else (os.cpu_count() or 1)
+
     def load_file(self, file_path: Union[str, Path]) -> List[Document]:
         """
         Загружает документ из файла
@@ -61,6 +91,85 @@ class DocumentLoader:
 
         return documents
 
+    def iter_files(self, directory_path: Union[str, Path]) -> List[Path]:
+        """
+        Находит все поддерживаемые файлы в директории
+
+        Args:
+            directory_path: Путь к директории
+
+        Returns:
+            Отсортированный список путей к файлам
+        """
+        directory_path = Path(directory_path)
+
+        return sorted(
+            file_path for file_path in directory_path.rglob('*')
+            if file_path.is_file() and file_path.suffix.lower() in self.LOADERS
+        )
+
+    def iter_directory(self, directory_path: Union[str, Path]) -> Iterator[List[Document]]:
+        """
+        Лениво загружает документы из директории по одному файлу
+
+        Args:
+            directory_path: Путь к директории
+
+        Yields:
+            Документы очередного файла (пустой список, если файл не загрузился)
+        """
+        yield from self.load_files(self.iter_files(directory_path))
+
+    def load_files(self, file_paths: Iterable[Path], failed: Optional[Set[str]] = None) -> Iterator[List[Document]]:
+        """
+        Загружает файлы последовательно или в пуле процессов
+
+        Порядок результатов совпадает с порядком файлов независимо от числа процессов.
+
+        Args:
+            file_paths: Пути к файлам
+            failed: Множество, в которое добавляются пути файлов, не загрузившихся с ошибкой
+
+        Yields:
+            Документы очередного файла (пустой список, если файл не загрузился)
+        """
+        if self.workers <= 1:
+            results = ((path, *_load_file_worker(str(path))) for path in file_paths)
+        else:
+            results = self._load_files_parallel(file_paths)
+
+        for file_path, documents, error in results:
+            if error is None:
+                print(f"Загружено: {file_path}")
+            else:
+                print(f"Ошибка при загрузке {file_path}: {error}")
+                if failed is not None:
+                    failed.add(str(file_path))
+            yield documents
+
+    def _load_files_parallel(
+            self,
+            file_paths: Iterable[Path]
+    ) -> Iterator[Tuple[Path, List[Document], Optional[str]]]:
+        """Парсит файлы в пуле процессов, держа в работе не больше 2 * workers файлов"""
+        # spawn: процесс API уже держит потоки и модели, fork для него небезопасен.
+        # Процессы spawn повторно импортируют __main__, поэтому точка входа (main.py)
+        # не должна импортировать приложение на уровне модуля
+        context = multiprocessing.get_context("spawn")
+        window = self.workers * 2
+
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=context) as executor:
+            pending = deque()
+            for file_path in file_paths:
+                pending.append((file_path, executor.submit(_load_file_worker, str(file_path))))
+                if len(pending) >= window:
+                    path, future = pending.popleft()
+                    yield (path, *future.result())
+
+            while pending:
+                path, future = pending.popleft()
+                yield (path, *future.result())
+
     def load_directory(self, directory_path: Union[str, Path]) -> List[Document]:
         """
         Загружает все поддерживаемые документы из директории
@@ -71,17 +180,10 @@ class DocumentLoader:
         Returns:
             Список документов
         """
-        directory_path = Path(directory_path)
         all_documents = []
 
-        for file_path in directory_path.rglob('*'):
-            if file_path.is_file() and file_path.suffix.lower() in self.LOADERS:
-                try:
-                    documents = self.load_file(file_path)
-                    all_documents.extend(documents)
-                    print(f"Загружено: {file_path}")
-                except Exception as e:
-                    print(f"Ошибка при загрузке {file_path}: {e}")
+        for documents in self.iter_directory(directory_path):
+            all_documents.extend(documents)
 
         return all_documents
 
@@ -1,12 +1,18 @@
-from typing import List, Union
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Union
 from sentence_transformers import SentenceTransformer
 import numpy as np
+from src.models.chunk_batch import ChunkBatch
 from src.models.document import DocumentChunk
 from src.config import settings
+from src.pipeline.embedding_cache import EmbeddingCache, text_hash
+from src.services.tokens import estimate_tokens
 
 # Опционально импортируем GigaChat только если используем
 try:
     from gigachat import GigaChat
+    from src.pipeline.gigachat_embeddings import GigaChatEmbeddingClient
     GIGACHAT_AVAILABLE = True
 except ImportError:
     GIGACHAT_AVAILABLE = False
@@ -15,15 +21,32 @@ except ImportError:
 class Embedder:
     """Создание векторных представлений текста"""
 
-    def __init__(self, model_name: str = None, use_gigachat: bool = None):
+    def __init__(
+            self,
+            model_name: str = None,
+            use_gigachat: bool = None,
+            cache: EmbeddingCache = None,
+            backend: str = None
+    ):
         """
         Инициализация эмбеддера
 
         Args:
             model_name: Название модели для эмбеддингов
             use_gigachat: Использовать ли embeddings от GigaChat
+            cache: Дисковый кеш эмбеддингов (по умолчанию создается согласно настройкам)
+            backend: Бэкенд sentence-transformers: torch или onnx
         """
         self.use_gigachat = use_gigachat if use_gigachat is not None else settings.use_gigachat_embeddings
+        self.backend = backend or settings.embedding_backend
+        self.token_budget = settings.embedding_token_budget
+        self.max_batch_size = settings.embedding_max_batch_size
+        self.pool_workers = settings.embedding_pool_workers
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self.cache: Optional[EmbeddingCache] = cache
+        if self.cache is None and settings.embedding_cache_enabled:
+            self.cache = EmbeddingCache()
 
         if self.use_gigachat:
             if not GIGACHAT_AVAILABLE:
@@ -33,16 +56,58 @@ class Embedder:
             self.gigachat_client = GigaChat(
                 credentials=settings.gigachat_credentials,
                 scope=settings.gigachat_scope,
-                verify_ssl_certs=settings.gigachat_verify_ssl
+                verify_ssl_certs=settings.gigachat_verify_ssl,
+                base_url=settings.gigachat_base_url,
+                auth_url=settings.gigachat_auth_url
             )
+            self.gigachat_embeddings = GigaChatEmbeddingClient(self.gigachat_client)
             self.dimension = 1024  # Размерность эмбеддингов GigaChat
             self.model_name = "GigaChat Embeddings"
+            self.cache_namespace = self.model_name
         else:
             self.model_name = model_name or settings.embedding_model
-            print(f"Загрузка модели эмбеддингов: {self.model_name}")
-            self.model = SentenceTransformer(self.model_name)
+            print(f"Загрузка модели эмбеддингов: {self.model_name} (бэкенд {self.backend})")
+            if self.backend == "onnx":
+                self.model = self._load_onnx_model()
+                # Векторы квантованной модели немного отличаются, кешируем их отдельно
+                quantization = settings.embedding_onnx_quantization or "fp32"
+                self.cache_namespace = f"{self.model_name}|onnx-{quantization}"
+            elif self.backend == "torch":
+                self.model = SentenceTransformer(self.model_name)
+                self.cache_namespace = self.model_name
+            else:
+                raise ValueError(f"Неизвестный бэкенд эмбеддингов: {self.backend}")
             self.dimension = self.model.get_sentence_embedding_dimension()
 
+    def _load_onnx_model(self) -> SentenceTransformer:
+        """
+        Загружает ONNX-версию модели для onnxruntime на CPU
+
+        При первом запуске модель экспортируется в ONNX (и, если задано,
+        динамически квантуется в int8) в каталог embedding_onnx_dir.
+
+        Returns:
+            Модель sentence-transformers с бэкендом onnx
+        """
+        from sentence_transformers import export_dynamic_quantized_onnx_model
+
+        quantization = settings.embedding_onnx_quantization
+        export_dir = Path(settings.embedding_onnx_dir) / self.model_name.replace("/", "__")
+        file_name = f"onnx/model_qint8_{quantization}.onnx" if quantization else "onnx/model.onnx"
+
+        if not (export_dir / file_name).exists():
+            print(f"Экспорт модели в ONNX: {export_dir}")
+            model = SentenceTransformer(self.model_name, backend="onnx")
+            model.save_pretrained(str(export_dir))
+            if quantization:
+                export_dynamic_quantized_onnx_model(model, quantization, str(export_dir))
+
+        return SentenceTransformer(
+            str(export_dir),
+            backend="onnx",
+            model_kwargs={"file_name": file_name, "provider": "CPUExecutionProvider"}
+        )
+
     def embed_text(self, text: str) -> List[float]:
         """
         Создает эмбеддинг для текста
@@ -53,13 +118,7 @@ class Embedder:
         Returns:
             Вектор эмбеддинга
         """
-        if self.use_gigachat:
-            response = self.gigachat_client.embeddings(text)
-            # GigaChat возвращает объект с полем data, содержащим список эмбеддингов
-            return response.data[0].embedding
-        else:
-            embedding = self.model.encode(text, convert_to_numpy=True)
-            return embedding.tolist()
+        return self._embed_cached([text], self._compute_text)[0].tolist()
 
     def embed_texts(self, texts: List[str]) -> List[List[float]]:
         """
@@ -71,23 +130,163 @@ class Embedder:
         Returns:
             Список векторов эмбеддингов
         """
+        return self.embed_matrix(texts).tolist()
+
+    def embed_matrix(self, texts: List[str]) -> np.ndarray:
+        """
+        Создает эмбеддинги для списка текстов без промежуточных списков Python
+
+        Args:
+            texts: Список текстов
+
+        Returns:
+            Матрица float32 размера (len(texts), dimension)
+        """
+        return self._embed_cached(texts, self._compute_texts)
+
+    def _embed_cached(
+            self,
+            texts: List[str],
+            compute: Callable[[List[str]], np.ndarray]
+    ) -> np.ndarray:
+        """
+        Берет эмбеддинги из кеша и вычисляет только недостающие
+
+        Одинаковые тексты внутри запроса вычисляются один раз.
+        """
+        if not texts:
+            return np.empty((0, self.dimension), dtype=np.float32)
+        if self.cache is None:
+            return compute(texts)
+
+        hashes = [text_hash(text) for text in texts]
+        vectors: Dict[str, np.ndarray] = self.cache.get_many(self.cache_namespace, hashes)
+
+        missing: Dict[str, str] = {}
+        for key, text in zip(hashes, texts):
+            if key not in vectors:
+                missing.setdefault(key, text)
+
+        if missing:
+            computed = compute(list(missing.values()))
+            new_vectors = dict(zip(missing.keys(), computed))
+            self.cache.put_many(self.cache_namespace, new_vectors)
+            vectors.update(new_vectors)
+
+        return np.stack([vectors[key] for key in hashes]).astype(np.float32, copy=False)
+
+    def _compute_text(self, texts: List[str]) -> np.ndarray:
+        """Вычисляет эмбеддинг одного текста без прогресс-бара"""
         if self.use_gigachat:
-            embeddings = []
-            # GigaChat обрабатываем по одному или батчами
-            for i in range(0, len(texts), 10):  # Батчи по 10
-                batch = texts[i:i+10]
-                for text in batch:
-                    response = self.gigachat_client.embeddings(text)
-                    embeddings.append(response.data[0].embedding)
-                print(f"Обработано {min(i+10, len(texts))}/{len(texts)} текстов")
-            return embeddings
+            return np.asarray(self.gigachat_embeddings.embed(texts[:1]), dtype=np.float32)
+        else:
+            embedding = self.model.encode(texts[0], convert_to_numpy=True)
+            return embedding.reshape(1, -1).astype(np.float32, copy=False)
+
+    def _compute_texts(self, texts: List[str]) -> np.ndarray:
+        """Вычисляет эмбеддинги списка текстов"""
+        if self.use_gigachat:
+            # Пачки текстов в одном запросе, несколько запросов параллельно с учетом лимитов
+            return np.asarray(self.gigachat_embeddings.embed(texts), dtype=np.float32)
         else:
-            embeddings = self.model.encode(
-                texts,
+            return self._encode_bucketed(texts)
+
+    def _token_lengths(self, texts: List[str]) -> List[int]:
+        """Длины текстов в токенах модели (с обрезкой до max_seq_length)"""
+        max_length = self.model.max_seq_length
+        try:
+            encoded = self.model.tokenizer(
+                texts, add_special_tokens=True, truncation=True, max_length=max_length
+            )
+            return [len(ids) for ids in encoded['input_ids']]
+        except Exception:
+            return [min(max_length, estimate_tokens(text) + 2) for text in texts]
+
+    def _make_batches(self, lengths: List[int]) -> List[np.ndarray]:
+        """
+        Группирует индексы текстов в батчи по бюджету токенов
+
+        Тексты сортируются по убыванию длины, поэтому в батче оказываются
+        тексты близкой длины и паддинг почти не тратит вычисления. Размер батча
+        подбирается так, чтобы (число текстов × длина самого длинного) ≤ бюджета.
+        """
+        order = np.argsort(-np.asarray(lengths), kind='stable')
+        batches = []
+        start = 0
+        while start < len(order):
+            longest = max(1, lengths[order[start]])
+            size = max(1, min(self.max_batch_size, self.token_budget // longest))
+            batches.append(order[start:start + size])
+            start += size
+        return batches
+
+    def _encode_bucketed(self, texts: List[str]) -> np.ndarray:
+        """
+        Кодирует тексты батчами одинаковой длины с динамическим размером батча
+
+        Returns:
+            Матрица эмбеддингов в исходном порядке текстов
+        """
+        lengths = self._token_lengths(texts)
+
+        pool = self._get_pool() if len(texts) >= settings.embedding_pool_min_texts else None
+        if pool is not None:
+            order = np.argsort(-np.asarray(lengths), kind='stable')
+            average = max(1, int(np.mean(lengths)))
+            batch_size = max(1, min(self.max_batch_size, self.token_budget // average))
+            encoded = self.model.encode(
+                [texts[i] for i in order],
+                pool=pool,
+                batch_size=batch_size,
+                convert_to_numpy=True
+            )
+            embeddings = np.empty_like(encoded)
+            embeddings[order] = encoded
+            return embeddings
+
+        embeddings = np.empty((len(texts), self.dimension), dtype=np.float32)
+        batches = self._make_batches(lengths)
+        for i, batch in enumerate(batches, 1):
+            embeddings[batch] = self.model.encode(
+                [texts[j] for j in batch],
+                batch_size=len(batch),
                 convert_to_numpy=True,
-                show_progress_bar=True
+                show_progress_bar=False
             )
-            return embeddings.tolist()
+            if len(batches) > 1 and (i % 20 == 0 or i == len(batches)):
+                print(f"Обработано батчей эмбеддингов: {i}/{len(batches)}")
+        return embeddings
+
+    def _get_pool(self):
+        """Лениво запускает пул процессов sentence-transformers, если он включен"""
+        if self.pool_workers <= 1:
+            return None
+
+        with self._pool_lock:
+            if self._pool is None:
+                print(f"Запуск пула кодирования: {self.pool_workers} процессов")
+                self._pool = self.model.start_multi_process_pool(
+                    target_devices=["cpu"] * self.pool_workers
+                )
+            return self._pool
+
+    def close(self) -> None:
+        """Останавливает пул процессов кодирования и сохраняет кеш эмбеддингов"""
+        with self._pool_lock:
+            if self._pool is not None:
+                self.model.stop_multi_process_pool(self._pool)
+                self._pool = None
+        if self.cache is not None:
+            self.cache.flush()
+
+    def get_cache_stats(self) -> Optional[Dict[str, Union[int, float]]]:
+        """
+        Статистика кеша эмбеддингов
+
+        Returns:
+            Счетчики кеша или None, если кеш отключен
+        """
+        return self.cache.get_stats() if self.cache else None
 
     def embed_chunk(self, chunk: DocumentChunk) -> DocumentChunk:
         """
@@ -102,6 +301,19 @@ class Embedder:
         chunk.embedding = self.embed_text(chunk.content)
         return chunk
 
+    def embed_batch(self, batch: ChunkBatch) -> ChunkBatch:
+        """
+        Заполняет матрицу эмбеддингов батча
+
+        Args:
+            batch: Батч чанков
+
+        Returns:
+            Тот же батч с эмбеддингами
+        """
+        batch.embeddings = self.embed_matrix(batch.texts)
+        return batch
+
     def embed_chunks(self, chunks: List[DocumentChunk]) -> List[DocumentChunk]:
         """
         Добавляет эмбеддинги к списку чанков
@@ -0,0 +1,204 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple, Union
+
+import numpy as np
+
+from src.config import settings
+
+
+def text_hash(text: str) -> str:
+    """SHA-256 текста в шестнадцатеричном виде"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Дисковый кеш эмбеддингов на SQLite
+
+    Ключ — (название модели, sha256 текста), значение — вектор float32.
+    При превышении лимита записей удаляются давно не использованные. Время
+    обращения к найденным записям копится в памяти и записывается пачкой,
+    чтобы чтение из кеша не было записью в БД на каждый запрос.
+    """
+
+    FILE_NAME = "embedding_cache.sqlite3"
+    # Запись накопленных времен обращения: по числу записей или по времени, с
+    ACCESS_FLUSH_SIZE = 1000
+    ACCESS_FLUSH_INTERVAL = 60.0
+
+    def __init__(self, path: Union[str, Path] = None, max_entries: int = None):
+        """
+        Инициализация кеша
+
+        Args:
+            path: Путь к файлу SQLite
+            max_entries: Максимальное количество записей
+        """
+        self.path = Path(path) if path else Path(settings.vector_db_path) / self.FILE_NAME
+        self.max_entries = max_entries or settings.embedding_cache_max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (model, text_hash)
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_embeddings_last_access ON embeddings (last_access)"
+        )
+        self._conn.commit()
+
+        # Оценка числа записей сверху: замена существующей записи тоже увеличивает ее
+        self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        self._pending_access: Dict[Tuple[str, str], float] = {}
+        self._access_flushed = time.monotonic()
+
+    def get_many(self, model: str, hashes: List[str]) -> Dict[str, np.ndarray]:
+        """
+        Ищет эмбеддинги в кеше
+
+        Args:
+            model: Название модели
+            hashes: Хеши текстов
+
+        Returns:
+            Словарь хеш → вектор для найденных записей
+        """
+        found: Dict[str, np.ndarray] = {}
+        unique = list(dict.fromkeys(hashes))
+        now = time.time()
+
+        with self._lock:
+            # Ограничение SQLite на число параметров запроса
+            for i in range(0, len(unique), 500):
+                batch = unique[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings "
+                    f"WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model, *batch]
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+
+            for key in found:
+                self._pending_access[(model, key)] = now
+            if (
+                    len(self._pending_access) >= self.ACCESS_FLUSH_SIZE
+                    or time.monotonic() - self._access_flushed >= self.ACCESS_FLUSH_INTERVAL
+            ):
+                self._write_access()
+                self._conn.commit()
+
+            self.hits += sum(1 for key in hashes if key in found)
+            self.misses += sum(1 for key in hashes if key not in found)
+
+        return found
+
+    def put_many(self, model: str, items: Dict[str, np.ndarray]) -> None:
+        """
+        Сохраняет эмбеддинги в кеш
+
+        Args:
+            model: Название модели
+            items: Словарь хеш → вектор
+        """
+        if not items:
+            return
+
+        now = time.time()
+        rows = [
+            (model, key, np.asarray(vector, dtype=np.float32).tobytes(), now)
+            for key, vector in items.items()
+        ]
+
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector, last_access) "
+                "VALUES (?, ?, ?, ?)",
+                rows
+            )
+            self._count += len(rows)
+            self._evict()
+            self._conn.commit()
+
+    def _write_access(self) -> None:
+        """Записывает накопленные времена обращения (вызывается под блокировкой)"""
+        if self._pending_access:
+            self._conn.executemany(
+                "UPDATE embeddings SET last_access = ? WHERE model = ? AND text_hash = ?",
+                [(accessed, model, key) for (model, key), accessed in self._pending_access.items()]
+            )
+            self._pending_access.clear()
+        self._access_flushed = time.monotonic()
+
+    def _evict(self) -> None:
+        """Удаляет самые старые записи сверх лимита (с запасом 10%, чтобы не чистить на каждой вставке)"""
+        if self._count <= self.max_entries:
+            return
+
+        # Оценка могла завыситься заменами — уточняем только когда она превысила лимит
+        self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        if self._count <= self.max_entries:
+            return
+
+        self._write_access()
+        to_delete = self._count - int(self.max_entries * 0.9)
+        self._conn.execute(
+            "DELETE FROM embeddings WHERE rowid IN "
+            "(SELECT rowid FROM embeddings ORDER BY last_access LIMIT ?)",
+            (to_delete,)
+        )
+        self._count -= to_delete
+        self.evictions += to_delete
+
+    def flush(self) -> None:
+        """Записывает накопленные времена обращения к записям"""
+        with self._lock:
+            self._write_access()
+            self._conn.commit()
+
+    def clear(self) -> None:
+        """Очищает кеш"""
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+            self._count = 0
+            self._pending_access.clear()
+
+    def get_stats(self) -> Dict[str, Union[int, float]]:
+        """
+        Статистика кеша
+
+        Returns:
+            Словарь со счетчиками попаданий и промахов
+        """
+        with self._lock:
+            self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            total = self.hits + self.misses
+
+            return {
+                'entries': self._count,
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0,
+                'evictions': self.evictions,
+            }
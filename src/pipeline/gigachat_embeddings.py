@@ -0,0 +1,131 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+import httpx
+from gigachat import GigaChat
+from gigachat.exceptions import ResponseError
+
+from src.config import settings
+from src.services.rate_limiter import TokenBucket
+from src.services.tokens import estimate_tokens
+
+
+class GigaChatEmbeddingClient:
+    """
+    Пакетные и параллельные запросы эмбеддингов к GigaChat
+
+    Тексты отправляются пачками в одном запросе, несколько запросов выполняются
+    одновременно, соблюдаются лимиты запросов в секунду и токенов в минуту,
+    временные ошибки повторяются с экспоненциальной задержкой.
+    """
+
+    # Статусы, при которых запрос имеет смысл повторить
+    RETRYABLE_STATUSES = {408, 429, 500, 502, 503, 504}
+
+    def __init__(
+            self,
+            client: GigaChat,
+            model: str = None,
+            batch_size: int = None,
+            concurrency: int = None,
+            requests_per_second: float = None,
+            tokens_per_minute: int = None,
+            max_retries: int = None
+    ):
+        """
+        Инициализация клиента
+
+        Args:
+            client: Клиент GigaChat
+            model: Модель эмбеддингов
+            batch_size: Текстов в одном запросе
+            concurrency: Одновременных запросов
+            requests_per_second: Лимит запросов в секунду (0 — без ограничения)
+            tokens_per_minute: Лимит токенов в минуту (0 — без ограничения)
+            max_retries: Количество повторов при временных ошибках
+        """
+        self.client = client
+        self.model = model or settings.gigachat_embeddings_model
+        self.batch_size = batch_size or settings.gigachat_embeddings_batch_size
+        self.concurrency = concurrency or settings.gigachat_embeddings_concurrency
+        self.max_retries = max_retries if max_retries is not None else settings.gigachat_embeddings_max_retries
+
+        rps = requests_per_second if requests_per_second is not None else settings.gigachat_embeddings_rps
+        tpm = tokens_per_minute if tokens_per_minute is not None else settings.gigachat_embeddings_tpm
+        self.request_limiter = TokenBucket(rate=rps)
+        self.token_limiter = TokenBucket(rate=tpm / 60.0, capacity=float(tpm)) if tpm else TokenBucket(rate=0)
+
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """
+        Создает эмбеддинги для списка текстов
+
+        Args:
+            texts: Список текстов
+
+        Returns:
+            Эмбеддинги в порядке исходных текстов
+        """
+        if not texts:
+            return []
+
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        if len(batches) == 1:
+            return self._embed_batch(batches[0])
+
+        embeddings: List[List[float]] = []
+        done = 0
+        for batch, result in zip(batches, self._get_executor().map(self._embed_batch, batches)):
+            embeddings.extend(result)
+            done += len(batch)
+            print(f"Обработано {done}/{len(texts)} текстов")
+
+        return embeddings
+
+    def close(self) -> None:
+        """Останавливает пул потоков"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.concurrency,
+                    thread_name_prefix="gigachat-embeddings"
+                )
+            return self._executor
+
+    def _embed_batch(self, batch: List[str]) -> List[List[float]]:
+        """Отправляет один запрос с пачкой текстов, соблюдая лимиты и повторяя временные ошибки"""
+        tokens = sum(estimate_tokens(text) for text in batch)
+
+        for attempt in range(self.max_retries + 1):
+            self.request_limiter.acquire()
+            self.token_limiter.acquire(tokens)
+
+            try:
+                response = self.client.embeddings(batch, model=self.model)
+                # Порядок в ответе задается полем index
+                data = sorted(response.data, key=lambda item: item.index)
+                return [item.embedding for item in data]
+            except Exception as e:
+                if attempt >= self.max_retries or not self._is_retryable(e):
+                    raise
+                delay = min(30.0, 0.5 * 2 ** attempt) * random.uniform(0.5, 1.5)
+                print(f"Временная ошибка GigaChat Embeddings ({e}), повтор через {delay:.1f} с")
+                time.sleep(delay)
+
+    def _is_retryable(self, error: Exception) -> bool:
+        if isinstance(error, (httpx.TransportError, httpx.TimeoutException)):
+            return True
+        if isinstance(error, ResponseError):
+            status_code = error.args[1] if len(error.args) > 1 else None
+            return status_code in self.RETRYABLE_STATUSES
+        return False
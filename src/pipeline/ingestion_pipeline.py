@@ -0,0 +1,424 @@
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple, Union
+
+from src.config import settings
+from src.database.vector_store import VectorStore
+from src.models.chunk_batch import ChunkBatch
+from src.pipeline.chunker import DocumentChunker
+from src.pipeline.document_loader import DocumentLoader
+from src.pipeline.embedder import Embedder
+from src.pipeline.manifest import IngestionManifest, file_sha256
+
+# Маркер окончания потока между стадиями
+_END = object()
+
+
+class _StageError:
+    """Исключение, пробрасываемое из рабочего потока в следующую стадию"""
+
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+class StreamingIngestionPipeline:
+    """
+    Потоковый конвейер загрузка → разбиение → эмбеддинги → запись
+
+    Стадии работают в отдельных потоках и обмениваются микробатчами
+    фиксированного размера через очереди ограниченной длины, поэтому
+    потребление памяти не зависит от размера корпуса, а чанки становятся
+    доступны для поиска по мере обработки.
+    """
+
+    def __init__(
+            self,
+            document_loader: DocumentLoader,
+            chunker: DocumentChunker,
+            embedder: Embedder,
+            vector_store: VectorStore,
+            batch_size: int = None,
+            queue_size: int = None
+    ):
+        """
+        Инициализация конвейера
+
+        Args:
+            document_loader: Загрузчик документов
+            chunker: Чанкер документов
+            embedder: Эмбеддер
+            vector_store: Векторное хранилище
+            batch_size: Размер микробатча чанков
+            queue_size: Максимальное число батчей в очереди между стадиями
+        """
+        self.document_loader = document_loader
+        self.chunker = chunker
+        self.embedder = embedder
+        self.vector_store = vector_store
+        self.batch_size = batch_size or settings.ingestion_batch_size
+        self.queue_size = queue_size or settings.ingestion_queue_size
+
+    def run_directory(
+            self,
+            directory_path: Union[str, Path],
+            on_progress: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> Dict[str, Any]:
+        """
+        Обрабатывает директорию потоково
+
+        Args:
+            directory_path: Путь к директории
+            on_progress: Колбэк, получающий статистику после записи каждого батча
+
+        Returns:
+            Итоговая статистика обработки
+        """
+        files = self.document_loader.iter_files(directory_path)
+        stats = self.run(
+            self._tag_shards(self.document_loader.load_files(files), files, directory_path),
+            total_files=len(files),
+            on_progress=on_progress
+        )
+        stats.pop('chunk_ids_by_source')
+        return stats
+
+    @staticmethod
+    def _tag_shards(
+            file_documents: Iterator[List],
+            files: List[Path],
+            directory_path: Union[str, Path]
+    ) -> Iterator[List]:
+        """
+        Проставляет документам ключ шардирования (settings.shard_key)
+
+        Значение — первая поддиректория файла относительно загружаемой директории
+        (для файлов в ее корне — имя самой директории). Уже заданное в метаданных
+        значение не перезаписывается.
+        """
+        if not settings.shard_key:
+            yield from file_documents
+            return
+
+        directory_path = Path(directory_path)
+        for file_path, documents in zip(files, file_documents):
+            parts = Path(file_path).relative_to(directory_path).parts
+            shard = parts[0] if len(parts) > 1 else directory_path.resolve().name
+            for document in documents:
+                document.metadata.setdefault(settings.shard_key, shard)
+            yield documents
+
+    def run(
+            self,
+            file_documents: Iterator[List],
+            total_files: int = 0,
+            on_progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+            on_stored: Optional[Callable[[int, Dict[str, List[str]]], None]] = None
+    ) -> Dict[str, Any]:
+        """
+        Прогоняет поток документов через все стадии
+
+        Args:
+            file_documents: Итератор списков документов, по одному списку на файл
+            total_files: Ожидаемое число файлов (для расчета прогресса)
+            on_progress: Колбэк, получающий статистику после записи каждого батча
+            on_stored: Колбэк, получающий после записи каждого батча число первых файлов,
+                чанки которых записаны полностью, и id записанных чанков по источникам
+
+        Returns:
+            Итоговая статистика обработки и id записанных чанков по источникам
+        """
+        chunk_ids_by_source: Dict[str, List[str]] = {}
+        stats = {
+            'total_files': total_files,
+            'files_processed': 0,
+            'documents_count': 0,
+            'chunks_count': 0,
+            'batches_count': 0,
+            'stage_timings': {'loading': 0.0, 'chunking': 0.0, 'embedding': 0.0, 'storing': 0.0},
+        }
+        stop = threading.Event()
+        chunk_queue: "queue.Queue" = queue.Queue(maxsize=self.queue_size)
+        embedded_queue: "queue.Queue" = queue.Queue(maxsize=self.queue_size)
+
+        producer = threading.Thread(
+            target=self._produce_batches,
+            args=(file_documents, chunk_queue, stats, stop),
+            name="ingestion-chunker",
+            daemon=True
+        )
+        embedder = threading.Thread(
+            target=self._embed_batches,
+            args=(chunk_queue, embedded_queue, stats, stop),
+            name="ingestion-embedder",
+            daemon=True
+        )
+        producer.start()
+        embedder.start()
+
+        try:
+            for batch, files_done in self._drain(embedded_queue, stop):
+                start = time.perf_counter()
+                self.vector_store.add_batch(batch)
+                stats['stage_timings']['storing'] += time.perf_counter() - start
+
+                for chunk_id, metadata in zip(batch.ids, batch.metadatas):
+                    chunk_ids_by_source.setdefault(metadata.get('source'), []).append(chunk_id)
+
+                stats['chunks_count'] += len(batch)
+                stats['batches_count'] += 1
+                stats['files_processed'] = files_done
+
+                if on_stored:
+                    on_stored(files_done, chunk_ids_by_source)
+                if on_progress:
+                    on_progress(dict(stats, stage_timings=dict(stats['stage_timings'])))
+        finally:
+            stop.set()
+            self._unblock(chunk_queue)
+            producer.join()
+            embedder.join()
+
+        stats['stage_timings'] = {k: round(v, 4) for k, v in stats['stage_timings'].items()}
+        stats['chunk_ids_by_source'] = chunk_ids_by_source
+        return stats
+
+    def sync_directory(
+            self,
+            directory_path: Union[str, Path],
+            manifest: IngestionManifest,
+            force: bool = False,
+            on_progress: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> Dict[str, Any]:
+        """
+        Инкрементально синхронизирует директорию с векторной БД
+
+        Неизмененные файлы (по размеру и mtime, затем по хешу) пропускаются,
+        чанки удаленных файлов удаляются. Измененные файлы сначала загружаются
+        заново, и только после записи всех их чанков удаляются старые чанки,
+        которых нет среди новых, — до этого поиск находит прежнюю версию, а
+        файл, который не удалось загрузить, сохраняет ее. Манифест обновляется
+        по мере записи батчей.
+
+        Args:
+            directory_path: Путь к директории
+            manifest: Манифест загруженных файлов
+            force: Переобработать все файлы, игнорируя совпадения в манифесте
+            on_progress: Колбэк, получающий статистику после записи каждого батча
+
+        Returns:
+            Итоговая статистика синхронизации
+        """
+        directory_path = Path(directory_path).resolve()
+        files = self.document_loader.iter_files(directory_path)
+
+        to_process: List[Path] = []
+        file_states: Dict[str, Dict[str, Any]] = {}
+        old_chunk_ids: Dict[str, List[str]] = {}
+        unchanged = added = changed = 0
+
+        for file_path in files:
+            key = str(file_path)
+            stat = file_path.stat()
+            entry = manifest.get(key)
+
+            if entry and not force and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime:
+                unchanged += 1
+                continue
+
+            sha256 = file_sha256(file_path)
+            if entry and not force and entry['sha256'] == sha256:
+                manifest.touch(key, stat.st_mtime)
+                unchanged += 1
+                continue
+
+            if entry:
+                changed += 1
+                old_chunk_ids[key] = entry['chunk_ids']
+            else:
+                added += 1
+
+            to_process.append(file_path)
+            file_states[key] = {'size': stat.st_size, 'mtime': stat.st_mtime, 'sha256': sha256}
+
+        present = {str(file_path) for file_path in files}
+        deleted = [path for path in manifest.paths_under(directory_path) if path not in present]
+        stale_chunk_ids: List[str] = []
+        for path in deleted:
+            stale_chunk_ids.extend(manifest.remove(path)['chunk_ids'])
+        self.vector_store.delete_by_ids(stale_chunk_ids)
+        manifest.save()
+
+        failed_paths: Set[str] = set()
+        written: Dict[str, List[str]] = {}
+        finished = 0
+        failed = removed = 0
+
+        def on_stored(files_done: int, chunk_ids_by_source: Dict[str, List[str]]) -> None:
+            """Фиксирует файлы, все чанки которых записаны: удаляет устаревшие чанки и обновляет манифест"""
+            nonlocal finished, failed, removed
+            written.update(chunk_ids_by_source)
+            done = [str(file_path) for file_path in to_process[finished:files_done]]
+            finished = max(finished, files_done)
+            if not done:
+                return
+
+            stale: List[str] = []
+            for key in done:
+                if key in failed_paths:
+                    # Прежняя версия файла остается в поиске и в манифесте
+                    continue
+                new_ids = set(chunk_ids_by_source.get(key, []))
+                stale.extend(chunk_id for chunk_id in old_chunk_ids.get(key, []) if chunk_id not in new_ids)
+            # Сначала удаляем: при сбое до записи манифеста старые id в нем останутся и будут удалены позже
+            self.vector_store.delete_by_ids(stale)
+            removed += len(stale)
+
+            for key in done:
+                if key in failed_paths:
+                    failed += 1
+                else:
+                    # Загрузившийся файл без чанков (пустой, только изображения) тоже запоминается
+                    manifest.set(key, chunk_ids=chunk_ids_by_source.get(key, []), **file_states[key])
+            manifest.save()
+
+        try:
+            stats = self.run(
+                self._tag_shards(
+                    self.document_loader.load_files(to_process, failed=failed_paths), to_process, directory_path
+                ),
+                total_files=len(to_process),
+                on_progress=on_progress,
+                on_stored=on_stored
+            )
+        except BaseException:
+            self._record_partial(manifest, to_process[finished:], written, file_states)
+            raise
+
+        stats.pop('chunk_ids_by_source')
+        stats.update({
+            'total_files': len(files),
+            'unchanged_files': unchanged,
+            'added_files': added,
+            'changed_files': changed,
+            'deleted_files': len(deleted),
+            'failed_files': failed,
+            'removed_chunks': len(stale_chunk_ids) + removed,
+        })
+        return stats
+
+    @staticmethod
+    def _record_partial(
+            manifest: IngestionManifest,
+            unfinished: List[Path],
+            written: Dict[str, List[str]],
+            file_states: Dict[str, Dict[str, Any]]
+    ) -> None:
+        """
+        Запоминает в манифесте чанки файлов, загрузка которых прервалась
+
+        Их id добавляются к записи файла, а размер и хеш помечаются
+        неизвестными, поэтому следующая синхронизация загрузит файл заново и
+        удалит лишние чанки, даже если он успеет еще раз измениться.
+        """
+        for file_path in unfinished:
+            key = str(file_path)
+            partial = written.get(key)
+            if not partial:
+                continue
+            entry = manifest.get(key) or {'chunk_ids': []}
+            chunk_ids = list(dict.fromkeys(entry['chunk_ids'] + partial))
+            manifest.set(key, size=-1, mtime=file_states[key]['mtime'], sha256="", chunk_ids=chunk_ids)
+        manifest.save()
+
+    def _produce_batches(self, file_documents, out_queue, stats, stop) -> None:
+        """Стадии загрузки и разбиения: собирает чанки в микробатчи"""
+        buffer = self._new_batch()
+        files_done = 0
+
+        try:
+            iterator = iter(file_documents)
+            while not stop.is_set():
+                start = time.perf_counter()
+                documents = next(iterator, _END)
+                stats['stage_timings']['loading'] += time.perf_counter() - start
+                if documents is _END:
+                    break
+
+                stats['documents_count'] += len(documents)
+
+                start = time.perf_counter()
+                for document in documents:
+                    for chunk_id, text, metadata in self.chunker.iter_chunk_records(document):
+                        buffer.ids.append(chunk_id)
+                        buffer.texts.append(text)
+                        buffer.metadatas.append(metadata)
+                        if len(buffer) >= self.batch_size:
+                            stats['stage_timings']['chunking'] += time.perf_counter() - start
+                            self._put(out_queue, (buffer, files_done), stop)
+                            buffer = self._new_batch()
+                            start = time.perf_counter()
+                stats['stage_timings']['chunking'] += time.perf_counter() - start
+                files_done += 1
+
+            if len(buffer) or files_done:
+                # Пустой батч нужен, чтобы файлы без чанков отразились в прогрессе
+                self._put(out_queue, (buffer, files_done), stop)
+            self._put(out_queue, _END, stop)
+        except BaseException as e:
+            self._put(out_queue, _StageError(e), stop)
+
+    def _embed_batches(self, in_queue, out_queue, stats, stop) -> None:
+        """Стадия эмбеддингов"""
+        try:
+            for batch, files_done in self._drain(in_queue, stop):
+                if len(batch):
+                    start = time.perf_counter()
+                    batch = self.embedder.embed_batch(batch)
+                    stats['stage_timings']['embedding'] += time.perf_counter() - start
+                self._put(out_queue, (batch, files_done), stop)
+            self._put(out_queue, _END, stop)
+        except BaseException as e:
+            self._put(out_queue, _StageError(e), stop)
+
+    @staticmethod
+    def _new_batch() -> ChunkBatch:
+        return ChunkBatch(ids=[], texts=[], metadatas=[])
+
+    @staticmethod
+    def _drain(in_queue, stop) -> Iterator[Tuple[ChunkBatch, int]]:
+        """Читает батчи из очереди до маркера окончания"""
+        while True:
+            item = in_queue.get()
+            if item is _END:
+                return
+            if isinstance(item, _StageError):
+                raise item.error
+            if stop.is_set():
+                return
+            yield item
+
+    @staticmethod
+    def _put(out_queue, item, stop) -> None:
+        """Кладет элемент в очередь, не зависая, если конвейер остановлен"""
+        while True:
+            try:
+                out_queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                if stop.is_set():
+                    return
+
+    @staticmethod
+    def _unblock(in_queue) -> None:
+        """Освобождает очередь, чтобы ожидающие стадии могли завершиться"""
+        try:
+            while True:
+                in_queue.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            in_queue.put_nowait(_END)
+        except queue.Full:
+            pass
@@ -0,0 +1,115 @@
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+from src.config import settings
+
+
+def file_sha256(file_path: Union[str, Path], block_size: int = 1 << 20) -> str:
+    """
+    Считает SHA-256 содержимого файла, читая его блоками
+
+    Args:
+        file_path: Путь к файлу
+        block_size: Размер блока чтения
+
+    Returns:
+        Хеш в шестнадцатеричном виде
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class IngestionManifest:
+    """
+    Манифест загруженных файлов: путь → размер, mtime, хеш содержимого и id чанков
+
+    Хранится в JSON рядом с векторной БД и позволяет при повторной загрузке
+    директории обрабатывать только новые, измененные и удаленные файлы.
+    """
+
+    FILE_NAME = "ingestion_manifest.json"
+
+    def __init__(self, path: Union[str, Path] = None):
+        """
+        Инициализация манифеста
+
+        Args:
+            path: Путь к файлу манифеста
+        """
+        self.path = Path(path) if path else Path(settings.vector_db_path) / self.FILE_NAME
+        self._lock = threading.RLock()
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self.load()
+
+    def load(self) -> None:
+        """Читает манифест с диска"""
+        with self._lock:
+            if not self.path.exists():
+                self._entries = {}
+                return
+
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self._entries = json.load(f).get('files', {})
+            except (OSError, ValueError) as e:
+                print(f"Манифест поврежден, будет создан заново: {e}")
+                self._entries = {}
+
+    def save(self) -> None:
+        """Атомарно записывает манифест на диск"""
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix('.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': 1, 'files': self._entries}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+
+    def get(self, file_path: str) -> Optional[Dict[str, Any]]:
+        """Возвращает запись о файле"""
+        with self._lock:
+            entry = self._entries.get(file_path)
+            return dict(entry) if entry else None
+
+    def set(self, file_path: str, size: int, mtime: float, sha256: str, chunk_ids: List[str]) -> None:
+        """Сохраняет запись о файле"""
+        with self._lock:
+            self._entries[file_path] = {
+                'size': size,
+                'mtime': mtime,
+                'sha256': sha256,
+                'chunk_ids': list(chunk_ids),
+            }
+
+    def touch(self, file_path: str, mtime: float) -> None:
+        """Обновляет mtime файла, содержимое которого не изменилось"""
+        with self._lock:
+            if file_path in self._entries:
+                self._entries[file_path]['mtime'] = mtime
+
+    def remove(self, file_path: str) -> Optional[Dict[str, Any]]:
+        """Удаляет запись о файле и возвращает ее"""
+        with self._lock:
+            return self._entries.pop(file_path, None)
+
+    def paths_under(self, directory_path: Union[str, Path]) -> List[str]:
+        """Возвращает пути всех файлов манифеста внутри директории"""
+        prefix = str(directory_path).rstrip(os.sep) + os.sep
+        with self._lock:
+            return [path for path in self._entries if path.startswith(prefix)]
+
+    def clear(self) -> None:
+        """Очищает манифест"""
+        with self._lock:
+            self._entries = {}
+            self.save()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
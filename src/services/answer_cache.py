@@ -0,0 +1,174 @@
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Set, Union
+
+import numpy as np
+
+from src.config import settings
+from src.models.document import QueryResponse
+
+
+class SemanticAnswerCache:
+    """
+    Семантический кеш ответов LLM
+
+    Ответ переиспользуется, если новый запрос близок к сохраненному по
+    косинусному сходству эмбеддингов и поиск вернул тот же набор чанков.
+    Записи, опирающиеся на измененные источники или чанки, удаляются.
+    """
+
+    def __init__(self, similarity_threshold: float = None, max_size: int = None, ttl: float = None):
+        """
+        Инициализация кеша
+
+        Args:
+            similarity_threshold: Минимальное косинусное сходство запросов
+            max_size: Максимальное число ответов
+            ttl: Время жизни ответа в секундах (0 — без ограничения)
+        """
+        self.similarity_threshold = (
+            similarity_threshold if similarity_threshold is not None else settings.answer_cache_similarity
+        )
+        self.max_size = max_size if max_size is not None else settings.answer_cache_size
+        self.ttl = ttl if ttl is not None else settings.answer_cache_ttl
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+        self._lock = threading.Lock()
+        self._embeddings: Optional[np.ndarray] = None
+        self._chunk_ids: List[frozenset] = []
+        self._sources: List[frozenset] = []
+        self._responses: List[QueryResponse] = []
+        self._created: List[float] = []
+
+    def lookup(self, query_embedding: np.ndarray, chunk_ids: Iterable[str]) -> Optional[QueryResponse]:
+        """
+        Ищет ответ на похожий запрос с тем же найденным контекстом
+
+        Args:
+            query_embedding: Вектор запроса
+            chunk_ids: Идентификаторы найденных чанков
+
+        Returns:
+            Сохраненный ответ или None
+        """
+        query = self._normalize(query_embedding)
+        chunk_ids = frozenset(chunk_ids)
+
+        with self._lock:
+            self._expire()
+            if self._embeddings is None:
+                self.misses += 1
+                return None
+
+            similarities = self._embeddings @ query
+            for index in np.argsort(-similarities):
+                if similarities[index] < self.similarity_threshold:
+                    break
+                if self._chunk_ids[index] == chunk_ids:
+                    self.hits += 1
+                    return self._responses[index].model_copy(deep=True)
+
+            self.misses += 1
+            return None
+
+    def store(
+            self,
+            query_embedding: np.ndarray,
+            chunk_ids: Iterable[str],
+            sources: Iterable[str],
+            response: QueryResponse
+    ) -> None:
+        """
+        Сохраняет ответ
+
+        Args:
+            query_embedding: Вектор запроса
+            chunk_ids: Идентификаторы чанков, на которых построен ответ
+            sources: Источники этих чанков
+            response: Ответ
+        """
+        if self.max_size <= 0:
+            return
+
+        query = self._normalize(query_embedding)
+
+        with self._lock:
+            self._expire()
+            if len(self._responses) >= self.max_size:
+                self._remove(list(range(len(self._responses) - self.max_size + 1)))
+
+            row = query.reshape(1, -1)
+            self._embeddings = row if self._embeddings is None else np.vstack([self._embeddings, row])
+            self._chunk_ids.append(frozenset(chunk_ids))
+            self._sources.append(frozenset(sources))
+            self._responses.append(response.model_copy(deep=True))
+            self._created.append(time.monotonic())
+
+    def invalidate(
+            self,
+            sources: Optional[Set[str]] = None,
+            chunk_ids: Optional[Set[str]] = None
+    ) -> None:
+        """
+        Удаляет ответы, затронутые изменением базы знаний
+
+        Args:
+            sources: Измененные источники
+            chunk_ids: Измененные чанки (если не задано ни то, ни другое — очищается весь кеш)
+        """
+        with self._lock:
+            if sources is None and chunk_ids is None:
+                stale = list(range(len(self._responses)))
+            else:
+                sources = sources or set()
+                chunk_ids = chunk_ids or set()
+                stale = [
+                    i for i in range(len(self._responses))
+                    if not self._sources[i].isdisjoint(sources) or not self._chunk_ids[i].isdisjoint(chunk_ids)
+                ]
+            self.invalidations += len(stale)
+            self._remove(stale)
+
+    def get_stats(self) -> Dict[str, Union[int, float]]:
+        """Статистика кеша ответов"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._responses),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0,
+                'invalidations': self.invalidations,
+            }
+
+    @staticmethod
+    def _normalize(embedding: np.ndarray) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _expire(self) -> None:
+        if not self.ttl or not self._created:
+            return
+        deadline = time.monotonic() - self.ttl
+        # Записи добавляются по времени, поэтому устаревшие идут в начале
+        expired = 0
+        while expired < len(self._created) and self._created[expired] < deadline:
+            expired += 1
+        if expired:
+            self._remove(list(range(expired)))
+
+    def _remove(self, indices: List[int]) -> None:
+        if not indices:
+            return
+
+        keep = sorted(set(range(len(self._responses))) - set(indices))
+        self._embeddings = self._embeddings[keep] if keep else None
+        self._chunk_ids = [self._chunk_ids[i] for i in keep]
+        self._sources = [self._sources[i] for i in keep]
+        self._responses = [self._responses[i] for i in keep]
+        self._created = [self._created[i] for i in keep]
@@ -0,0 +1,194 @@
+import asyncio
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from src.models.document import QueryResponse
+from src.services.answer_cache import SemanticAnswerCache
+from src.services.llm_service import AsyncLLMService, LLMService
+from src.services.retrieval_service import AsyncRetrievalService
+
+NOT_FOUND_ANSWER = (
+    "К сожалению, я не нашел информации в базе знаний, которая могла бы ответить на ваш вопрос. "
+    "Попробуйте переформулировать запрос или загрузите дополнительные материалы."
+)
+
+
+class AnswerService:
+    """
+    Ответы на вопросы: поиск контекста, семантический кеш ответов и генерация
+
+    Общая логика обработчиков API и бота в режиме без HTTP.
+    """
+
+    def __init__(
+            self,
+            retrieval_service: AsyncRetrievalService,
+            llm_service: AsyncLLMService,
+            answer_cache: Optional[SemanticAnswerCache] = None
+    ):
+        """
+        Инициализация сервиса ответов
+
+        Args:
+            retrieval_service: Асинхронный сервис поиска
+            llm_service: Асинхронный LLM сервис
+            answer_cache: Семантический кеш ответов (None — без кеша)
+        """
+        self.retrieval_service = retrieval_service
+        self.llm_service = llm_service
+        self.answer_cache = answer_cache
+
+    async def ask(
+            self,
+            query: str,
+            top_k: int = None,
+            filters: Optional[Dict[str, Any]] = None
+    ) -> QueryResponse:
+        """
+        Находит контекст и генерирует ответ
+
+        Args:
+            query: Вопрос пользователя
+            top_k: Количество результатов поиска
+            filters: Фильтры для метаданных
+
+        Returns:
+            Ответ с источниками
+        """
+        sources, formatted_context = await self.retrieval_service.retrieve_and_format(query, top_k, filters)
+        return await self.answer(query, sources, formatted_context)
+
+    async def answer(self, query: str, sources: List[dict], formatted_context: str) -> QueryResponse:
+        """
+        Генерирует ответ по найденному контексту с учетом семантического кеша
+
+        Args:
+            query: Вопрос пользователя
+            sources: Найденные чанки
+            formatted_context: Отформатированный контекст
+
+        Returns:
+            Ответ с источниками
+        """
+        if not sources:
+            return QueryResponse(
+                answer=NOT_FOUND_ANSWER,
+                sources=[],
+                confidence=0.0
+            )
+
+        # Похожий вопрос с тем же найденным контекстом уже отвечен — берем ответ из кеша
+        chunk_ids = [source['id'] for source in sources]
+        if self.answer_cache is not None:
+            query_embedding = await self.retrieval_service.embed_query(query)
+            cached = self.answer_cache.lookup(query_embedding, chunk_ids)
+            if cached is not None:
+                return cached
+
+        # Генерируем ответ с помощью LLM
+        response = await self.llm_service.agenerate_with_sources(
+            query=query,
+            context=formatted_context,
+            sources=sources
+        )
+
+        if self.answer_cache is not None and not response.answer.startswith(LLMService.ERROR_PREFIX):
+            self.answer_cache.store(
+                query_embedding,
+                chunk_ids,
+                {source['metadata'].get('source') for source in sources},
+                response
+            )
+
+        return response
+
+    async def stream_query(
+            self,
+            query: str,
+            top_k: int = None,
+            filters: Optional[Dict[str, Any]] = None
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Находит контекст и генерирует ответ потоком событий (см. stream)
+        """
+        start = time.perf_counter()
+        sources, formatted_context = await self.retrieval_service.retrieve_and_format(query, top_k, filters)
+        stream = self.stream(query, sources, formatted_context, start)
+        try:
+            async for event in stream:
+                yield event
+        finally:
+            await stream.aclose()
+
+    async def stream(
+            self,
+            query: str,
+            sources: List[dict],
+            formatted_context: str,
+            started_at: float = None
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Генерирует ответ по найденному контексту потоком событий
+
+        Сначала событие sources с источниками, затем события token с частями
+        ответа по мере генерации и в конце done (или error). При закрытии
+        генератора поток GigaChat прерывается.
+
+        Args:
+            query: Вопрос пользователя
+            sources: Найденные чанки
+            formatted_context: Отформатированный контекст
+            started_at: Время начала обработки запроса (time.perf_counter)
+
+        Yields:
+            Пары (событие, данные)
+        """
+        started_at = started_at if started_at is not None else time.perf_counter()
+        summary = LLMService.build_response("", sources)
+        yield "sources", {
+            "sources": summary.sources,
+            "confidence": summary.confidence,
+            "retrieval_time": round(time.perf_counter() - started_at, 4)
+        }
+
+        if not sources:
+            yield "token", {"text": NOT_FOUND_ANSWER}
+            yield "done", {"cached": False}
+            return
+
+        chunk_ids = [source['id'] for source in sources]
+        query_embedding = None
+        if self.answer_cache is not None:
+            query_embedding = await self.retrieval_service.embed_query(query)
+            cached = self.answer_cache.lookup(query_embedding, chunk_ids)
+            if cached is not None:
+                yield "token", {"text": cached.answer}
+                yield "done", {"cached": True}
+                return
+
+        parts = []
+        stream = self.llm_service.astream_answer(query, formatted_context)
+        try:
+            async for token in stream:
+                if token.startswith(LLMService.ERROR_PREFIX):
+                    # Ошибка GigaChat уже записана в лог сервисом LLM; ответ не кешируется
+                    yield "error", {"detail": token}
+                    return
+                parts.append(token)
+                yield "token", {"text": token}
+        except (asyncio.CancelledError, GeneratorExit):
+            # Клиент отключился: отправка ответа отменена
+            print(f"Клиент отключился, генерация остановлена после {len(parts)} частей ответа")
+            raise
+        finally:
+            # Закрывает соединение с GigaChat, чтобы не платить за непрочитанные токены
+            await stream.aclose()
+
+        if self.answer_cache is not None:
+            self.answer_cache.store(
+                query_embedding,
+                chunk_ids,
+                {source['metadata'].get('source') for source in sources},
+                LLMService.build_response("".join(parts), sources)
+            )
+        yield "done", {"cached": False, "total_time": round(time.perf_counter() - started_at, 4)}
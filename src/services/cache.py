@@ -0,0 +1,89 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Union
+
+
+class LRUCache:
+    """Потокобезопасный LRU-кеш в памяти с ограничением размера и необязательным TTL"""
+
+    def __init__(self, max_size: int, ttl: float = 0):
+        """
+        Инициализация кеша
+
+        Args:
+            max_size: Максимальное число записей
+            ttl: Время жизни записи в секундах (0 — без ограничения)
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Возвращает значение по ключу и помечает его как недавно использованное
+
+        Args:
+            key: Ключ
+
+        Returns:
+            Значение или None, если записи нет или она устарела
+        """
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                stored_at, value = item
+                if not self.ttl or time.monotonic() - stored_at < self.ttl:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+
+            self.misses += 1
+            return None
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """
+        Сохраняет значение, вытесняя самые давно использованные записи
+
+        Args:
+            key: Ключ
+            value: Значение
+        """
+        if self.max_size <= 0:
+            return
+
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        """Очищает кеш"""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+    def get_stats(self) -> Dict[str, Union[int, float]]:
+        """
+        Статистика кеша
+
+        Returns:
+            Размер и доля попаданий
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0,
+            }
@@ -0,0 +1,143 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.config import settings
+from src.services.tokens import estimate_tokens
+
+# Перекрытие короче этого считается случайным совпадением и не вырезается
+MIN_OVERLAP = 8
+
+
+def overlap_length(previous: str, text: str, max_overlap: int) -> int:
+    """
+    Длина перекрытия: самый длинный суффикс previous, который является префиксом text
+
+    Args:
+        previous: Текст предыдущего чанка
+        text: Текст следующего чанка
+        max_overlap: Максимальная длина перекрытия в символах
+
+    Returns:
+        Количество символов в начале text, повторяющих конец previous
+    """
+    for length in range(min(len(previous), len(text), max_overlap), MIN_OVERLAP - 1, -1):
+        if previous.endswith(text[:length]):
+            return length
+    return 0
+
+
+def join_chunks(previous: str, text: str, max_overlap: int) -> str:
+    """Склеивает соседние чанки, убирая повтор на стыке"""
+    overlap = overlap_length(previous, text, max_overlap)
+    if overlap:
+        return previous + text[overlap:]
+    return previous + "\n" + text
+
+
+def _position(result: Dict[str, Any]) -> Optional[Tuple[str, int]]:
+    metadata = result.get('metadata') or {}
+    document_id = metadata.get('document_id')
+    chunk_index = metadata.get('chunk_index')
+    if document_id is None or chunk_index is None:
+        return None
+    return document_id, int(chunk_index)
+
+
+def pack_context(
+        results: List[Dict[str, Any]],
+        token_budget: int = None,
+        header_tokens: int = 20,
+        max_overlap: int = None
+) -> List[Dict[str, Any]]:
+    """
+    Упаковывает найденные чанки в контекст ограниченного размера
+
+    Чанки берутся жадно в порядке релевантности, пока помещаются в бюджет токенов.
+    Соседние чанки одного документа (по document_id и chunk_index) объединяются
+    в один блок без повтора перекрытия, блок получает один заголовок.
+
+    Args:
+        results: Результаты поиска в порядке убывания релевантности
+        token_budget: Бюджет токенов контекста (0 — без ограничения)
+        header_tokens: Оценка токенов заголовка блока
+        max_overlap: Максимальная длина перекрытия чанков в символах
+
+    Returns:
+        Блоки в порядке релевантности: словари content, metadata, similarity, chunk_ids
+    """
+    token_budget = token_budget if token_budget is not None else settings.context_token_budget
+    max_overlap = max_overlap if max_overlap is not None else settings.chunk_overlap * 2
+
+    selected: Dict[Tuple[str, int], str] = {}
+    chosen: List[Tuple[int, Dict[str, Any]]] = []
+    used = 0
+
+    for rank, result in enumerate(results):
+        position = _position(result)
+        text = result['content']
+        cost = estimate_tokens(text)
+        has_neighbour = False
+
+        if position is not None:
+            document_id, index = position
+            if position in selected:
+                continue
+            previous = selected.get((document_id, index - 1))
+            following = selected.get((document_id, index + 1))
+            has_neighbour = previous is not None or following is not None
+            # Повторяющиеся на стыках символы в бюджет не входят
+            overlap = 0
+            if previous is not None:
+                overlap += overlap_length(previous, text, max_overlap)
+            if following is not None:
+                overlap += overlap_length(text, following, max_overlap)
+            cost = estimate_tokens(text[:len(text) - overlap] if overlap < len(text) else "")
+
+        if not has_neighbour:
+            cost += header_tokens
+
+        if token_budget and used + cost > token_budget:
+            if chosen:
+                continue
+            # Самый релевантный чанк берем всегда, обрезая до бюджета
+            max_chars = max(0, int((token_budget - header_tokens) * settings.chars_per_token))
+            result = {**result, 'content': text[:max_chars]}
+            cost = token_budget
+
+        used += cost
+        chosen.append((rank, result))
+        if position is not None:
+            selected[position] = result['content']
+
+    # Объединяем подряд идущие чанки одного документа
+    blocks: List[Dict[str, Any]] = []
+    block_by_position: Dict[Tuple[str, int], Dict[str, Any]] = {}
+    ordered = sorted(
+        chosen,
+        key=lambda item: (_position(item[1]) is None, _position(item[1]) or ("", 0), item[0])
+    )
+    for rank, result in ordered:
+        position = _position(result)
+        block = None
+        if position is not None:
+            block = block_by_position.get((position[0], position[1] - 1))
+
+        if block is None:
+            block = {
+                'content': result['content'],
+                'metadata': result.get('metadata') or {},
+                'similarity': result.get('similarity', 0) or 0,
+                'rank': rank,
+                'chunk_ids': [result['id']],
+            }
+            blocks.append(block)
+        else:
+            block['content'] = join_chunks(block['content'], result['content'], max_overlap)
+            block['similarity'] = max(block['similarity'], result.get('similarity', 0) or 0)
+            block['rank'] = min(block['rank'], rank)
+            block['chunk_ids'].append(result['id'])
+
+        if position is not None:
+            block_by_position[position] = block
+
+    blocks.sort(key=lambda block: block['rank'])
+    return blocks
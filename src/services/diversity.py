@@ -0,0 +1,65 @@
+from typing import Optional, Union
+
+import numpy as np
+
+
+def mmr_select(
+        query_embedding: Union[np.ndarray, list],
+        embeddings: Union[np.ndarray, list],
+        k: int,
+        lambda_mult: float = 0.5,
+        relevance: Optional[Union[np.ndarray, list]] = None
+) -> np.ndarray:
+    """
+    Maximal marginal relevance: выбирает k кандидатов, релевантных и непохожих друг на друга
+
+    Оценка кандидата — lambda_mult × сходство с запросом минус
+    (1 − lambda_mult) × максимальное сходство с уже выбранными. Попарные
+    сходства считаются одним матричным умножением, максимум по выбранным
+    обновляется вектором на каждом из k шагов.
+
+    Args:
+        query_embedding: Вектор запроса
+        embeddings: Матрица векторов кандидатов (n × d)
+        k: Сколько кандидатов выбрать
+        lambda_mult: Баланс релевантности и разнообразия (1 — только релевантность)
+        relevance: Оценки релевантности кандидатов вместо сходства с запросом
+            (например, кросс-энкодера); приводятся к [0, 1]
+
+    Returns:
+        Индексы выбранных кандидатов в порядке выбора
+    """
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    k = min(k, len(vectors))
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors = vectors / np.where(norms > 0, norms, 1.0)
+    query = np.asarray(query_embedding, dtype=np.float32).ravel()
+    query = query / (np.linalg.norm(query) or 1.0)
+
+    if relevance is None:
+        relevance = vectors @ query
+    else:
+        relevance = np.asarray(relevance, dtype=np.float32)
+        spread = relevance.max() - relevance.min()
+        relevance = (relevance - relevance.min()) / spread if spread > 0 else np.ones_like(relevance)
+    relevance = lambda_mult * relevance
+    similarity = (1 - lambda_mult) * (vectors @ vectors.T)
+
+    selected = np.empty(k, dtype=np.intp)
+    available = np.ones(len(vectors), dtype=bool)
+    # Первым берется самый релевантный кандидат
+    chosen = int(np.argmax(relevance))
+    selected[0] = chosen
+    available[chosen] = False
+    redundancy = similarity[chosen].copy()
+    for step in range(1, k):
+        scores = np.where(available, relevance - redundancy, -np.inf)
+        chosen = int(np.argmax(scores))
+        selected[step] = chosen
+        available[chosen] = False
+        np.maximum(redundancy, similarity[chosen], out=redundancy)
+
+    return selected
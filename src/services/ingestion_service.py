@@ -0,0 +1,244 @@
+import os
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional, Union
+
+from src.config import settings
+from src.database.vector_store import VectorStore
+from src.models.job import IngestionJob, JobStatus
+from src.pipeline.chunker import DocumentChunker
+from src.pipeline.document_loader import DocumentLoader
+from src.pipeline.embedder import Embedder
+from src.pipeline.ingestion_pipeline import StreamingIngestionPipeline
+from src.pipeline.manifest import IngestionManifest
+
+
+class IngestionService:
+    """Фоновая обработка загружаемых документов в пуле потоков"""
+
+    STAGES = ['loading', 'chunking', 'embedding', 'storing']
+
+    def __init__(
+            self,
+            document_loader: DocumentLoader,
+            chunker: DocumentChunker,
+            embedder: Embedder,
+            vector_store: VectorStore,
+            max_workers: int = None,
+            max_jobs: int = None,
+            manifest: IngestionManifest = None
+    ):
+        """
+        Инициализация сервиса загрузки
+
+        Args:
+            document_loader: Загрузчик документов
+            chunker: Чанкер документов
+            embedder: Эмбеддер
+            vector_store: Векторное хранилище
+            max_workers: Количество рабочих потоков
+            max_jobs: Сколько задач хранить в истории
+            manifest: Манифест загруженных файлов для инкрементальной загрузки
+        """
+        self.document_loader = document_loader
+        self.chunker = chunker
+        self.embedder = embedder
+        self.vector_store = vector_store
+        self.pipeline = StreamingIngestionPipeline(document_loader, chunker, embedder, vector_store)
+        self.manifest = manifest or IngestionManifest()
+        self.max_jobs = max_jobs or settings.ingestion_jobs_history
+
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers or settings.ingestion_workers,
+            thread_name_prefix="ingestion"
+        )
+        self._jobs: "OrderedDict[str, IngestionJob]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit_file(self, file_path: Union[str, Path], filename: str = None,
+                    cleanup: bool = False) -> IngestionJob:
+        """
+        Ставит файл в очередь на обработку
+
+        Args:
+            file_path: Путь к файлу
+            filename: Исходное имя файла (для отчета)
+            cleanup: Удалить файл после обработки
+
+        Returns:
+            Созданная задача
+        """
+        job = self._create_job(kind='file', target=filename or str(file_path))
+        self.executor.submit(self._run_file_job, job, Path(file_path), cleanup)
+        return job
+
+    def submit_directory(self, directory_path: Union[str, Path], force: bool = False) -> IngestionJob:
+        """
+        Ставит директорию в очередь на инкрементальную синхронизацию
+
+        Args:
+            directory_path: Путь к директории
+            force: Переобработать все файлы, а не только изменившиеся
+
+        Returns:
+            Созданная задача
+        """
+        job = self._create_job(kind='directory', target=str(directory_path))
+        self.executor.submit(self._run_directory_job, job, Path(directory_path), force)
+        return job
+
+    def get_job(self, job_id: str) -> Optional[IngestionJob]:
+        """
+        Возвращает задачу по идентификатору
+
+        Args:
+            job_id: Идентификатор задачи
+
+        Returns:
+            Копия задачи или None
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job.model_copy(deep=True) if job else None
+
+    def list_jobs(self) -> List[IngestionJob]:
+        """Возвращает все задачи, начиная с самых новых"""
+        with self._lock:
+            return [job.model_copy(deep=True) for job in reversed(self._jobs.values())]
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Останавливает пул потоков"""
+        self.executor.shutdown(wait=wait)
+
+    def _create_job(self, kind: str, target: str) -> IngestionJob:
+        job = IngestionJob(id=str(uuid.uuid4()), kind=kind, target=target)
+
+        with self._lock:
+            self._jobs[job.id] = job
+            self._evict_finished()
+
+        return job
+
+    def _evict_finished(self) -> None:
+        """Удаляет самые старые завершенные задачи сверх лимита истории"""
+        overflow = len(self._jobs) - self.max_jobs
+        if overflow <= 0:
+            return
+
+        for job_id in list(self._jobs.keys()):
+            if overflow <= 0:
+                break
+            if self._jobs[job_id].status in (JobStatus.COMPLETED, JobStatus.FAILED):
+                del self._jobs[job_id]
+                overflow -= 1
+
+    def _update(self, job: IngestionJob, **fields) -> None:
+        with self._lock:
+            for name, value in fields.items():
+                setattr(job, name, value)
+
+    @contextmanager
+    def _stage(self, job: IngestionJob, stage: str):
+        """Отмечает этап задачи и замеряет его длительность"""
+        self._update(job, stage=stage)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                job.stage_timings[stage] = round(job.stage_timings.get(stage, 0.0) + elapsed, 4)
+
+    def _complete_stage(self, job: IngestionJob, stage: str) -> None:
+        done = self.STAGES.index(stage) + 1
+        self._update(job, progress=round(done / len(self.STAGES), 4))
+
+    def _run_job(self, job: IngestionJob, pipeline) -> None:
+        self._update(job, status=JobStatus.RUNNING, started_at=datetime.now())
+
+        try:
+            result = pipeline(job)
+            self._update(job, status=JobStatus.COMPLETED, stage=None, progress=1.0, result=result)
+        except Exception as e:
+            print(f"Ошибка в задаче загрузки {job.id}: {traceback.format_exc()}")
+            self._update(job, status=JobStatus.FAILED, error=str(e))
+        finally:
+            self.vector_store.flush()
+            self._update(job, finished_at=datetime.now())
+
+    def _run_file_job(self, job: IngestionJob, file_path: Path, cleanup: bool) -> None:
+        def pipeline(job: IngestionJob) -> dict:
+            with self._stage(job, 'loading'):
+                documents = self.document_loader.load_file(file_path)
+            if not documents or not documents[0].content.strip():
+                raise ValueError("Документ пуст или не содержит текста")
+            self._complete_stage(job, 'loading')
+
+            with self._stage(job, 'chunking'):
+                batch = self.chunker.chunk_batch(documents)
+            if not len(batch):
+                raise ValueError("Не удалось создать фрагменты документа")
+            self._complete_stage(job, 'chunking')
+
+            with self._stage(job, 'embedding'):
+                batch = self.embedder.embed_batch(batch)
+            self._complete_stage(job, 'embedding')
+
+            with self._stage(job, 'storing'):
+                self.vector_store.add_batch(batch)
+            self._complete_stage(job, 'storing')
+
+            return {
+                "documents_count": len(documents),
+                "chunks_count": len(batch),
+            }
+
+        try:
+            self._run_job(job, pipeline)
+        finally:
+            if cleanup:
+                try:
+                    os.unlink(file_path)
+                except OSError:
+                    pass
+
+    def _run_directory_job(self, job: IngestionJob, directory_path: Path, force: bool) -> None:
+        def on_progress(stats: dict) -> None:
+            total = stats['total_files']
+            self._update(
+                job,
+                progress=round(stats['files_processed'] / total, 4) if total else 0.0,
+                stage_timings={k: round(v, 4) for k, v in stats['stage_timings'].items()},
+                result={
+                    "files_processed": stats['files_processed'],
+                    "total_files": total,
+                    "documents_count": stats['documents_count'],
+                    "chunks_count": stats['chunks_count'],
+                }
+            )
+
+        def pipeline(job: IngestionJob) -> dict:
+            if not directory_path.is_dir():
+                raise FileNotFoundError(f"Директория не найдена: {directory_path}")
+
+            # Стадии конвейера выполняются одновременно, поэтому этап общий
+            self._update(job, stage='streaming')
+            stats = self.pipeline.sync_directory(
+                directory_path, self.manifest, force=force, on_progress=on_progress
+            )
+            self._update(job, stage_timings=stats.pop('stage_timings'))
+            stats.pop('batches_count', None)
+
+            if not stats['total_files']:
+                return {**stats, "message": "Документы не найдены"}
+
+            return stats
+
+        self._run_job(job, pipeline)
@@ -1,4 +1,5 @@
-from typing import List, Dict, Any
+import asyncio
+from typing import AsyncIterator, List, Dict, Any
 from gigachat import GigaChat
 from gigachat.models import Chat, Messages, MessagesRole
 from src.config import settings
@@ -8,6 +9,9 @@ from src.models.document import QueryResponse
 class LLMService:
     """Сервис для работы с языковой моделью GigaChat"""
 
+    # Начало ответа, возвращаемого вместо текста при ошибке GigaChat
+    ERROR_PREFIX = "Извините, произошла ошибка при генерации ответа"
+
     SYSTEM_PROMPT = """Ты — AI-репетитор, который помогает студентам учиться и понимать материал.
 
 Твоя задача:
@@ -42,7 +46,10 @@ class LLMService:
             credentials=self.credentials,
             scope=settings.gigachat_scope,
             verify_ssl_certs=settings.gigachat_verify_ssl,
-            model=self.model
+            base_url=settings.gigachat_base_url,
+            auth_url=settings.gigachat_auth_url,
+            model=self.model,
+            timeout=settings.llm_timeout
         )
 
         print(f"GigaChat инициализирован: модель {self.model}")
@@ -67,15 +74,15 @@ class LLMService:
 
         return prompt
 
-    def generate_answer(
+    def build_chat(
             self,
             query: str,
             context: str,
             temperature: float = None,
             max_tokens: int = None
-    ) -> str:
+    ) -> Chat:
         """
-        Генерирует ответ на вопрос с учетом контекста
+        Формирует запрос к GigaChat: системный промпт и вопрос с контекстом
 
         Args:
             query: Вопрос пользователя
@@ -84,32 +91,52 @@ class LLMService:
             max_tokens: Максимальное количество токенов
 
         Returns:
-            Ответ LLM
+            Chat для GigaChat
         """
         temperature = temperature if temperature is not None else self.temperature
         max_tokens = max_tokens if max_tokens is not None else self.max_tokens
 
         user_prompt = self.generate_prompt(query, context)
 
-        try:
-            # Формируем сообщения для GigaChat
-            messages = [
-                Messages(
-                    role=MessagesRole.SYSTEM,
-                    content=self.SYSTEM_PROMPT
-                ),
-                Messages(
-                    role=MessagesRole.USER,
-                    content=user_prompt
-                )
-            ]
-
-            # Создаем chat объект
-            chat = Chat(
-                messages=messages,
-                temperature=temperature,
-                max_tokens=max_tokens
+        # Формируем сообщения для GigaChat
+        messages = [
+            Messages(
+                role=MessagesRole.SYSTEM,
+                content=self.SYSTEM_PROMPT
+            ),
+            Messages(
+                role=MessagesRole.USER,
+                content=user_prompt
             )
+        ]
+
+        return Chat(
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens
+        )
+
+    def generate_answer(
+            self,
+            query: str,
+            context: str,
+            temperature: float = None,
+            max_tokens: int = None
+    ) -> str:
+        """
+        Генерирует ответ на вопрос с учетом контекста
+
+        Args:
+            query: Вопрос пользователя
+            context: Контекст из векторной БД
+            temperature: Температура генерации
+            max_tokens: Максимальное количество токенов
+
+        Returns:
+            Ответ LLM
+        """
+        try:
+            chat = self.build_chat(query, context, temperature, max_tokens)
 
             # Получаем ответ от GigaChat
             response = self.client.chat(chat)
@@ -120,7 +147,7 @@ class LLMService:
 
         except Exception as e:
             print(f"Ошибка при обращении к GigaChat: {e}")
-            return f"Извините, произошла ошибка при генерации ответа: {str(e)}"
+            return f"{self.ERROR_PREFIX}: {str(e)}"
 
     def generate_with_sources(
             self,
@@ -140,7 +167,20 @@ class LLMService:
             Структурированный ответ с источниками
         """
         answer = self.generate_answer(query, context)
+        return self.build_response(answer, sources)
 
+    @staticmethod
+    def build_response(answer: str, sources: List[Dict[str, Any]]) -> QueryResponse:
+        """
+        Собирает ответ с источниками и средней уверенностью
+
+        Args:
+            answer: Текст ответа
+            sources: Список источников
+
+        Returns:
+            Структурированный ответ с источниками
+        """
         # Вычисляем среднюю уверенность по источникам
         avg_confidence = (
             sum(s.get('similarity', 0) for s in sources) / len(sources)
@@ -235,4 +275,110 @@ class LLMService:
                     yield chunk.choices[0].delta.content
 
         except Exception as e:
-            yield f"Ошибка: {str(e)}"
\ No newline at end of file
+            yield f"Ошибка: {str(e)}"
+
+
+class AsyncLLMService(LLMService):
+    """
+    Асинхронный вариант LLMService для обработчиков FastAPI
+
+    Запросы идут через асинхронный клиент GigaChat: один долгоживущий пул
+    соединений на сервис, число одновременных запросов ограничено
+    llm_max_concurrency, event loop при ожидании ответа не блокируется.
+    """
+
+    def __init__(self, credentials: str = None, model: str = None, max_concurrency: int = None):
+        """
+        Инициализация асинхронного LLM сервиса
+
+        Args:
+            credentials: Авторизационные данные GigaChat
+            model: Модель GigaChat
+            max_concurrency: Максимум одновременных запросов к GigaChat
+        """
+        super().__init__(credentials, model)
+        self.max_concurrency = max_concurrency or settings.llm_max_concurrency
+        self._semaphore = None
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        # Создается в работающем event loop, а не при импорте модуля
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def agenerate_answer(
+            self,
+            query: str,
+            context: str,
+            temperature: float = None,
+            max_tokens: int = None
+    ) -> str:
+        """
+        Асинхронно генерирует ответ на вопрос с учетом контекста
+
+        Args:
+            query: Вопрос пользователя
+            context: Контекст из векторной БД
+            temperature: Температура генерации
+            max_tokens: Максимальное количество токенов
+
+        Returns:
+            Ответ LLM
+        """
+        try:
+            chat = self.build_chat(query, context, temperature, max_tokens)
+            async with self.semaphore:
+                response = await self.client.achat(chat)
+            return response.choices[0].message.content
+
+        except Exception as e:
+            print(f"Ошибка при обращении к GigaChat: {e}")
+            return f"{self.ERROR_PREFIX}: {str(e)}"
+
+    async def agenerate_with_sources(
+            self,
+            query: str,
+            context: str,
+            sources: List[Dict[str, Any]]
+    ) -> QueryResponse:
+        """
+        Асинхронно генерирует ответ с указанием источников
+
+        Args:
+            query: Вопрос пользователя
+            context: Контекст из векторной БД
+            sources: Список источников
+
+        Returns:
+            Структурированный ответ с источниками
+        """
+        answer = await self.agenerate_answer(query, context)
+        return self.build_response(answer, sources)
+
+    async def astream_answer(self, query: str, context: str) -> AsyncIterator[str]:
+        """
+        Асинхронно генерирует ответ в потоковом режиме
+
+        Args:
+            query: Вопрос пользователя
+            context: Контекст из векторной БД
+
+        Yields:
+            Части ответа по мере генерации; при ошибке последняя часть —
+            сообщение, начинающееся с ERROR_PREFIX
+        """
+        try:
+            chat = self.build_chat(query, context)
+            async with self.semaphore:
+                async for chunk in self.client.astream(chat):
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+
+        except Exception as e:
+            print(f"Ошибка при потоковом обращении к GigaChat: {e}")
+            yield f"{self.ERROR_PREFIX}: {str(e)}"
+
+    async def aclose(self) -> None:
+        """Закрывает пул соединений с GigaChat"""
+        await self.client.aclose()
@@ -0,0 +1,80 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Потокобезопасный ограничитель скорости «ведро токенов»
+
+    Ведро вмещает capacity токенов и пополняется со скоростью rate токенов в секунду.
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        """
+        Инициализация ограничителя
+
+        Args:
+            rate: Скорость пополнения, токенов в секунду (0 — без ограничения)
+            capacity: Емкость ведра (по умолчанию равна rate, но не меньше 1)
+        """
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def unlimited(self) -> bool:
+        return self.rate <= 0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, amount: float = 1.0) -> bool:
+        """
+        Забирает токены, если они есть, не дожидаясь пополнения
+
+        Args:
+            amount: Количество токенов
+
+        Returns:
+            True, если токены получены
+        """
+        if self.unlimited:
+            return True
+
+        with self._lock:
+            self._refill()
+            if self._tokens >= amount:
+                self._tokens -= amount
+                return True
+            return False
+
+    def acquire(self, amount: float = 1.0) -> float:
+        """
+        Забирает токены, при необходимости ожидая пополнения
+
+        Запрос больше емкости ведра урезается до емкости, иначе он бы никогда не выполнился.
+
+        Args:
+            amount: Количество токенов
+
+        Returns:
+            Время ожидания в секундах
+        """
+        if self.unlimited:
+            return 0.0
+
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return waited
+                delay = (amount - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
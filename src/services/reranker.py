@@ -0,0 +1,171 @@
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional, Union
+
+from src.config import settings
+from src.services.cache import LRUCache
+
+
+class CrossEncoderReranker:
+    """
+    Переранжирование найденных чанков кросс-энкодером
+
+    Все пары (запрос, чанк) без оценки в кеше оцениваются одним батчевым
+    вызовом модели на CPU. Если оценка времени переранжирования с учетом
+    параллельных вызовов не укладывается в бюджет задержки, этап пропускается
+    и сохраняется исходный порядок.
+    """
+
+    def __init__(
+            self,
+            model_name: str = None,
+            latency_budget_ms: float = None,
+            cache_size: int = None
+    ):
+        """
+        Инициализация реранкера
+
+        Args:
+            model_name: Название модели кросс-энкодера
+            latency_budget_ms: Бюджет задержки переранжирования в мс (0 — без ограничения)
+            cache_size: Размер кеша оценок пар
+        """
+        from sentence_transformers import CrossEncoder
+
+        self.model_name = model_name or settings.rerank_model
+        self.latency_budget_ms = (
+            latency_budget_ms if latency_budget_ms is not None else settings.rerank_latency_budget_ms
+        )
+        print(f"Загрузка модели реранкера: {self.model_name}")
+        self.model = CrossEncoder(self.model_name, device="cpu", max_length=settings.rerank_max_length)
+        # Прогрев: первый вызов модели медленный и не должен попасть в оценку времени
+        self.model.predict([["прогрев", "прогрев"]], show_progress_bar=False)
+        self.pair_cache = LRUCache(
+            max_size=cache_size if cache_size is not None else settings.rerank_cache_size
+        )
+
+        self.reranked = 0
+        self.skipped = 0
+        # Скользящая средняя времени оценки одной пары, мс
+        self._pair_ms: Optional[float] = None
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _cache_key(query: str, chunk_id: str) -> tuple:
+        return re.sub(r'\s+', ' ', query).strip().lower(), chunk_id
+
+    def _within_budget(self, pairs: int) -> bool:
+        """
+        Оценивает, уложится ли оценка pairs пар в бюджет при текущей нагрузке
+
+        Без параллельных вызовов переранжирование выполняется всегда: так
+        оценка времени пары обновляется и восстанавливается после медленного вызова.
+        """
+        if not self.latency_budget_ms or not pairs or self._pair_ms is None or self._in_flight == 0:
+            return True
+        # Параллельные вызовы делят CPU, поэтому время растет с их числом
+        return self._pair_ms * pairs * (self._in_flight + 1) <= self.latency_budget_ms
+
+    def rerank(
+            self,
+            query: str,
+            results: List[Dict[str, Any]],
+            top_n: int
+    ) -> List[Dict[str, Any]]:
+        """
+        Переранжирует результаты одного запроса
+
+        Args:
+            query: Запрос пользователя
+            results: Кандидаты в порядке поиска
+            top_n: Сколько результатов оставить
+
+        Returns:
+            Лучшие top_n результатов с оценкой в поле rerank_score
+        """
+        return self.rerank_many([query], [results], top_n)[0]
+
+    def rerank_many(
+            self,
+            queries: List[str],
+            results_lists: List[List[Dict[str, Any]]],
+            top_n: int
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Переранжирует результаты нескольких запросов одним вызовом модели
+
+        Args:
+            queries: Запросы пользователей
+            results_lists: Кандидаты для каждого запроса в порядке поиска
+            top_n: Сколько результатов оставить для каждого запроса
+
+        Returns:
+            Лучшие top_n результатов для каждого запроса
+        """
+        scores: Dict[tuple, float] = {}
+        missing: List[tuple] = []
+        seen = set()
+        pairs: List[List[str]] = []
+        for query, results in zip(queries, results_lists):
+            for result in results:
+                key = self._cache_key(query, result['id'])
+                if key in seen:
+                    continue
+                seen.add(key)
+                cached = self.pair_cache.get(key)
+                if cached is not None:
+                    scores[key] = cached
+                else:
+                    missing.append(key)
+                    pairs.append([query, result['content']])
+
+        with self._lock:
+            if not self._within_budget(len(pairs)):
+                self.skipped += 1
+                return [results[:top_n] for results in results_lists]
+            self._in_flight += 1
+
+        try:
+            if pairs:
+                start = time.perf_counter()
+                predicted = self.model.predict(
+                    pairs,
+                    batch_size=len(pairs),
+                    show_progress_bar=False,
+                    convert_to_numpy=True
+                )
+                elapsed_ms = (time.perf_counter() - start) * 1000
+
+                with self._lock:
+                    pair_ms = elapsed_ms / len(pairs) / self._in_flight
+                    self._pair_ms = pair_ms if self._pair_ms is None else 0.8 * self._pair_ms + 0.2 * pair_ms
+
+                for key, score in zip(missing, predicted):
+                    scores[key] = float(score)
+                    self.pair_cache.put(key, float(score))
+            with self._lock:
+                self.reranked += 1
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+        reranked = []
+        for query, results in zip(queries, results_lists):
+            for result in results:
+                result['rerank_score'] = scores[self._cache_key(query, result['id'])]
+            reranked.append(sorted(results, key=lambda x: x['rerank_score'], reverse=True)[:top_n])
+        return reranked
+
+    def get_stats(self) -> Dict[str, Union[int, float, None]]:
+        """Статистика реранкера и кеша оценок пар"""
+        with self._lock:
+            return {
+                'model': self.model_name,
+                'reranked': self.reranked,
+                'skipped': self.skipped,
+                'pair_ms': round(self._pair_ms, 3) if self._pair_ms is not None else None,
+                'latency_budget_ms': self.latency_budget_ms,
+                'pair_cache': self.pair_cache.get_stats(),
+            }
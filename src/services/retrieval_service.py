@@ -1,29 +1,153 @@
-from typing import List, Dict, Any, Optional
+import asyncio
+import functools
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Dict, Any, Optional, Union
+import numpy as np
+from src.database.sharding import create_vector_store
 from src.database.vector_store import VectorStore
 from src.pipeline.embedder import Embedder
+from src.services.cache import LRUCache
+from src.services.context_packer import pack_context
+from src.services.diversity import mmr_select
+from src.services.reranker import CrossEncoderReranker
 from src.config import settings
 
 
 class RetrievalService:
     """Сервис для поиска релевантного контекста"""
 
-    def __init__(self, vector_store: VectorStore = None, embedder: Embedder = None):
+    def __init__(
+            self,
+            vector_store: VectorStore = None,
+            embedder: Embedder = None,
+            reranker: CrossEncoderReranker = None
+    ):
         """
         Инициализация сервиса поиска
 
         Args:
             vector_store: Векторное хранилище
             embedder: Эмбеддер для векторизации запросов
+            reranker: Реранкер (по умолчанию создается, если rerank_enabled)
         """
-        self.vector_store = vector_store or VectorStore()
+        self.vector_store = vector_store or create_vector_store()
         self.embedder = embedder or Embedder()
+        self.reranker = reranker
+        if self.reranker is None and settings.rerank_enabled:
+            self.reranker = CrossEncoderReranker()
+        self.query_cache = LRUCache(
+            max_size=settings.query_cache_size,
+            ttl=settings.query_cache_ttl
+        )
+
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        """Приводит запрос к каноническому виду: нижний регистр, схлопнутые пробелы"""
+        return re.sub(r'\s+', ' ', query).strip().lower()
+
+    def embed_query(self, query: str) -> np.ndarray:
+        """
+        Векторизует запрос, повторные вопросы берутся из LRU-кеша без вызова модели
+
+        Args:
+            query: Запрос пользователя
+
+        Returns:
+            Вектор запроса float32
+        """
+        key = self.normalize_query(query)
+        embedding = self.query_cache.get(key)
+        if embedding is None:
+            embedding = self.embedder.embed_matrix([key])[0]
+            self.query_cache.put(key, embedding)
+        return embedding
+
+    def embed_queries(self, queries: List[str]) -> np.ndarray:
+        """
+        Векторизует несколько запросов: найденные в кеше берутся из него,
+        остальные кодируются одним вызовом модели
+
+        Args:
+            queries: Запросы пользователей
+
+        Returns:
+            Матрица векторов запросов float32
+        """
+        keys = [self.normalize_query(query) for query in queries]
+        embeddings: Dict[str, np.ndarray] = {}
+        for key in keys:
+            if key not in embeddings:
+                cached = self.query_cache.get(key)
+                if cached is not None:
+                    embeddings[key] = cached
+
+        missing = [key for key in dict.fromkeys(keys) if key not in embeddings]
+        if missing:
+            for key, embedding in zip(missing, self.embedder.embed_matrix(missing)):
+                self.query_cache.put(key, embedding)
+                embeddings[key] = embedding
+
+        return np.stack([embeddings[key] for key in keys]) if keys else np.empty((0, 0), dtype=np.float32)
+
+    def get_cache_stats(self) -> Dict[str, Union[int, float]]:
+        """Статистика кеша эмбеддингов запросов"""
+        return self.query_cache.get_stats()
+
+    def _candidates_count(self, top_k: int) -> int:
+        """Сколько кандидатов искать: с реранкером — шире, чем нужно в ответе"""
+        return max(top_k, settings.rerank_candidates) if self.reranker is not None else top_k
+
+    def _rerank_limit(self, top_k: int) -> int:
+        """Сколько результатов оставить после переранжирования"""
+        return min(top_k, settings.rerank_top_n) if settings.rerank_top_n else top_k
+
+    @staticmethod
+    def _pool_size(candidates: int, mmr: bool) -> int:
+        """Сколько кандидатов искать: для MMR — пул шире, чтобы было из чего выбирать"""
+        return max(candidates, settings.mmr_candidates) if mmr else candidates
+
+    @staticmethod
+    def diversify(
+            query_embedding: np.ndarray,
+            results: List[Dict[str, Any]],
+            top_k: int,
+            lambda_mult: float = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Отбирает разнообразные top_k результатов maximal marginal relevance
+
+        Если у всех кандидатов есть оценка кросс-энкодера (rerank_score),
+        релевантность берется из нее, иначе — сходство с запросом.
+
+        Args:
+            query_embedding: Вектор запроса
+            results: Кандидаты с векторами в поле embedding
+            top_k: Количество результатов
+            lambda_mult: Баланс релевантности и разнообразия (по умолчанию mmr_lambda)
+
+        Returns:
+            Выбранные результаты в порядке MMR, без поля embedding
+        """
+        lambda_mult = lambda_mult if lambda_mult is not None else settings.mmr_lambda
+        if len(results) > top_k:
+            embeddings = np.stack([result['embedding'] for result in results])
+            relevance = None
+            if all('rerank_score' in result for result in results):
+                relevance = [result['rerank_score'] for result in results]
+            selected = mmr_select(query_embedding, embeddings, top_k, lambda_mult, relevance)
+            results = [results[index] for index in selected]
+        for result in results:
+            result.pop('embedding', None)
+        return results
 
     def retrieve_context(
             self,
             query: str,
             top_k: int = None,
             filters: Optional[Dict[str, Any]] = None,
-            similarity_threshold: float = None
+            similarity_threshold: float = None,
+            mmr: bool = None
     ) -> List[Dict[str, Any]]:
         """
         Получает релевантный контекст для запроса
@@ -33,49 +157,227 @@ class RetrievalService:
             top_k: Количество результатов
             filters: Фильтры для метаданных
             similarity_threshold: Порог сходства
+            mmr: Разнообразить результаты MMR (по умолчанию mmr_enabled)
 
         Returns:
             Список релевантных документов
         """
         top_k = top_k or settings.top_k
         similarity_threshold = similarity_threshold or settings.similarity_threshold
+        mmr = settings.mmr_enabled if mmr is None else mmr
+
+        candidates = self._candidates_count(top_k)
+        pool_size = self._pool_size(candidates, mmr)
 
         # Векторизация запроса
-        query_embedding = self.embedder.embed_text(query)
+        query_embedding = self.embed_query(query)
+
+        if self.hybrid:
+            filtered_results = self._hybrid_search(
+                query, query_embedding, pool_size, filters, similarity_threshold, include_embeddings=mmr
+            )
+        else:
+            # Поиск в векторной БД
+            results = self.vector_store.search(
+                query_embedding=query_embedding.tolist(),
+                top_k=pool_size,
+                filters=filters,
+                include_embeddings=mmr
+            )
 
-        # Поиск в векторной БД
-        results = self.vector_store.search(
+            # Фильтрация по порогу сходства
+            filtered_results = [
+                result for result in results
+                if result['similarity'] and result['similarity'] >= similarity_threshold
+            ]
+
+        if self.reranker is not None:
+            if mmr:
+                # Переранжируются все кандидаты, итоговый отбор делает MMR по оценкам кросс-энкодера
+                reranked = self.rerank_results(query, filtered_results)
+                return self.diversify(query_embedding, reranked, self._rerank_limit(top_k))
+            return self.rerank_results(query, filtered_results, self._rerank_limit(top_k))
+
+        if mmr:
+            filtered_results = self.diversify(query_embedding, filtered_results, candidates)
+        return filtered_results
+
+    @property
+    def hybrid(self) -> bool:
+        """Включен ли гибридный поиск (вектор + BM25)"""
+        return settings.retrieval_mode == "hybrid" and self.vector_store.keyword_search_enabled
+
+    def _hybrid_search(
+            self,
+            query: str,
+            query_embedding: np.ndarray,
+            top_k: int,
+            filters: Optional[Dict[str, Any]],
+            similarity_threshold: float,
+            vector_results: Optional[List[Dict[str, Any]]] = None,
+            include_embeddings: bool = False
+    ) -> List[Dict[str, Any]]:
+        """
+        Гибридный поиск: векторный и BM25, объединенные reciprocal rank fusion
+
+        Порог сходства применяется только к результатам векторного поиска —
+        точное совпадение термов само по себе достаточный сигнал.
+        """
+        candidates = top_k * settings.hybrid_candidates
+        if vector_results is None:
+            vector_results = self.vector_store.search(
+                query_embedding=query_embedding.tolist(),
+                top_k=candidates,
+                filters=filters,
+                include_embeddings=include_embeddings
+            )
+        keyword_results = self.vector_store.keyword_search(
+            query=query,
             query_embedding=query_embedding,
-            top_k=top_k,
-            filters=filters
+            top_k=candidates,
+            filters=filters,
+            include_embeddings=include_embeddings
         )
 
-        # Фильтрация по порогу сходства
-        filtered_results = [
-            result for result in results
-            if result['similarity'] and result['similarity'] >= similarity_threshold
-        ]
+        return self.fuse_rankings(
+            [
+                [
+                    result for result in vector_results
+                    if result['similarity'] and result['similarity'] >= similarity_threshold
+                ],
+                keyword_results
+            ],
+            top_k
+        )
 
-        return filtered_results
+    @staticmethod
+    def fuse_rankings(rankings: List[List[Dict[str, Any]]], top_k: int) -> List[Dict[str, Any]]:
+        """
+        Reciprocal rank fusion: оценка документа — сумма 1 / (k + ранг) по всем спискам
 
-    def format_context(self, results: List[Dict[str, Any]]) -> str:
+        Args:
+            rankings: Списки результатов, каждый отсортирован по убыванию релевантности
+            top_k: Количество результатов
+
+        Returns:
+            Объединенный список с оценкой в поле rrf_score
+        """
+        fused: Dict[str, Dict[str, Any]] = {}
+        for ranking in rankings:
+            for rank, result in enumerate(ranking, 1):
+                entry = fused.get(result['id'])
+                if entry is None:
+                    entry = fused[result['id']] = {**result, 'rrf_score': 0.0}
+                elif 'bm25_score' in result:
+                    entry['bm25_score'] = result['bm25_score']
+                entry['rrf_score'] += 1.0 / (settings.rrf_k + rank)
+
+        return sorted(fused.values(), key=lambda x: x['rrf_score'], reverse=True)[:top_k]
+
+    def retrieve_context_batch(
+            self,
+            queries: List[str],
+            top_k: int = None,
+            filters: Optional[Dict[str, Any]] = None,
+            similarity_threshold: float = None,
+            mmr: bool = None
+    ) -> List[List[Dict[str, Any]]]:
         """
-        Форматирует результаты поиска в контекст для LLM
+        Получает контекст для нескольких запросов: одна векторизация и один поиск
+
+        Args:
+            queries: Запросы пользователей
+            top_k: Количество результатов на запрос
+            filters: Фильтры для метаданных (общие для всех запросов)
+            similarity_threshold: Порог сходства
+            mmr: Разнообразить результаты MMR (по умолчанию mmr_enabled)
+
+        Returns:
+            Списки релевантных документов, по одному на запрос
+        """
+        top_k = top_k or settings.top_k
+        similarity_threshold = similarity_threshold or settings.similarity_threshold
+        mmr = settings.mmr_enabled if mmr is None else mmr
+
+        candidates = self._candidates_count(top_k)
+        pool_size = self._pool_size(candidates, mmr)
+
+        query_embeddings = self.embed_queries(queries)
+        batch_results = self.vector_store.search_many(
+            query_embeddings=query_embeddings,
+            top_k=pool_size * settings.hybrid_candidates if self.hybrid else pool_size,
+            filters=filters,
+            include_embeddings=mmr
+        )
+
+        if self.hybrid:
+            filtered_batch = [
+                self._hybrid_search(
+                    query, query_embedding, pool_size, filters, similarity_threshold,
+                    vector_results=results, include_embeddings=mmr
+                )
+                for query, query_embedding, results in zip(queries, query_embeddings, batch_results)
+            ]
+        else:
+            filtered_batch = [
+                [
+                    result for result in results
+                    if result['similarity'] and result['similarity'] >= similarity_threshold
+                ]
+                for results in batch_results
+            ]
+
+        if self.reranker is not None:
+            # Все пары всех запросов оцениваются одним вызовом модели
+            if not mmr:
+                return self.reranker.rerank_many(queries, filtered_batch, self._rerank_limit(top_k))
+            filtered_batch = self.reranker.rerank_many(queries, filtered_batch, pool_size)
+            top_k = self._rerank_limit(top_k)
+        else:
+            top_k = candidates
+
+        if mmr:
+            filtered_batch = [
+                self.diversify(query_embedding, results, top_k)
+                for query_embedding, results in zip(query_embeddings, filtered_batch)
+            ]
+        return filtered_batch
+
+    def format_context(self, results: List[Dict[str, Any]], token_budget: int = None) -> str:
+        """
+        Форматирует результаты поиска в контекст для LLM (см. pack_and_format)
+        """
+        return self.pack_and_format(results, token_budget)[1]
+
+    def pack_and_format(
+            self,
+            results: List[Dict[str, Any]],
+            token_budget: int = None
+    ) -> tuple[List[Dict[str, Any]], str]:
+        """
+        Упаковывает результаты поиска в контекст для LLM
+
+        Соседние чанки одного документа склеиваются без повтора перекрытия,
+        чанки добавляются по релевантности, пока помещаются в бюджет токенов.
 
         Args:
             results: Результаты поиска
+            token_budget: Бюджет токенов контекста (по умолчанию context_token_budget)
 
         Returns:
-            Отформатированный контекст
+            Кортеж (результаты, попавшие в контекст, в исходном порядке; отформатированный контекст)
         """
         if not results:
-            return "Релевантная информация не найдена."
+            return [], "Релевантная информация не найдена."
+
+        blocks = pack_context(results, token_budget)
+        packed_ids = {chunk_id for block in blocks for chunk_id in block['chunk_ids']}
 
         context_parts = []
-        for i, result in enumerate(results, 1):
-            source = result['metadata'].get('source', 'Unknown')
-            content = result['content']
-            similarity = result.get('similarity', 0)
+        for i, block in enumerate(blocks, 1):
+            source = block['metadata'].get('source', 'Unknown')
+            content = block['content']
+            similarity = block['similarity']
 
             context_part = f"""
 Источник {i} (релевантность: {similarity:.2%}):
@@ -84,7 +386,7 @@ class RetrievalService:
 """
             context_parts.append(context_part)
 
-        return "\n".join(context_parts)
+        return [result for result in results if result['id'] in packed_ids], "\n".join(context_parts)
 
     def retrieve_and_format(
             self,
@@ -101,35 +403,109 @@ class RetrievalService:
             filters: Фильтры для метаданных
 
         Returns:
-            Кортеж (результаты поиска, отформатированный контекст)
+            Кортеж (результаты, попавшие в контекст; отформатированный контекст)
         """
         results = self.retrieve_context(query, top_k, filters)
-        formatted_context = self.format_context(results)
+        # Источники и уверенность ответа — только по чанкам, которые увидит LLM
+        return self.pack_and_format(results)
 
-        return results, formatted_context
-
-    def rerank_results(self, query: str, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    def rerank_results(
+            self,
+            query: str,
+            results: List[Dict[str, Any]],
+            top_n: int = None
+    ) -> List[Dict[str, Any]]:
         """
-        Дополнительное ранжирование результатов
+        Переранжирование результатов кросс-энкодером
+
+        Без реранкера (rerank_enabled=False) порядок поиска сохраняется.
 
         Args:
             query: Запрос пользователя
             results: Результаты поиска
+            top_n: Сколько результатов оставить (по умолчанию все)
 
         Returns:
-            Переранжированные результаты
+            Переранжированные результаты с оценкой в поле rerank_score
         """
-        # Простая реранжировка по длине документа (можно использовать более сложные методы)
-        query_length = len(query.split())
+        top_n = top_n or len(results)
+        if self.reranker is None or not results:
+            return results[:top_n]
+        return self.reranker.rerank(query, results, top_n)
 
-        for result in results:
-            content_length = len(result['content'].split())
-            length_score = min(content_length / (query_length * 10), 1.0)
 
-            # Комбинируем similarity и length_score
-            result['final_score'] = (
-                    result.get('similarity', 0) * 0.7 +
-                    length_score * 0.3
-            )
+class AsyncRetrievalService:
+    """
+    Асинхронный вариант RetrievalService для обработчиков FastAPI
+
+    Векторизация запроса, поиск и переранжирование — блокирующая CPU-работа,
+    она выполняется в выделенном пуле потоков, а event loop остается свободным
+    для других запросов. Кеши и индексы общие с исходным сервисом.
+    """
+
+    def __init__(self, retrieval_service: RetrievalService = None, max_workers: int = None):
+        """
+        Инициализация асинхронного сервиса поиска
+
+        Args:
+            retrieval_service: Синхронный сервис поиска
+            max_workers: Потоков в пуле поиска
+        """
+        self.service = retrieval_service or RetrievalService()
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers or settings.retrieval_workers,
+            thread_name_prefix="retrieval"
+        )
+
+    async def _run(self, func: Callable, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+
+    async def embed_query(self, query: str) -> np.ndarray:
+        """Векторизует запрос (см. RetrievalService.embed_query)"""
+        return await self._run(self.service.embed_query, query)
+
+    async def retrieve_context(
+            self,
+            query: str,
+            top_k: int = None,
+            filters: Optional[Dict[str, Any]] = None,
+            similarity_threshold: float = None,
+            mmr: bool = None
+    ) -> List[Dict[str, Any]]:
+        """Получает релевантный контекст для запроса (см. RetrievalService.retrieve_context)"""
+        return await self._run(self.service.retrieve_context, query, top_k, filters, similarity_threshold, mmr)
+
+    async def retrieve_context_batch(
+            self,
+            queries: List[str],
+            top_k: int = None,
+            filters: Optional[Dict[str, Any]] = None,
+            similarity_threshold: float = None,
+            mmr: bool = None
+    ) -> List[List[Dict[str, Any]]]:
+        """Получает контекст для нескольких запросов (см. RetrievalService.retrieve_context_batch)"""
+        return await self._run(
+            self.service.retrieve_context_batch, queries, top_k, filters, similarity_threshold, mmr
+        )
+
+    async def retrieve_and_format(
+            self,
+            query: str,
+            top_k: int = None,
+            filters: Optional[Dict[str, Any]] = None
+    ) -> tuple[List[Dict[str, Any]], str]:
+        """Получает и форматирует контекст для запроса (см. RetrievalService.retrieve_and_format)"""
+        return await self._run(self.service.retrieve_and_format, query, top_k, filters)
+
+    def format_context(self, results: List[Dict[str, Any]]) -> str:
+        """Форматирует результаты поиска в контекст для LLM"""
+        return self.service.format_context(results)
+
+    def pack_and_format(self, results: List[Dict[str, Any]]) -> tuple[List[Dict[str, Any]], str]:
+        """Упаковывает результаты поиска в контекст для LLM (см. RetrievalService.pack_and_format)"""
+        return self.service.pack_and_format(results)
 
-        return sorted(results, key=lambda x: x.get('final_score', 0), reverse=True)
\ No newline at end of file
+    def shutdown(self, wait: bool = True) -> None:
+        """Останавливает пул потоков поиска"""
+        self.executor.shutdown(wait=wait)
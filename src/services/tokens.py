@@ -0,0 +1,18 @@
+from src.config import settings
+
+
+def estimate_tokens(text: str, chars_per_token: float = None) -> int:
+    """
+    Грубая оценка числа токенов текста без токенизатора модели
+
+    Args:
+        text: Текст
+        chars_per_token: Среднее число символов на токен
+
+    Returns:
+        Оценка количества токенов (не меньше 1 для непустого текста)
+    """
+    if not text:
+        return 0
+    chars_per_token = chars_per_token or settings.chars_per_token
+    return max(1, int(len(text) / chars_per_token))